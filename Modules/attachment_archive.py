@@ -0,0 +1,157 @@
+import asyncio
+import io
+import tempfile
+from typing import List, Optional, Sequence
+
+import aiohttp
+import discord
+
+
+SPOOL_THRESHOLD = 4 * 1024 * 1024
+"""Bytes of an attachment held in memory, larger attachments are written to a temporary file"""
+
+BYTE_BUDGET = 25 * 1024 * 1024
+"""Bytes archived per deleted message at most, the attachments above are only recorded with their metadata"""
+
+CHUNK_SIZE = 64 * 1024
+
+DOWNLOAD_TIMEOUT = 60
+"""Seconds a single attachment may take to download"""
+
+CAPTURE_DEADLINE = 90
+"""Seconds the downloads of a message may take together, the unfinished ones are only described"""
+
+
+class CapturedAttachment:
+    __slots__ = ("attachment", "file", "skipped")
+
+    def __init__(self, attachment: discord.Attachment, file: Optional[discord.File] = None,
+                 skipped: Optional[str] = None):
+        self.attachment = attachment
+        self.file = file
+        """The downloaded attachment, None if it couldn't or shouldn't be archived"""
+        self.skipped = skipped
+        """Why the attachment wasn't archived"""
+
+    def describe(self) -> str:
+        """Name, size and type of the attachment for the log, with the reason why it wasn't archived"""
+        a = self.attachment
+        if a.size >= 1024 * 1024:
+            size = f"{a.size / 1024 / 1024:.1f} MB"
+        else:
+            size = f"{a.size / 1024:.0f} KB"
+        s = f"{discord.utils.escape_markdown(a.filename)} ({size}"
+        if a.content_type:
+            s += f", {a.content_type}"
+        s += ")"
+        if self.skipped:
+            s += f": {self.skipped}"
+        return s
+
+    def close(self):
+        """Releases the downloaded file. discord.File.close() leaves file objects it didn't open itself open"""
+        if self.file is not None:
+            self.file.close()
+            self.file.fp.close()
+
+
+class AttachmentArchiver:
+    """
+    Downloads the attachments of a message for the deletion log.
+
+    The attachments are streamed concurrently with a bounded amount of downloads. Small attachments stay in memory,
+    larger ones are written to temporary files, so a message with several videos doesn't hold them all in memory.
+    A byte budget per message limits what is archived, the remaining attachments are only described.
+    """
+
+    def __init__(self, concurrency: int = 4, spool_threshold: int = SPOOL_THRESHOLD):
+        """
+        :param concurrency: Maximum amount of parallel downloads
+        :param spool_threshold: Size from which an attachment is written to a temporary file
+        """
+        self.__semaphore = asyncio.Semaphore(concurrency)
+        self.__spool_threshold = spool_threshold
+        self.__session: Optional[aiohttp.ClientSession] = None
+        self.downloaded_bytes = 0
+        self.over_budget = 0
+        """Amount of attachments which were only described because of the byte budget"""
+        self.failed = 0
+
+    async def capture(self, attachments: Sequence[discord.Attachment], budget: int = BYTE_BUDGET,
+                      deadline: float = CAPTURE_DEADLINE) -> List[CapturedAttachment]:
+        """
+        Downloads the attachments within the byte budget and the deadline.
+        The budget is given out in the order of the attachments, an attachment which doesn't fit anymore is skipped.
+        Downloads which aren't done at the deadline are cancelled.
+        Capture before deleting the message, discord stops serving the attachments of a deleted message.
+        :param attachments: The attachments of the message
+        :param budget: Bytes that may be downloaded in total
+        :param deadline: Seconds the downloads may take together
+        :return: The attachments in their order, with the file if the download succeeded
+        """
+        captured = []
+        downloads = []
+        for a in attachments:
+            if a.size > budget:
+                self.over_budget += 1
+                captured.append(CapturedAttachment(a, skipped="zu groß"))
+                continue
+            budget -= a.size
+            entry = CapturedAttachment(a)
+            captured.append(entry)
+            downloads.append(asyncio.ensure_future(self.__download(entry)))
+        if not downloads:
+            return captured
+        try:
+            _, pending = await asyncio.wait(downloads, timeout=deadline)
+        except BaseException:
+            for task in downloads:
+                task.cancel()
+            for entry in captured:
+                entry.close()
+            raise
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        for entry in captured:
+            if entry.file is None and entry.skipped is None:
+                self.failed += 1
+                entry.skipped = "Zeitlimit überschritten"
+        return captured
+
+    async def __download(self, entry: CapturedAttachment):
+        a = entry.attachment
+        # not a SpooledTemporaryFile, discord.File only accepts io.IOBase objects, which it is since Python 3.11
+        buffer = io.BytesIO() if a.size <= self.__spool_threshold else tempfile.TemporaryFile()
+        try:
+            async with self.__semaphore:
+                async with self.__get_session().get(a.proxy_url or a.url) as response:
+                    response.raise_for_status()
+                    size = 0
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > a.size:  # more than announced, don't let it eat the budget of the others
+                            raise ValueError(f"attachment {a.id} is larger than {a.size} bytes")
+                        buffer.write(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, OSError):
+            buffer.close()
+            self.failed += 1
+            entry.skipped = "Download fehlgeschlagen"
+            return
+        except BaseException:
+            buffer.close()
+            raise
+        self.downloaded_bytes += size
+        buffer.seek(0)
+        entry.file = discord.File(buffer, filename=a.filename, spoiler=a.is_spoiler(), description=a.description)
+
+    def __get_session(self) -> aiohttp.ClientSession:
+        if self.__session is None or self.__session.closed:
+            self.__session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT))
+        return self.__session
+
+    async def close(self):
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
@@ -0,0 +1,234 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import discord
+
+
+def multi_row_insert(prefix: str, values: str, rows: Sequence[tuple]) -> Tuple[str, list]:
+    """
+    Builds one INSERT statement for all rows
+    :param prefix: The statement up to VALUES, e.g. INSERT INTO BanUserRole (role_id, name, ban_fk) VALUES
+    :param values: The values of one row with placeholders, e.g. (%s, %s, %s)
+    :param rows: The rows, each with one item per placeholder
+    :return: The statement and its flat list of arguments
+    """
+    args = []
+    for row in rows:
+        args.extend(row)
+    return prefix + ", ".join([values] * len(rows)), args
+
+
+ROW_ERRORS = ("DataError", "IntegrityError")
+"""DB-API exceptions caused by the row itself, e.g. a too long value. Named like this by pymysql and sqlite3"""
+
+
+def is_row_error(error: Exception) -> bool:
+    """Whether the error is caused by the inserted row, not by the connection or the database"""
+    return any(cls.__name__ in ROW_ERRORS for cls in type(error).__mro__)
+
+
+class AuditTable:
+    """An INSERT target of the AuditWriter. Get it with AuditWriter.table()"""
+
+    def __init__(self, writer: "AuditWriter", table: str, columns: Sequence[str], values: Optional[str] = None):
+        self.__writer = writer
+        self.prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+        self.values = values or "(" + ", ".join(["%s"] * len(columns)) + ")"
+        self.rows: Deque[tuple] = deque()
+        self.failures = 0
+        """Failed INSERTs of the first batch in a row"""
+
+    async def put(self, row: tuple):
+        """Queues the row. Only waits if the writer is backed up"""
+        await self.__writer.put(self, row)
+
+
+class AuditWriter:
+    """
+    Collects the audit rows of all commands and writes them with one multi-row INSERT per table.
+
+    The rows are flushed every `interval` seconds, or right away when `batch_size` rows are waiting.
+    When `max_rows` rows are waiting, put() waits until a flush made room, so a slow database slows
+    the producers down instead of growing the queue without bounds.
+    Rows of a failed flush are put back and retried with the next flush. The tables are flushed independently,
+    so a failing table doesn't hold back the others. After `max_attempts` failed attempts a batch is inserted
+    row by row and the rows which are rejected because of their values are logged and dropped.
+    """
+
+    def __init__(self, bot: discord.Bot, batch_size: int = 200, interval: float = 0.25, max_rows: int = 5000,
+                 max_attempts: int = 3):
+        """
+        :param bot: The bot, used for execute
+        :param batch_size: Maximum amount of rows per INSERT statement
+        :param interval: Maximum amount of seconds a row waits in the queue
+        :param max_rows: Amount of waiting rows from which on put() waits for a flush
+        :param max_attempts: Failed INSERTs of a batch after which it is inserted row by row
+        """
+        self.__bot = bot
+        self.__batch_size = batch_size
+        self.__interval = interval
+        self.__max_rows = max_rows
+        self.__max_attempts = max_attempts
+        self.__logging = None
+        self.__tables: List[AuditTable] = []
+        self.__depth = 0
+        self.__pending = asyncio.Event()
+        self.__full = asyncio.Event()
+        self.__room = asyncio.Event()
+        self.__room.set()
+        self.__lock = asyncio.Lock()
+        self.__task: Optional[asyncio.Task] = None
+        self.rows_queued = 0
+        """Amount of rows put into the queue"""
+        self.rows_written = 0
+        """Amount of rows written to the database"""
+        self.rows_dropped = 0
+        """Amount of rows dropped because the database rejected them"""
+        self.statements = 0
+        """Amount of INSERT statements sent"""
+        self.waits = 0
+        """How often put() had to wait because the queue was full"""
+        self.last_flush_latency = 0.0
+        """Seconds the last flush took"""
+        self.max_flush_latency = 0.0
+        """Seconds the slowest flush took"""
+
+    @property
+    def depth(self) -> int:
+        """Amount of rows waiting in the queue"""
+        return self.__depth
+
+    def stats(self) -> Dict[str, float]:
+        """The queue depth, the counters and the flush latencies for the metrics"""
+        return {
+            "depth": self.__depth,
+            "rows_queued": self.rows_queued,
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "statements": self.statements,
+            "waits": self.waits,
+            "last_flush_seconds": self.last_flush_latency,
+            "max_flush_seconds": self.max_flush_latency,
+        }
+
+    def table(self, table: str, columns: Sequence[str], values: Optional[str] = None) -> AuditTable:
+        """
+        Registers an INSERT target
+        :param table: Name of the table
+        :param columns: The columns in the order of the rows
+        :param values: The values of one row with placeholders. Default one plain placeholder per column
+        """
+        target = AuditTable(self, table, columns, values)
+        self.__tables.append(target)
+        return target
+
+    async def put(self, table: AuditTable, row: tuple):
+        while self.__depth >= self.__max_rows:
+            self.waits += 1
+            self.__full.set()
+            await self.__room.wait()
+        table.rows.append(row)
+        self.__depth += 1
+        self.rows_queued += 1
+        if self.__depth >= self.__max_rows:
+            self.__room.clear()
+        self.__pending.set()
+        if self.__depth >= self.__batch_size:
+            self.__full.set()
+
+    def start(self, logging):
+        """Starts the flush task if it's not already running"""
+        self.__logging = logging
+        if self.__task is None or self.__task.done():
+            self.__task = self.__bot.loop.create_task(self.__run(logging))
+
+    async def __run(self, logging):
+        while True:
+            await self.__pending.wait()
+            try:
+                await asyncio.wait_for(self.__full.wait(), self.__interval)
+            except asyncio.TimeoutError:
+                pass
+            # noinspection PyBroadException
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error("audit flush failed, retrying with the next flush", exc_info=e)
+                await asyncio.sleep(self.__interval)
+
+    async def flush(self):
+        """
+        Writes all waiting rows
+        :raises Exception: the first error when the database write of a table failed. Its rows stay in the queue
+        """
+        async with self.__lock:
+            self.__pending.clear()
+            self.__full.clear()
+            start = time.perf_counter()
+            error = None
+            try:
+                for table in self.__tables:
+                    try:
+                        await self.__flush_table(table)
+                    except Exception as e:
+                        error = error or e
+                        self.__pending.set()
+            finally:
+                self.last_flush_latency = time.perf_counter() - start
+                self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+            if error is not None:
+                raise error
+
+    async def __flush_table(self, table: AuditTable):
+        while table.rows:
+            batch = [table.rows.popleft() for _ in range(min(self.__batch_size, len(table.rows)))]
+            if table.failures >= self.__max_attempts:
+                await self.__insert_rows(table, batch)
+                table.failures = 0
+                continue
+            query, args = multi_row_insert(table.prefix, table.values, batch)
+            try:
+                await self.__bot.execute(query, args)
+            except Exception:
+                # put the rows back in their order, they are retried with the next flush
+                table.rows.extendleft(reversed(batch))
+                table.failures += 1
+                raise
+            table.failures = 0
+            self.statements += 1
+            self.rows_written += len(batch)
+            self.__done(len(batch))
+
+    async def __insert_rows(self, table: AuditTable, batch: List[tuple]):
+        """Inserts the batch row by row and drops the rows the database rejects because of their values"""
+        query = table.prefix + table.values
+        for i, row in enumerate(batch):
+            try:
+                await self.__bot.execute(query, row)
+            except Exception as e:
+                if not is_row_error(e):
+                    # the database itself failed, keep the rest for the next flush
+                    table.rows.extendleft(reversed(batch[i:]))
+                    raise
+                self.rows_dropped += 1
+                if self.__logging is not None:
+                    self.__logging.error(f"dropped audit row of {table.prefix.split()[2]}: {row!r}", exc_info=e)
+            else:
+                self.statements += 1
+                self.rows_written += 1
+            self.__done(1)
+
+    def __done(self, rows: int):
+        """Removes written or dropped rows from the depth"""
+        self.__depth -= rows
+        if self.__depth < self.__max_rows:
+            self.__room.set()
+
+    async def close(self):
+        """Stops the flush task and writes the remaining rows"""
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        await self.flush()
@@ -0,0 +1,212 @@
+import asyncio
+import bisect
+from array import array
+from typing import Dict, List, Optional
+
+import discord
+from discord.guild import BanEntry
+
+
+REMOVED = -1
+"""Reason index of an unban in the change log"""
+
+UNKNOWN = 1
+"""Reason index of a ban whose reason is fetched on the first lookup"""
+
+COMPACT_THRESHOLD = 1024
+"""Amount of logged changes after which they are merged into the snapshot"""
+
+
+class BanIndex:
+    """
+    The bans of a guild by user id, so the ban status doesn't need a request per lookup.
+
+    The bans are loaded once by streaming guild.bans() into a snapshot of two parallel arrays, the sorted user ids and
+    an index into the de-duplicated reasons, which is about 12 bytes per ban. Bans and unbans after that go into a small
+    change log which is looked up first and merged into the snapshot from time to time.
+    The ban events don't contain the reason, so it is fetched on the first lookup of such a ban,
+    unless the bot banned the user itself and recorded the reason with add().
+    While the snapshot is still loading, lookups fall back to the API.
+    """
+
+    def __init__(self, bot: discord.Bot, compact_threshold: int = COMPACT_THRESHOLD):
+        """
+        :param bot: The bot
+        :param compact_threshold: Amount of logged changes after which they are merged into the snapshot
+        """
+        self.__bot = bot
+        self.__compact_threshold = compact_threshold
+        self.__ids = array("Q")
+        """Sorted user ids of the snapshot"""
+        self.__reason_ids = array("I")
+        """Index into __reasons for each user id of the snapshot"""
+        self.__reasons: List[Optional[str]] = [None, None]
+        """The reasons by index. 0 is a ban without reason, UNKNOWN a ban whose reason isn't fetched yet"""
+        self.__reason_index: Dict[Optional[str], int] = {None: 0}
+        self.__changes: Dict[int, int] = {}
+        """user id -> reason index or REMOVED, newer than the snapshot"""
+        self.__loading_changes: Optional[Dict[int, int]] = None
+        """Changes since the running load started"""
+        self.__loaded = False
+        self.__task: Optional[asyncio.Task] = None
+        self.hits = 0
+        """Amount of lookups answered by the index"""
+        self.fallbacks = 0
+        """Amount of lookups which needed a request because the index wasn't loaded yet"""
+        self.reason_fetches = 0
+        """Amount of lookups which needed a request for the reason of a ban from an event"""
+
+    def __len__(self) -> int:
+        amount = len(self.__ids)
+        for user_id, reason_id in self.__changes.items():
+            in_snapshot = self.__snapshot_position(user_id) is not None
+            if reason_id == REMOVED and in_snapshot:
+                amount -= 1
+            elif reason_id != REMOVED and not in_snapshot:
+                amount += 1
+        return amount
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__loaded
+
+    def __intern(self, reason: Optional[str]) -> int:
+        reason_id = self.__reason_index.get(reason)
+        if reason_id is None:
+            reason_id = self.__reason_index[reason] = len(self.__reasons)
+            self.__reasons.append(reason)
+        return reason_id
+
+    def __snapshot_position(self, user_id: int) -> Optional[int]:
+        i = bisect.bisect_left(self.__ids, user_id)
+        if i < len(self.__ids) and self.__ids[i] == user_id:
+            return i
+        return None
+
+    def __reason_id(self, user_id: int) -> int:
+        reason_id = self.__changes.get(user_id)
+        if reason_id is not None:
+            return reason_id
+        i = self.__snapshot_position(user_id)
+        return REMOVED if i is None else self.__reason_ids[i]
+
+    def is_banned(self, user_id: int) -> bool:
+        """Whether the user is banned according to the index, without a request"""
+        return self.__reason_id(user_id) != REMOVED
+
+    def reason(self, user_id: int) -> Optional[str]:
+        """The ban reason of the user according to the index, None if not banned or banned without reason"""
+        reason_id = self.__reason_id(user_id)
+        return None if reason_id == REMOVED else self.__reasons[reason_id]
+
+    async def fetch(self, guild: discord.Guild, user: discord.abc.User) -> Optional[BanEntry]:
+        """
+        The ban of the user like guild.fetch_ban(), but from the index once it is loaded
+        :return: The ban or None if the user isn't banned
+        :raises discord.HTTPException: when the index isn't loaded yet and the request failed
+        """
+        if self.__loaded:
+            reason_id = self.__reason_id(user.id)
+            if reason_id != UNKNOWN:
+                self.hits += 1
+                return None if reason_id == REMOVED else BanEntry(reason=self.__reasons[reason_id], user=user)
+            self.reason_fetches += 1
+            try:
+                ban = await guild.fetch_ban(user)
+            except discord.NotFound:
+                self.remove(user.id)
+                return None
+            except discord.HTTPException:
+                return BanEntry(reason=None, user=user)  # banned for sure, only the reason is missing
+            self.add(user.id, ban.reason)
+            return ban
+        self.fallbacks += 1
+        try:
+            return await guild.fetch_ban(user)
+        except discord.NotFound:
+            return None
+
+    def add(self, user_id: int, reason: Optional[str]):
+        """Records a ban with its reason. Call when the bot banned the user itself"""
+        self.__record(user_id, self.__intern(reason))
+
+    def add_unknown(self, user_id: int):
+        """
+        Records a ban whose reason is fetched on the first lookup. Call from on_member_ban.
+        Keeps the reason if the ban was already recorded with add()
+        """
+        if self.__reason_id(user_id) == REMOVED:
+            self.__record(user_id, UNKNOWN)
+
+    def remove(self, user_id: int):
+        """Records an unban. Call from on_member_unban"""
+        self.__record(user_id, REMOVED)
+
+    def __record(self, user_id: int, reason_id: int):
+        self.__changes[user_id] = reason_id
+        if self.__loading_changes is not None:
+            self.__loading_changes[user_id] = reason_id
+        elif len(self.__changes) >= self.__compact_threshold:
+            self.__compact()
+
+    def __compact(self):
+        """Merges the change log into the snapshot"""
+        changes = self.__changes
+        added = sorted((user_id, reason_id) for user_id, reason_id in changes.items() if reason_id != REMOVED)
+        ids = array("Q")
+        reason_ids = array("I")
+        i = 0
+        for user_id, reason_id in zip(self.__ids, self.__reason_ids):
+            while i < len(added) and added[i][0] < user_id:
+                ids.append(added[i][0])
+                reason_ids.append(added[i][1])
+                i += 1
+            if user_id not in changes:
+                ids.append(user_id)
+                reason_ids.append(reason_id)
+        for user_id, reason_id in added[i:]:
+            ids.append(user_id)
+            reason_ids.append(reason_id)
+        self.__ids = ids
+        self.__reason_ids = reason_ids
+        self.__changes = {}
+
+    async def load(self, guild: discord.Guild):
+        """
+        Streams all bans of the guild into a new snapshot. Bans and unbans during the load are kept
+        """
+        self.__loading_changes = {}
+        try:
+            ids = array("Q")
+            reason_ids = array("I")
+            ordered = True
+            async for entry in guild.bans(limit=None):
+                if ids and entry.user.id <= ids[-1]:
+                    ordered = False
+                ids.append(entry.user.id)
+                reason_ids.append(self.__intern(entry.reason))
+            if not ordered:
+                order = sorted(range(len(ids)), key=ids.__getitem__)
+                ids = array("Q", (ids[i] for i in order))
+                reason_ids = array("I", (reason_ids[i] for i in order))
+            self.__ids = ids
+            self.__reason_ids = reason_ids
+            self.__changes = self.__loading_changes
+            self.__loaded = True
+        finally:
+            self.__loading_changes = None
+        if len(self.__changes) >= self.__compact_threshold:
+            self.__compact()
+
+    def start(self, guild: discord.Guild, logging):
+        """Loads the bans in the background if they aren't loading already"""
+        if self.__task is None or self.__task.done():
+            self.__task = self.__bot.loop.create_task(self.__run(guild, logging))
+
+    async def __run(self, guild: discord.Guild, logging):
+        # noinspection PyBroadException
+        try:
+            await self.load(guild)
+            logging.info(f"loaded {len(self.__ids)} bans into the ban index")
+        except Exception as e:
+            logging.error("could not load the bans", exc_info=e)
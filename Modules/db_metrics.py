@@ -0,0 +1,173 @@
+import bisect
+import functools
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+
+BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+"""Upper bounds of the latency histogram buckets in milliseconds. Slower statements go into an extra bucket"""
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUES = re.compile(r"\bVALUES\s*\(.*", re.IGNORECASE | re.DOTALL)
+_IN_LIST = re.compile(r"\bIN\s*\([?,\s]+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=512)
+def fingerprint(query: str) -> str:
+    """
+    The query without its values, so all executions of a statement share one label.
+    Multi-row VALUES lists and IN lists are collapsed, no matter how many rows or items they have.
+    """
+    query = query.replace("%s", "?")
+    query = _STRING.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _VALUES.sub("VALUES (...)", query)
+    query = _IN_LIST.sub("IN (...)", query)
+    return _WHITESPACE.sub(" ", query).strip().rstrip(";")[:200]
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        """Sum of all observed seconds"""
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket containing the quantile, in seconds"""
+        rank = q * self.count
+        seen = 0
+        for i, amount in enumerate(self.counts):
+            seen += amount
+            if seen >= rank and amount:
+                return BUCKETS_MS[i] / 1000 if i < len(BUCKETS_MS) else self.max
+        return 0.0
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _render_histogram(lines: List[str], name: str, histogram: LatencyHistogram, labels: str = ""):
+    cumulative = 0
+    separator = "," if labels else ""
+    for bound, amount in zip(BUCKETS_MS, histogram.counts):
+        cumulative += amount
+        lines.append(f'{name}_bucket{{{labels}{separator}le="{bound / 1000}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.total}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+
+
+class DatabaseMetrics:
+    """
+    Latency of the database statements per query fingerprint, the time spent waiting for a pool connection
+    and a log of the statements slower than a threshold.
+    """
+
+    def __init__(self, logging, slow_query_seconds: float = 0.2):
+        """
+        :param logging: The logger for the slow query log
+        :param slow_query_seconds: Statements taking longer are logged as warning. 0 disables the log
+        """
+        self.__logging = logging
+        self.slow_query_seconds = slow_query_seconds
+        self.queries: Dict[str, LatencyHistogram] = {}
+        """fingerprint -> latency of its statements"""
+        self.pool_wait = LatencyHistogram()
+        self.slow_queries = 0
+        """Amount of statements above the slow query threshold"""
+        self.started_at = time.time()
+
+    def observe(self, query: str, seconds: float):
+        key = fingerprint(query)
+        histogram = self.queries.get(key)
+        if histogram is None:
+            histogram = self.queries[key] = LatencyHistogram()
+        histogram.observe(seconds)
+        if self.slow_query_seconds and seconds >= self.slow_query_seconds:
+            self.slow_queries += 1
+            self.__logging.warning(f"slow query ({seconds * 1000:.0f} ms): {key}")
+
+    def observe_pool_wait(self, seconds: float):
+        self.pool_wait.observe(seconds)
+
+    def top(self, amount: int = 10) -> List[Tuple[str, LatencyHistogram]]:
+        """The fingerprints with the most total time"""
+        return sorted(self.queries.items(), key=lambda item: item[1].total, reverse=True)[:amount]
+
+    def render(self, pool_stats: Optional[Dict[str, int]] = None,
+               audit_stats: Optional[Dict[str, float]] = None) -> str:
+        """The metrics in the prometheus text format, with the gauges of the pool and the audit writer"""
+        lines = ["# TYPE flix_db_query_seconds histogram"]
+        for key, histogram in self.queries.items():
+            _render_histogram(lines, "flix_db_query_seconds", histogram, f'query="{_label(key)}"')
+        lines.append("# TYPE flix_db_pool_wait_seconds histogram")
+        _render_histogram(lines, "flix_db_pool_wait_seconds", self.pool_wait)
+        lines.append("# TYPE flix_db_slow_queries_total counter")
+        lines.append(f"flix_db_slow_queries_total {self.slow_queries}")
+        for name, value in (pool_stats or {}).items():
+            lines.append(f"# TYPE flix_db_pool_{name} gauge")
+            lines.append(f"flix_db_pool_{name} {value}")
+        for name, value in (audit_stats or {}).items():
+            if name == "depth" or name.endswith("_seconds"):
+                lines.append(f"# TYPE flix_audit_{name} gauge")
+                lines.append(f"flix_audit_{name} {value}")
+            else:
+                lines.append(f"# TYPE flix_audit_{name}_total counter")
+                lines.append(f"flix_audit_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves the database metrics at /metrics for a local prometheus scraper"""
+
+    def __init__(self, metrics: DatabaseMetrics, storage, host: str = "127.0.0.1", port: int = 9464, audit=None):
+        """
+        :param metrics: The query metrics
+        :param storage: The Storage, for the pool gauges
+        :param host: The address to listen on
+        :param port: The port to listen on
+        :param audit: The AuditWriter, for the queue gauges
+        """
+        self.__metrics = metrics
+        self.__storage = storage
+        self.__audit = audit
+        self.__host = host
+        self.__port = port
+        self.__runner: Optional[web.AppRunner] = None
+
+    async def __handle(self, request: web.Request) -> web.Response:
+        audit_stats = self.__audit.stats() if self.__audit is not None else None
+        return web.Response(text=self.__metrics.render(self.__storage.pool_stats(), audit_stats),
+                            content_type="text/plain")
+
+    async def start(self):
+        if self.__runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.__handle)
+        self.__runner = web.AppRunner(app, access_log=None)
+        await self.__runner.setup()
+        await web.TCPSite(self.__runner, self.__host, self.__port).start()
+
+    async def close(self):
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
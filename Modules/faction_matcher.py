@@ -0,0 +1,83 @@
+import re
+from typing import Dict, Generic, List, Mapping, Optional, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-_.'][^\W_]+)*")
+"""A word. Punctuation around it is not part of it, hyphens and dots inside like in 'lspd-stv' are"""
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits the text into lower case words and drops the punctuation. 'pd, bitte!' becomes ['pd', 'bitte']"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class FactionMatcher(Generic[T]):
+    """
+    Finds the aliases in a tokenized message in a single pass.
+
+    Aliases of one word are looked up in a dict. Aliases of more words are stored in a trie over their words,
+    which is walked from each position of the message to find the longest alias starting there.
+    """
+
+    def __init__(self, aliases: Mapping[str, T]):
+        """
+        :param aliases: alias -> value. The aliases are tokenized like the messages
+        :raises Exception: when two aliases are the same after tokenizing
+        """
+        self.__single: Dict[str, T] = {}
+        self.__trie: Dict[str, dict] = {}
+        """word -> child node. The value of an alias that ends in a node is stored under the key None"""
+        self.__max_words = 1
+        for alias, value in aliases.items():
+            words = tokenize(alias)
+            if not words:
+                continue
+            if len(words) == 1:
+                if words[0] in self.__single:
+                    raise Exception("'aliases' müssen in der ganzen json-liste einzigartig sein!")
+                self.__single[words[0]] = value
+                continue
+            node = self.__trie
+            for word in words:
+                node = node.setdefault(word, {})
+            if None in node:
+                raise Exception("'aliases' müssen in der ganzen json-liste einzigartig sein!")
+            node[None] = value
+            self.__max_words = max(self.__max_words, len(words))
+
+    def match(self, tokens: List[str]) -> Tuple[int, Optional[T]]:
+        """
+        Counts the aliases in the words. Overlapping aliases count once, the longest one wins.
+        :param tokens: The words of the message from tokenize()
+        :return: The amount of found aliases and the value of the first one
+        """
+        matches = 0
+        first: Optional[T] = None
+        single = self.__single
+        trie = self.__trie
+        i = 0
+        while i < len(tokens):
+            length = 0
+            value = None
+            if trie:
+                node = trie
+                for j in range(i, min(len(tokens), i + self.__max_words)):
+                    node = node.get(tokens[j])
+                    if node is None:
+                        break
+                    if None in node:
+                        length = j - i + 1
+                        value = node[None]
+            if not length and tokens[i] in single:
+                length = 1
+                value = single[tokens[i]]
+            if length:
+                matches += 1
+                if first is None:
+                    first = value
+                i += length
+            else:
+                i += 1
+        return matches, first
@@ -0,0 +1,103 @@
+import csv
+import gzip
+import io
+import tempfile
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+
+SPOOL_MAX_MEMORY = 1024 * 1024
+"""Exports bigger than this amount of bytes are written into a temporary file instead of the memory"""
+
+GZIP_MIN_ROWS = 50_000
+"""Exports with at least this many rows are gzip compressed"""
+
+ESTIMATED_ROW_SIZE = 48
+"""Estimated amount of bytes of one csv row"""
+
+
+class RoleMemberIndex:
+    """
+    Member IDs per role, for the tracked roles only.
+
+    The index is build once from the member list and then kept up to date with the member events,
+    so listing the members of a role only touches the members that have the role.
+    """
+
+    def __init__(self):
+        self.__tracked_role_ids: FrozenSet[int] = frozenset()
+        self.__members: Dict[int, Set[int]] = {}
+
+    @property
+    def tracked_role_ids(self) -> FrozenSet[int]:
+        return self.__tracked_role_ids
+
+    def rebuild(self, tracked_role_ids: Iterable[int], members: Iterable):
+        """
+        Builds the index from scratch
+        :param tracked_role_ids: The roles to index
+        :param members: All members of the guild
+        """
+        tracked = frozenset(tracked_role_ids)
+        index: Dict[int, Set[int]] = {role_id: set() for role_id in tracked}
+        for member in members:
+            for role in member.roles:
+                if role.id in tracked:
+                    index[role.id].add(member.id)
+        # swap both at once, lookups never see a half build index
+        self.__tracked_role_ids, self.__members = tracked, index
+
+    def add_member(self, member):
+        for role in member.roles:
+            if role.id in self.__tracked_role_ids:
+                self.__members[role.id].add(member.id)
+
+    def remove_member(self, member):
+        for role in member.roles:
+            if role.id in self.__tracked_role_ids:
+                self.__members[role.id].discard(member.id)
+
+    def update_member(self, before, after):
+        """Applies the role changes between the two states of a member"""
+        before_ids = {r.id for r in before.roles}
+        after_ids = {r.id for r in after.roles}
+        for role_id in before_ids - after_ids:
+            if role_id in self.__tracked_role_ids:
+                self.__members[role_id].discard(after.id)
+        for role_id in after_ids - before_ids:
+            if role_id in self.__tracked_role_ids:
+                self.__members[role_id].add(after.id)
+
+    def member_ids(self, role_id: int) -> FrozenSet[int]:
+        """IDs of the members that have the role. Empty if the role is not tracked"""
+        return frozenset(self.__members.get(role_id, ()))
+
+
+role_members = RoleMemberIndex()
+"""Members of the faction member and OG roles"""
+
+
+def write_member_csv(rows: List[Tuple[str, int, str]], compress: Optional[bool] = None) -> Tuple[io.IOBase, str]:
+    """
+    Writes the member list row by row into a buffer. Big lists are written into a temporary file.
+    :param rows: (rank, discord id, display name) per member
+    :param compress: Whether to gzip the csv. Default is to compress lists with at least GZIP_MIN_ROWS rows
+    :return: The buffer at position 0 and its filename. The caller has to close the buffer
+    """
+    if compress is None:
+        compress = len(rows) >= GZIP_MIN_ROWS
+    if len(rows) * ESTIMATED_ROW_SIZE > SPOOL_MAX_MEMORY:
+        buffer = tempfile.TemporaryFile()
+    else:
+        buffer = io.BytesIO()
+
+    raw = gzip.GzipFile(fileobj=buffer, mode="wb", filename="mitglieder.csv") if compress else buffer
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    writer = csv.writer(text, lineterminator="\n")
+    writer.writerow(("Rang", "Discord ID", "Anzeigename"))
+    writer.writerows(rows)
+    text.flush()
+    text.detach()  # don't close the buffer together with the wrapper
+    if compress:
+        raw.close()  # writes the gzip trailer, leaves the buffer open
+    buffer.seek(0)
+    return buffer, "mitglieder.csv.gz" if compress else "mitglieder.csv"
@@ -1,13 +1,24 @@
 import asyncio
+import heapq
 import json
-from datetime import datetime
-from typing import List, Optional
+import time
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
 
 import discord
 
+from Modules.faction_matcher import FactionMatcher, tokenize
 
-faction_messages: List[int] = []
-"""Active faction messages that are right in the faction channel"""
+
+PENDING_REQUEST_LIFETIME = 600
+"""Seconds until an unanswered faction request gets deleted"""
+
+REQUEST_CLEANUP_INTERVAL = 60
+"""Seconds between the removals of the expired requests, so they don't pile up while no new requests come in"""
+
+REPLY_LIFETIME = 7
+"""Seconds until a reply of the bot gets deleted together with the message it answers"""
 
 
 class FactionContainer:
@@ -17,17 +28,22 @@ class FactionContainer:
         self.__aliases = aliases
 
     @property
-    def member_role_id(self):
+    def member_role_id(self) -> int:
         return self.__member_role_id
 
     @property
-    def og_role_ids(self):
+    def og_role_ids(self) -> FrozenSet[int]:
         return self.__og_role_ids
 
     @property
-    def aliases(self):
+    def aliases(self) -> Tuple[str, ...]:
         return self.__aliases
 
+    @property
+    def name(self) -> str:
+        """The display name of the faction, which is the first alias in the config"""
+        return self.__aliases[0]
+
     @classmethod
     def from_json(cls, data: dict):
         try:
@@ -38,19 +54,20 @@ class FactionContainer:
             raise Exception("'role' muss eine numerische Discord ID sein!")
 
         try:
-            og_role_ids = list(set(data["ogs"]))
+            og_role_ids = frozenset(int(og) for og in data["ogs"])
         except KeyError:
             raise Exception("'ogs'-liste in der faction-config nicht definiert")
-        except ValueError:
+        except (TypeError, ValueError):
             raise Exception("'ogs'-liste muss eine json-liste aus integer sein und konnte nicht geparsed werden!")
         if not og_role_ids:
             raise Exception("'ogs'-liste in der faction-config darf nicht leer sein")
 
         try:
-            aliases = list(set(data["aliases"]))
+            # dict.fromkeys removes duplicates but keeps the order, so the first alias stays the name
+            aliases = tuple(dict.fromkeys(data["aliases"]))
         except KeyError:
             raise Exception("'aliases'-liste in der faction-config nicht definiert")
-        except ValueError:
+        except (TypeError, ValueError):
             raise Exception("'aliases'-liste muss eine json-liste aus strings sein und konnte nicht geparsed werden!")
         if not aliases:
             raise Exception("'aliases'-liste in der faction-config darf nicht leer sein")
@@ -58,231 +75,474 @@ class FactionContainer:
         return cls(member_role_id, og_role_ids, aliases)
 
 
-class FactionConfig:
-    __log_channel_id: int = 0
-    __faction_chat_id: int = 0
-    __factions: List[FactionContainer] = []
+class FactionSnapshot:
+    """
+    A parsed faction config together with its lookup indexes.
 
-    @classmethod
-    def get_log_channel_id(cls) -> int:
-        return cls.__log_channel_id
+    A snapshot is never mutated after it was created. Reloading the config creates a new snapshot, so a handler
+    that holds a snapshot always sees one consistent config.
+    """
 
-    @classmethod
-    def get_faction_chat_id(cls) -> int:
-        return cls.__faction_chat_id
+    def __init__(self, log_channel_id: int, faction_chat_id: int, factions: Tuple[FactionContainer, ...]):
+        """
+        :raises Exception: when an alias is used more than once, also after ignoring case and punctuation
+        """
+        faction_by_alias: Dict[str, FactionContainer] = {}
+        factions_by_og_role_id: Dict[int, Set[FactionContainer]] = {}
+        faction_by_member_role_id: Dict[int, FactionContainer] = {}
+        for faction in factions:
+            for alias in faction.aliases:
+                # making sure the aliases are entirely unique
+                if alias in faction_by_alias:
+                    raise Exception("'aliases' müssen in der ganzen json-liste einzigartig sein!")
+                faction_by_alias[alias] = faction
+            for og_role_id in faction.og_role_ids:
+                factions_by_og_role_id.setdefault(og_role_id, set()).add(faction)
+            faction_by_member_role_id.setdefault(faction.member_role_id, faction)
+
+        self.__log_channel_id = log_channel_id
+        self.__faction_chat_id = faction_chat_id
+        self.__factions = factions
+        self.__faction_by_alias: Mapping[str, FactionContainer] = MappingProxyType(faction_by_alias)
+        self.__factions_by_og_role_id: Mapping[int, FrozenSet[FactionContainer]] = MappingProxyType(
+            {role_id: frozenset(facs) for role_id, facs in factions_by_og_role_id.items()})
+        self.__faction_by_member_role_id: Mapping[int, FactionContainer] = MappingProxyType(faction_by_member_role_id)
+        self.__matcher: FactionMatcher[FactionContainer] = FactionMatcher(faction_by_alias)
 
-    # @classmethod
-    # def get_factions(cls):
-    #     return cls.__factions
+    @property
+    def log_channel_id(self) -> int:
+        return self.__log_channel_id
 
-    @classmethod
-    def alias_exists(cls, alias: str) -> bool:
-        for faction in cls.__factions:
-            if alias in faction.aliases:
-                return True
-        return False
+    @property
+    def faction_chat_id(self) -> int:
+        return self.__faction_chat_id
 
-    @classmethod
-    def get_faction_by_alias(cls, alias: str) -> Optional[FactionContainer]:
-        for faction in cls.__factions:
-            if alias in faction.aliases:
-                return faction
-        return None
+    @property
+    def factions(self) -> Tuple[FactionContainer, ...]:
+        return self.__factions
+
+    @property
+    def role_ids(self) -> FrozenSet[int]:
+        """All member and OG role ids of the factions"""
+        return frozenset(self.__faction_by_member_role_id.keys()) | frozenset(self.__factions_by_og_role_id.keys())
+
+    def alias_exists(self, alias: str) -> bool:
+        return alias in self.__faction_by_alias
+
+    def match(self, tokens: List[str]) -> Tuple[int, Optional[FactionContainer]]:
+        """
+        Finds the faction aliases in a message
+        :param tokens: The words of the message from tokenize()
+        :return: The amount of found aliases and the first found faction
+        """
+        return self.__matcher.match(tokens)
+
+    def get_faction_by_alias(self, alias: str) -> Optional[FactionContainer]:
+        return self.__faction_by_alias.get(alias)
+
+    def get_faction_by_member_role_id(self, role_id: int) -> Optional[FactionContainer]:
+        return self.__faction_by_member_role_id.get(role_id)
 
     @staticmethod
     def is_og_of_faction(member: discord.Member, faction: FactionContainer) -> bool:
+        og_role_ids = faction.og_role_ids
         for member_role in member.roles:
-            if member_role.id in faction.og_role_ids:
+            if member_role.id in og_role_ids:
                 return True
         return False
 
-    @classmethod
-    def __get_factions_member_is_og_of(cls, member) -> List[FactionContainer]:
+    def get_factions_member_is_og_of(self, member) -> List[FactionContainer]:
         result = []
-        for fac in cls.__factions:
-            for role in member.roles:
-                if role.id in fac.og_role_ids:
+        seen = set()
+        for role in member.roles:
+            for fac in self.__factions_by_og_role_id.get(role.id, ()):
+                if fac not in seen:
+                    seen.add(fac)
                     result.append(fac)
         return result
 
-    @classmethod
-    def get_faction_names_member_is_og_of(cls, member) -> List[str]:
-        names = []
-        for f in cls.__get_factions_member_is_og_of(member):
-            names.append(f.aliases[0])
-        return names
+    def get_faction_names_member_is_og_of(self, member) -> List[str]:
+        return [f.name for f in self.get_factions_member_is_og_of(member)]
 
-    @classmethod
-    def get_faction_member_is_og_of_by_name(cls, member, faction_name: str) -> Optional[FactionContainer]:
-        for f in cls.__get_factions_member_is_og_of(member):
-            if f.aliases[0] == faction_name:
-                return f
-        return None
+    def get_faction_member_is_og_of_by_name(self, member, faction_name: str) -> Optional[FactionContainer]:
+        faction = self.__faction_by_alias.get(faction_name)
+        if faction is None or faction.name != faction_name or not self.is_og_of_faction(member, faction):
+            return None
+        return faction
 
     @classmethod
-    def parse(cls, filename: str):
+    def from_file(cls, filename: str):
         """
-        Reads the config file into the class data
+        Reads and validates the config file into a new snapshot
         :param filename: Filename of the config
         :raises Exception: when the faction config is invalid formed or the file is unreadable
         """
-        f = open(filename)
-        try:
-            data = json.load(f)
-        except json.decoder.JSONDecodeError:
-            raise Exception("faction-config hat einen syntaktischen fehler und kann nicht geparsed werden!")
+        with open(filename) as f:
+            try:
+                data = json.load(f)
+            except json.decoder.JSONDecodeError:
+                raise Exception("faction-config hat einen syntaktischen fehler und kann nicht geparsed werden!")
 
         try:
-            cls.__log_channel_id = int(data["log_channel_id"])
+            log_channel_id = int(data["log_channel_id"])
         except KeyError:
             raise Exception("'log_channel_id' in der faction-config nicht definiert")
         except ValueError:
             raise Exception("'log_channel_id' muss eine numerische Discord ID sein!")
 
         try:
-            cls.__faction_chat_id = int(data["faction_chat_id"])
+            faction_chat_id = int(data["faction_chat_id"])
         except KeyError:
             raise Exception("'faction_chat_id' in der faction-config nicht definiert")
         except ValueError:
             raise Exception("'faction_chat_id' muss eine numerische Discord ID sein!")
 
         try:
-            factions = list(data["factions"])
+            factions = tuple(FactionContainer.from_json(fn) for fn in list(data["factions"]))
         except KeyError:
             raise Exception("'factions'-liste in der faction-config nicht definiert")
-        except ValueError:
+        except (TypeError, ValueError):
             raise Exception("'factions'-liste ist keine json-liste und konnte nicht geparsed werden!")
-        else:
-            for fn in factions:
-                cls.__factions.append(FactionContainer.from_json(fn))
-        # making sure the aliases are entirely unique
-        used_aliases = []
-        for faction in cls.__factions:
-            for alias in faction.aliases:
-                if alias in used_aliases:
-                    raise Exception("'aliases' müssen in der ganzen json-liste einzigartig sein!")
-                used_aliases.append(alias)
 
-        f.close()
+        return cls(log_channel_id, faction_chat_id, factions)
+
+
+class FactionConfig:
+    """Holds the current FactionSnapshot. The class methods answer from the current snapshot."""
+    __snapshot: FactionSnapshot = FactionSnapshot(0, 0, ())
+
+    @classmethod
+    def snapshot(cls) -> FactionSnapshot:
+        """The current config. Handlers which do more than one lookup should hold on to one snapshot."""
+        return cls.__snapshot
+
+    @classmethod
+    def get_log_channel_id(cls) -> int:
+        return cls.__snapshot.log_channel_id
+
+    @classmethod
+    def get_faction_chat_id(cls) -> int:
+        return cls.__snapshot.faction_chat_id
+
+    @classmethod
+    def alias_exists(cls, alias: str) -> bool:
+        return cls.__snapshot.alias_exists(alias)
+
+    @classmethod
+    def get_faction_by_alias(cls, alias: str) -> Optional[FactionContainer]:
+        return cls.__snapshot.get_faction_by_alias(alias)
+
+    @classmethod
+    def get_faction_by_member_role_id(cls, role_id: int) -> Optional[FactionContainer]:
+        return cls.__snapshot.get_faction_by_member_role_id(role_id)
+
+    @staticmethod
+    def is_og_of_faction(member: discord.Member, faction: FactionContainer) -> bool:
+        return FactionSnapshot.is_og_of_faction(member, faction)
+
+    @classmethod
+    def get_faction_names_member_is_og_of(cls, member) -> List[str]:
+        return cls.__snapshot.get_faction_names_member_is_og_of(member)
+
+    @classmethod
+    def get_faction_member_is_og_of_by_name(cls, member, faction_name: str) -> Optional[FactionContainer]:
+        return cls.__snapshot.get_faction_member_is_og_of_by_name(member, faction_name)
 
+    @classmethod
+    def swap(cls, snapshot: FactionSnapshot):
+        """Replaces the current config with the snapshot"""
+        cls.__snapshot = snapshot
+
+    @classmethod
+    def parse(cls, filename: str):
+        """
+        Reads the config file into the class data
+        :param filename: Filename of the config
+        :raises Exception: when the faction config is invalid formed or the file is unreadable
+        """
+        cls.swap(FactionSnapshot.from_file(filename))
 
-def on_connect():
-    faction_messages.clear()
+    @classmethod
+    async def reload(cls, filename: str, loop) -> FactionSnapshot:
+        """
+        Reads the config file in an executor and swaps it in when it's valid.
+        The current config stays active when the new one is invalid.
+        :param filename: Filename of the config
+        :param loop: The event loop of the bot
+        :raises Exception: when the faction config is invalid formed or the file is unreadable
+        :return: The new snapshot
+        """
+        snapshot = await loop.run_in_executor(None, FactionSnapshot.from_file, filename)
+        cls.swap(snapshot)
+        return snapshot
+
+
+class PendingFactionRequest:
+    """A faction request message in the faction channel that is waiting for the reaction of an OG"""
+    __slots__ = ("message_id", "channel_id", "author_id", "faction_role_id", "expires_at")
+
+    def __init__(self, message_id: int, channel_id: int, author_id: int, faction_role_id: int, expires_at: float):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.faction_role_id = faction_role_id
+        """The member role id of the requested faction"""
+        self.expires_at = expires_at
+        """Unix timestamp when the request gets deleted"""
+
+
+class PendingFactionRequests:
+    """
+    Registry of the open faction requests.
+
+    Lookups are done by message id. Deleting the expired request messages is up to the MessageDeleter,
+    the registry drops its expired entries from a min-heap whenever a new request is stored
+    and every REQUEST_CLEANUP_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.__requests: Dict[int, PendingFactionRequest] = {}
+        self.__expiry_heap: List[Tuple[float, int]] = []
+        self.is_loaded = False
+        """Whether the requests were loaded from the database, they are kept up to date in memory after that"""
+
+    def __contains__(self, message_id: int) -> bool:
+        return self.get(message_id) is not None
+
+    def __len__(self) -> int:
+        return len(self.__requests)
+
+    def get(self, message_id: int) -> Optional[PendingFactionRequest]:
+        request = self.__requests.get(message_id)
+        if request is None or request.expires_at <= time.time():
+            return None
+        return request
+
+    def add(self, request: PendingFactionRequest):
+        self.__requests[request.message_id] = request
+        heapq.heappush(self.__expiry_heap, (request.expires_at, request.message_id))
+
+    def remove(self, message_id: int) -> Optional[PendingFactionRequest]:
+        """Removes the request. Its entry in the expiry heap is skipped when it comes due."""
+        return self.__requests.pop(message_id, None)
+
+    def clear(self):
+        self.__requests.clear()
+        self.__expiry_heap.clear()
+        self.is_loaded = False
+
+    def pop_expired(self, now: float) -> List[PendingFactionRequest]:
+        """Removes and returns all requests which are expired at the given unix time"""
+        expired = []
+        heap = self.__expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, message_id = heapq.heappop(heap)
+            request = self.__requests.get(message_id)
+            # skip entries of requests that were removed or replaced in the meantime
+            if request is not None and request.expires_at == expires_at:
+                del self.__requests[message_id]
+                expired.append(request)
+        return expired
+
+
+pending_requests = PendingFactionRequests()
+"""Active faction requests that are right in the faction channel"""
+
+_cleanup_task: Optional[asyncio.Task] = None
+
+
+async def reply_and_delete(bot: discord.Bot, message: discord.Message, **kwargs):
+    """Replies to the message and deletes the reply together with the message after REPLY_LIFETIME seconds"""
+    try:
+        reply = await message.reply(**kwargs)
+    except discord.HTTPException:
+        bot.message_deleter.schedule(message)
+        raise
+    bot.message_deleter.schedule(reply, REPLY_LIFETIME)
+    bot.message_deleter.schedule(message, REPLY_LIFETIME)
+
+
+def utc_datetime(timestamp: float) -> datetime:
+    """The unix timestamp as a naive datetime in UTC, like the DATETIME columns store it"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+async def prune_expired_requests(bot: discord.Bot, logging):
+    """Removes the expired requests from the registry and the database"""
+    expired = pending_requests.pop_expired(time.time())
+    if not expired:
+        return
+    try:
+        await bot.execute(
+            "DELETE FROM FactionRequest WHERE expires_at <= %s",
+            (utc_datetime(max(r.expires_at for r in expired)),),
+        )
+    except Exception as e:
+        logging.error("could not delete expired faction requests", exc_info=e)
+
+
+def start_request_cleanup(bot: discord.Bot, logging):
+    """Faction System. Starts the periodic removal of the expired requests if it's not already running"""
+    global _cleanup_task
+    if _cleanup_task is None or _cleanup_task.done():
+        _cleanup_task = bot.loop.create_task(_clean_up_requests(bot, logging))
+
+
+async def _clean_up_requests(bot: discord.Bot, logging):
+    while True:
+        await asyncio.sleep(REQUEST_CLEANUP_INTERVAL)
+        await prune_expired_requests(bot, logging)
+
+
+async def store_request(bot: discord.Bot, request: PendingFactionRequest, logging):
+    """Adds the request to the registry and persists it, so it survives a restart of the bot"""
+    await prune_expired_requests(bot, logging)
+    pending_requests.add(request)
+    bot.message_deleter.schedule_at(request.channel_id, request.message_id, request.expires_at)
+    try:
+        await bot.execute(
+            "INSERT INTO FactionRequest (message_id, channel_id, author_id, faction_role_id, expires_at) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (request.message_id, request.channel_id, request.author_id, request.faction_role_id,
+             utc_datetime(request.expires_at)),
+        )
+    except Exception as e:
+        logging.error("could not persist faction request", exc_info=e)
 
 
-async def clear_reactions_in_faction_channel(bot: discord.Bot):
-    """Faction System. Clears all reactions in the faction channel.
-    It goes through the history of the channel and remove each reaction"""
-    await bot.get_channel(FactionConfig.get_faction_chat_id()).purge()
+async def forget_request(bot: discord.Bot, message_id: int, logging):
+    """Removes the request from the registry and the database"""
+    if pending_requests.remove(message_id) is None:
+        return
+    try:
+        await bot.execute("DELETE FROM FactionRequest WHERE message_id = %s", (message_id,))
+    except Exception as e:
+        logging.error("could not delete faction request", exc_info=e)
 
 
-async def reacted_in_faction_channel(bot: discord.Bot, reaction: discord.Reaction, user: discord.Member, logging):
-    """Faction System. Should executed when someone reacts in the faction channel."""
-    if reaction.emoji != "✅" and reaction.emoji != "❌":
+async def load_pending_requests(bot: discord.Bot, logging):
+    """Faction System. Reloads the open requests from the database.
+    Messages of requests that expired while the bot was offline are deleted in bulk.
+    Only loads once, on a reconnect the registry is already up to date."""
+    if pending_requests.is_loaded:
         return
-    if (reaction.message.author.id == user.id or user.guild_permissions.administrator) and \
-            reaction.emoji == "❌":
-        await reaction.message.delete()
+    rows = await bot.fetchall(
+        "SELECT message_id, channel_id, author_id, faction_role_id, expires_at FROM FactionRequest")
+    pending_requests.is_loaded = True
+    now = time.time()
+    expired = 0
+    for (message_id, channel_id, author_id, faction_role_id, expires_at) in rows:
+        expires_at = expires_at.replace(tzinfo=timezone.utc).timestamp()
+        if expires_at <= now:
+            expired += 1
+        else:
+            pending_requests.add(PendingFactionRequest(message_id, channel_id, author_id, faction_role_id, expires_at))
+        # expired requests are due immediately, so the deleter removes them together
+        bot.message_deleter.schedule_at(channel_id, message_id, expires_at)
+    if expired:
+        await bot.execute("DELETE FROM FactionRequest WHERE expires_at <= %s", (utc_datetime(now),))
+    logging.info(f"loaded {len(rows) - expired} pending faction requests, {expired} expired")
+
+
+async def reacted_in_faction_channel(bot: discord.Bot, payload: discord.RawReactionActionEvent, logging):
+    """Faction System. Should executed when someone reacts in the faction channel.
+    Works with the raw event, so requests can also be answered when the message is not in the cache anymore."""
+    emoji = str(payload.emoji)
+    if emoji != "✅" and emoji != "❌":
+        return
+    snapshot = FactionConfig.snapshot()
+    user = payload.member
+    request = pending_requests.get(payload.message_id)
+    if request:
+        author_id = request.author_id
+    else:
+        cached_message = bot.get_message(payload.message_id)
+        author_id = cached_message.author.id if cached_message else None
+    if (author_id == user.id or user.guild_permissions.administrator) and emoji == "❌":
+        await forget_request(bot, payload.message_id, logging)
+        bot.message_deleter.schedule_at(payload.channel_id, payload.message_id, 0)
         return
-    if reaction.message.id not in faction_messages:
+    if not request:
         return
 
-    splitten_message = reaction.message.content.lower().split(" ")
-    matches: int = 0
-    faction = None
-    for peace in splitten_message:
-        if FactionConfig.alias_exists(peace):
-            matches += 1
-            if not faction:
-                faction = FactionConfig.get_faction_by_alias(peace)
-
-    if matches == 1:
-        if user.guild_permissions.administrator or FactionConfig.is_og_of_faction(user, faction):
-            if reaction.emoji == "✅":
-                r = reaction.message.guild.get_role(faction.member_role_id)
-                if r is None:
-                    logging.error(f"Role {faction.member_role_id} could not found")
-                    return
-                await reaction.message.author.add_roles(r, reason=f"{user.id} hat ihm "
-                                                                  f"die Fraktionsrolle zugewiesen")
+    faction = snapshot.get_faction_by_member_role_id(request.faction_role_id)
+    if faction is None:
+        # the faction was removed from the config in the meantime
+        await forget_request(bot, payload.message_id, logging)
+        bot.message_deleter.schedule_at(payload.channel_id, payload.message_id, 0)
+        return
+
+    if user.guild_permissions.administrator or snapshot.is_og_of_faction(user, faction):
+        r = None
+        if emoji == "✅":
+            r = user.guild.get_role(faction.member_role_id)
+            if r is None:
+                logging.error(f"Role {faction.member_role_id} could not found")
+                return
+        # answer the request before the role edit, so a concurrent reaction of another OG doesn't grant it twice
+        await forget_request(bot, payload.message_id, logging)
+        bot.message_deleter.schedule_at(payload.channel_id, payload.message_id, 0)
+        author = user.guild.get_member(request.author_id)
+        if r is not None and author is not None:
+            edited = await bot.role_queue.add(author, r, reason=f"{user.id} hat ihm "
+                                                                f"die Fraktionsrolle zugewiesen")
+            if edited:
                 dt_string: str = datetime.now().strftime("%H:%M:%S")
-                # noinspection PyBroadException
-                try:
-                    await bot.get_channel(FactionConfig.get_log_channel_id()).send(
-                        f"`{dt_string}` :green_circle: {reaction.message.author.mention} hat die Rolle "
-                        f"{r.mention} bekommen von {user.mention}",
-                        allowed_mentions=discord.AllowedMentions.none(),
-                    )
-                except Exception as e:
-                    logging.error("could not log message in faction log channel", exc_info=e)
-            await reaction.message.delete()
-    else:
-        await reaction.message.delete()
+                bot.faction_log.log(
+                    f"`{dt_string}` :green_circle: {author.mention} hat die Rolle "
+                    f"{r.mention} bekommen von {user.mention}"
+                )
 
 
 async def faction_message_has_send(bot: discord.Bot, message, config, logging):
     """Faction System. Should executed when someone has send a message in the faction channel."""
+    snapshot = FactionConfig.snapshot()
     # nachricht löschen wenn von einem bot gesendet
     if message.author.bot:
-        await message.delete()
+        bot.message_deleter.schedule(message)
         return
 
     # nachricht löschen wenn sie einen link enthält
     if "http" in message.content.lower():
-        await message.delete()
+        bot.message_deleter.schedule(message)
         return
 
     # nachricht löschen wenn sie mehr als eine mention enthält
     if len(message.mentions) > 1:
-        await message.reply(
+        await reply_and_delete(
+            bot, message,
             embed=discord.Embed(description=":hot_face: Nicht so viele User auf einmal"),
-            delete_after=7,
         )
-        await asyncio.sleep(7)
-        await message.delete()
         return
 
     if "@everyone" in message.system_content or "@here" in message.system_content:
-        await message.reply(
+        await reply_and_delete(
+            bot, message,
             embed=discord.Embed(description=":no_entry_sign: @everyone und @here ist nicht erlaubt"),
-            delete_after=7,
             allowed_mentions=discord.AllowedMentions(everyone=False),
         )
-        await asyncio.sleep(7)
-        await message.delete()
         return
 
     # nachrichten die länger als 100 zeichen lang sind, löschen
     if len(message.content) >= 100:
-        await message.delete()
+        bot.message_deleter.schedule(message)
         return
 
-    splitten_message = message.content.lower().split(" ")
+    splitten_message = tokenize(message.content)
 
     # lösche die nachricht wenn sie zu viele wörter hat
     if len(splitten_message) >= 10:
-        await message.delete()
+        bot.message_deleter.schedule(message)
         return
 
     # suche einen rang-alias-namen in der nachricht
-    matches: int = 0
-    faction = None
-    for peace in splitten_message:
-        if FactionConfig.alias_exists(peace):
-            matches += 1
-            if not faction:
-                faction = FactionConfig.get_faction_by_alias(peace)
+    matches, faction = snapshot.match(splitten_message)
 
     if matches == 0:
-        await message.reply(
+        await reply_and_delete(
+            bot, message,
             embed=discord.Embed(description=":x: Fraktion nicht gefunden"),
-            delete_after=7,
         )
-        await asyncio.sleep(7)
-        try:
-            await message.delete()
-        except discord.NotFound:
-            pass
         # debugging: logs messages that wont match a faction to improve the system
         # noinspection PyBroadException
         # try:
@@ -296,78 +556,81 @@ async def faction_message_has_send(bot: discord.Bot, message, config, logging):
                 target = message.author
                 if len(message.mentions) > 0:
                     target = message.mentions[0]
-                    if not FactionConfig.is_og_of_faction(message.author, faction) and \
+                    if not snapshot.is_og_of_faction(message.author, faction) and \
                             not message.author.guild_permissions.administrator and target.id != message.author.id:
-                        await message.reply(
+                        await reply_and_delete(
+                            bot, message,
                             embed=discord.Embed(description=f":no_entry_sign: Du kannst {target.display_name} "
                                                          f"die Rolle nicht wegnehmen"),
-                            delete_after=7,
                         )
-                        await asyncio.sleep(7)
-                        await message.delete()
                         return
 
                 r = message.guild.get_role(faction.member_role_id)
                 if r is None:
                     logging.error(f"Role {faction.member_role_id} could not found")
                     return
-                await target.remove_roles(r, reason=f"Hat die Fraktionsrolle "
-                                                    f"von {message.author.id} entfernt bekommen")
+                try:
+                    edited = await bot.role_queue.remove(target, r, reason=f"Hat die Fraktionsrolle "
+                                                                         f"von {message.author.id} entfernt bekommen")
+                except discord.HTTPException as e:
+                    logging.error(f"could not remove role {r.id} from {target.id}", exc_info=e)
+                    await reply_and_delete(
+                        bot, message,
+                        embed=discord.Embed(description=f":x: Die Rolle {r.mention} konnte nicht entfernt werden"),
+                        allowed_mentions=discord.AllowedMentions(everyone=False, users=False, roles=False)
+                    )
+                    return
+                if not edited:
+                    await reply_and_delete(
+                        bot, message,
+                        embed=discord.Embed(description=f":x: {target.mention} hat die Rolle {r.mention} nicht"),
+                        allowed_mentions=discord.AllowedMentions(everyone=False, users=False, roles=False)
+                    )
+                    return
                 dt_string: str = datetime.now().strftime("%H:%M:%S")
                 # noinspection PyBroadException
                 try:
                     if target.id != message.author.id:
-                        await message.reply(
+                        await reply_and_delete(
+                            bot, message,
                             embed=discord.Embed(description=f":white_check_mark: Du hast {target.mention} die Rolle "
                                                          f"{r.mention} entfernt"),
-                            delete_after=7,
                             allowed_mentions=discord.AllowedMentions(everyone=False, users=False, roles=False)
                         )
-                        await bot.get_channel(FactionConfig.get_log_channel_id()).send(
+                        bot.faction_log.log(
                             f"`{dt_string}` :red_circle: {target.mention} hat die Rolle {r.mention} "
-                            f"entfernt bekommen von {message.author.mention}",
-                            allowed_mentions=discord.AllowedMentions.none(),
+                            f"entfernt bekommen von {message.author.mention}"
                         )
                     else:
-                        await message.reply(
+                        await reply_and_delete(
+                            bot, message,
                             embed=discord.Embed(description=f":white_check_mark: Du hast dir die Rolle {r.mention} "
                                                          f"entfernt"),
-                            delete_after=7,
                             allowed_mentions=discord.AllowedMentions(everyone=False, users=False, roles=False)
                         )
-                        await bot.get_channel(FactionConfig.get_log_channel_id()).send(
-                            f"`{dt_string}` :red_circle: {target.mention} hat sich die Rolle {r.mention} entfernt",
-                            allowed_mentions=discord.AllowedMentions.none(),
+                        bot.faction_log.log(
+                            f"`{dt_string}` :red_circle: {target.mention} hat sich die Rolle {r.mention} entfernt"
                         )
                 except Exception as e:
                     logging.error("failed to complete removing faction role", exc_info=e)
-                await asyncio.sleep(7)
-                await message.delete()
                 return
         if message.mentions and message.mentions[0].id != message.author.id:
-            await message.reply(
+            await reply_and_delete(
+                bot, message,
                 embed=discord.Embed(description=f":x: {message.mentions[0].display_name} muss sich "
                                              f"selbst die Rolle anfordern"),
-                delete_after=7,
             )
-            await asyncio.sleep(7)
-            await message.delete()
             return
         await message.add_reaction("✅")
         await message.add_reaction("❌")
-        faction_messages.append(message.id)
         # delete after 10 minutes
-        await asyncio.sleep(600)
-        faction_messages.remove(message.id)
-        try:
-            await message.delete()
-        except discord.NotFound:
-            pass
+        await store_request(bot, PendingFactionRequest(
+            message.id, message.channel.id, message.author.id, faction.member_role_id,
+            time.time() + PENDING_REQUEST_LIFETIME,
+        ), logging)
         return
     else:
-        await message.reply(
+        await reply_and_delete(
+            bot, message,
             embed=discord.Embed(description=":hot_face: Nicht so viel auf einmal. Eine Rolle nach der anderen"),
-            delete_after=7,
         )
-        await asyncio.sleep(7)
-        await message.delete()
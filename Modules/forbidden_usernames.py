@@ -1,57 +1,225 @@
+import asyncio
 import configparser
-from typing import List
+import csv
+import functools
+import io
+import re
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Pattern, Tuple
 
 import discord
 import unidecode
 
 
+@functools.lru_cache(maxsize=8192)
+def normalize_name(name: str) -> str:
+    """Converts special characters of the username to ascii and lower cases it. Cached per raw username"""
+    try:
+        return unidecode.unidecode(name).lower()
+    except unidecode.UnidecodeError:
+        return name.lower()
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Builds a regex that matches any of the words. Common prefixes are shared, so the regex doesn't try
+    every word on its own at each position of the name"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        ends_here = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if ends_here else pattern
+
+    return build(trie)
+
+
+class ForbiddenNameMatcher:
+    """The forbidden names, normalized and compiled into one regex"""
+
+    def __init__(self, forbidden_names: Iterable[str]):
+        self.__names: Dict[str, str] = {}
+        """normalized name -> name like in the config"""
+        for name in forbidden_names:
+            normalized = normalize_name(name)
+            if normalized:
+                self.__names.setdefault(normalized, name)
+        self.__pattern: Optional[Pattern] = re.compile(_trie_pattern(self.__names)) if self.__names else None
+
+    def __len__(self) -> int:
+        return len(self.__names)
+
+    def find(self, username: str) -> Optional[str]:
+        """
+        Searches the username for a forbidden name
+        :return: The first forbidden name found, as written in the config, or None
+        """
+        if self.__pattern is None:
+            return None
+        match = self.__pattern.search(normalize_name(username))
+        if not match:
+            return None
+        return self.__names[match.group(0)]
+
+
+class ForbiddenUsernameConfig:
+    __matcher: ForbiddenNameMatcher = ForbiddenNameMatcher(())
+    __team_role_ids: FrozenSet[int] = frozenset()
+    __guild_id: int = 0
+    __log_channel_id: int = 0
+    __loaded: bool = False
+
+    @classmethod
+    def load(cls, config: configparser.ConfigParser):
+        """Compiles the forbidden names and reads the team roles from the config"""
+        cls.__matcher = ForbiddenNameMatcher(val for k, val in config.items("Forbidden-Usernames"))
+        cls.__team_role_ids = frozenset(int(val) for k, val in config.items("Team-Role-IDs"))
+        cls.__guild_id = int(config.get("Settings", "guild_id"))
+        cls.__log_channel_id = int(config.get("Settings", "main-log-channel-id"))
+        cls.__loaded = True
+
+    @classmethod
+    def is_loaded(cls) -> bool:
+        return cls.__loaded
+
+    @classmethod
+    def get_matcher(cls) -> ForbiddenNameMatcher:
+        return cls.__matcher
+
+    @classmethod
+    def get_team_role_ids(cls) -> FrozenSet[int]:
+        return cls.__team_role_ids
+
+    @classmethod
+    def get_guild_id(cls) -> int:
+        return cls.__guild_id
+
+    @classmethod
+    def get_log_channel_id(cls) -> int:
+        return cls.__log_channel_id
+
+
 async def on_user_update(before, after, bot: discord.Bot, logging, config: configparser.ConfigParser):
     """Check if the user has a forbidden username, and if so, it willo be kicked"""
     if (bot.user and bot.user.id == after.id) or after.bot:
         return
-    forbidden_usernames: List[str] = [val for k, val in config.items("Forbidden-Usernames")]
+    if not ForbiddenUsernameConfig.is_loaded():
+        ForbiddenUsernameConfig.load(config)
 
-    try:
-        decoded_name: str = unidecode.unidecode(after.name)
-    except unidecode.UnidecodeError:
-        logging.error("forbidden usernames: couldn't unidecode username")
-        decoded_name: str = after.name
-
-    for forbidden_name in forbidden_usernames:
-        if forbidden_name.lower() in decoded_name.lower():
-
-            guild = bot.get_guild(int(config.get("Settings", "guild_id")))
-            if guild:
-                member = guild.get_member(after.id)
-                if not member:
-                    logging.error("forbidden usernames: couldn't found guild-member by its ID")
-                    return
-            else:
-                logging.error("forbidden usernames: couldn't found guild by its ID")
-                return
-
-            # don't do anything if it's a team member
-            team_role_ids: List[int] = [int(val) for k, val in config.items("Team-Role-IDs")]
-            for role in member.roles:
-                if role.id in team_role_ids:
-                    return
-
-            logging.info(str(after.id) + " will be kicked due to a forbidden username")
-            # log message
-            embed = discord.Embed()
-            embed.description = f"{after.mention} got kicked due to a forbidden username: `{forbidden_name}`!"
-            embed.set_author(
-                name=f"{after.name}#{after.discriminator}",
-                icon_url=after.display_avatar
-            )
-            embed.set_thumbnail(url=after.display_avatar)
-            embed.set_footer(text=f"ID {after.id}")
-            embed.timestamp = discord.utils.utcnow()
-            embed.colour = discord.Colour.red()
-            if before.name != after.name or before.discriminator != after.discriminator:
-                embed.add_field(name="Before", value=f"{before.name}#{before.discriminator}", inline=True)
-                embed.add_field(name="After", value=f"{after.name}#{after.discriminator}", inline=True)
-            await bot.get_channel(int(config.get("Settings", "main-log-channel-id"))).send(embed=embed)
-
-            await member.kick(reason="Automated kick due to a forbidden username")
+    forbidden_name = ForbiddenUsernameConfig.get_matcher().find(after.name)
+    if forbidden_name is None:
+        return
+
+    guild = bot.get_guild(ForbiddenUsernameConfig.get_guild_id())
+    if guild:
+        member = guild.get_member(after.id)
+        if not member:
+            logging.error("forbidden usernames: couldn't found guild-member by its ID")
             return
+    else:
+        logging.error("forbidden usernames: couldn't found guild by its ID")
+        return
+
+    # don't do anything if it's a team member
+    team_role_ids = ForbiddenUsernameConfig.get_team_role_ids()
+    for role in member.roles:
+        if role.id in team_role_ids:
+            return
+
+    logging.info(str(after.id) + " will be kicked due to a forbidden username")
+    # log message
+    embed = discord.Embed()
+    embed.description = f"{after.mention} got kicked due to a forbidden username: `{forbidden_name}`!"
+    embed.set_author(
+        name=f"{after.name}#{after.discriminator}",
+        icon_url=after.display_avatar
+    )
+    embed.set_thumbnail(url=after.display_avatar)
+    embed.set_footer(text=f"ID {after.id}")
+    embed.timestamp = discord.utils.utcnow()
+    embed.colour = discord.Colour.red()
+    if before.name != after.name or before.discriminator != after.discriminator:
+        embed.add_field(name="Before", value=f"{before.name}#{before.discriminator}", inline=True)
+        embed.add_field(name="After", value=f"{after.name}#{after.discriminator}", inline=True)
+    await bot.get_channel(ForbiddenUsernameConfig.get_log_channel_id()).send(embed=embed)
+
+    await member.kick(reason="Automated kick due to a forbidden username")
+
+
+SWEEP_CHUNK_SIZE = 500
+"""Members checked before the sweep gives the event loop back to other tasks"""
+
+
+async def find_forbidden_members(members: Iterable[discord.Member]) -> List[Tuple[discord.Member, str]]:
+    """
+    Checks all members for forbidden usernames. Bots and team members are skipped.
+    Runs in chunks so the event loop stays responsive on big guilds.
+    :return: (member, forbidden name) of each member with a forbidden username
+    """
+    matcher = ForbiddenUsernameConfig.get_matcher()
+    team_role_ids = ForbiddenUsernameConfig.get_team_role_ids()
+    hits = []
+    for i, member in enumerate(members):
+        if i and i % SWEEP_CHUNK_SIZE == 0:
+            await asyncio.sleep(0)
+        if member.bot:
+            continue
+        forbidden_name = matcher.find(member.name)
+        if forbidden_name is None:
+            continue
+        if any(role.id in team_role_ids for role in member.roles):
+            continue
+        hits.append((member, forbidden_name))
+    return hits
+
+
+def sweep_report(hits: List[Tuple[discord.Member, str]]) -> bytes:
+    """A csv report of the members found by find_forbidden_members()"""
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator="\n")
+    writer.writerow(("Discord ID", "Name", "Anzeigename", "Verbotener Name"))
+    writer.writerows((m.id, m.name, m.display_name, forbidden_name) for m, forbidden_name in hits)
+    return text.getvalue().encode("utf-8")
+
+
+async def kick_members(hits: List[Tuple[discord.Member, str]], logging,
+                       on_progress: Callable[[int, int], Awaitable[None]], concurrency: int = 2,
+                       progress_interval: float = 3.0) -> Tuple[int, int]:
+    """
+    Kicks the members with a bounded amount of concurrent requests. py-cord waits on rate limits by itself,
+    the bound keeps the sweep from flooding the kick bucket.
+    :param hits: The members from find_forbidden_members()
+    :param logging: The logger
+    :param on_progress: Called with (done, total) at most every `progress_interval` seconds
+    :param concurrency: Maximum amount of parallel kick requests
+    :param progress_interval: Seconds between progress updates
+    :return: Amount of kicked and failed members
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    kicked = failed = 0
+    last_progress = 0.0
+    loop = asyncio.get_running_loop()
+
+    async def kick(member: discord.Member):
+        nonlocal kicked, failed, last_progress
+        async with semaphore:
+            try:
+                await member.kick(reason="Automated kick due to a forbidden username")
+                kicked += 1
+            except discord.HTTPException as e:
+                logging.error(f"forbidden usernames: couldn't kick {member.id}", exc_info=e)
+                failed += 1
+        if loop.time() - last_progress >= progress_interval:
+            last_progress = loop.time()
+            await on_progress(kicked + failed, len(hits))
+
+    await asyncio.gather(*(kick(member) for member, _ in hits))
+    return kicked, failed
@@ -0,0 +1,133 @@
+import asyncio
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+import discord
+
+
+MESSAGE_LIMIT = 2000
+"""Maximum amount of characters of a discord message"""
+
+
+class ChannelLogSink:
+    """
+    Buffers log lines for a channel and sends them as one combined message.
+
+    The buffer is flushed every `interval` seconds or as soon as the buffered lines fill a whole message,
+    whichever comes first. At most `max_lines` lines are buffered, the oldest lines are dropped beyond that.
+    """
+
+    def __init__(self, bot: discord.Bot, get_channel_id: Callable[[], int], interval: float = 5.0,
+                 max_lines: int = 500):
+        """
+        :param bot: The bot
+        :param get_channel_id: Returns the id of the channel to log into at the time of the flush
+        :param interval: Maximum amount of seconds a line is buffered
+        :param max_lines: Maximum amount of buffered lines
+        """
+        self.__bot = bot
+        self.__get_channel_id = get_channel_id
+        self.__interval = interval
+        self.__lines: Deque[str] = deque(maxlen=max_lines)
+        self.__buffered_chars = 0
+        self.__pending = asyncio.Event()
+        self.__full = asyncio.Event()
+        self.__lock = asyncio.Lock()
+        self.__task: Optional[asyncio.Task] = None
+        self.__closing = False
+        self.__logging = None
+        self.lines_buffered = 0
+        """Amount of lines that were handed to the sink"""
+        self.lines_flushed = 0
+        """Amount of lines that were sent to the channel"""
+        self.lines_dropped = 0
+        """Amount of lines that were lost, because the buffer was full or the channel couldn't be written"""
+        self.messages_sent = 0
+        """Amount of messages sent to the channel"""
+
+    def __len__(self) -> int:
+        return len(self.__lines)
+
+    def log(self, line: str):
+        """Buffers the line. It will be sent with the next flush"""
+        if len(line) > MESSAGE_LIMIT:
+            line = line[:MESSAGE_LIMIT - 2] + ".."
+        if len(self.__lines) == self.__lines.maxlen:
+            self.__buffered_chars -= len(self.__lines[0]) + 1
+            self.lines_dropped += 1
+        self.__lines.append(line)
+        self.__buffered_chars += len(line) + 1
+        self.lines_buffered += 1
+        self.__pending.set()
+        if self.__buffered_chars >= MESSAGE_LIMIT:
+            self.__full.set()
+
+    def start(self, logging):
+        """Starts the flush task if it's not already running"""
+        self.__logging = logging
+        self.__closing = False
+        if self.__task is None or self.__task.done():
+            self.__task = self.__bot.loop.create_task(self.__run())
+
+    async def __run(self):
+        while not self.__closing:
+            await self.__pending.wait()
+            try:
+                await asyncio.wait_for(self.__full.wait(), self.__interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        """Sends all buffered lines, packed into as few messages as possible"""
+        async with self.__lock:
+            lines = list(self.__lines)
+            self.__lines.clear()
+            self.__buffered_chars = 0
+            self.__pending.clear()
+            self.__full.clear()
+            if not lines:
+                return
+
+            messages: List[List[str]] = [[]]
+            length = 0
+            for line in lines:
+                if messages[-1] and length + len(line) + 1 > MESSAGE_LIMIT:
+                    messages.append([])
+                    length = 0
+                messages[-1].append(line)
+                length += len(line) + 1
+
+            channel = self.__bot.get_channel(self.__get_channel_id())
+            for message_lines in messages:
+                try:
+                    if channel is None:
+                        raise Exception("log channel not found")
+                    await channel.send("\n".join(message_lines), allowed_mentions=discord.AllowedMentions.none())
+                except Exception as e:
+                    self.lines_dropped += len(message_lines)
+                    if self.__logging:
+                        self.__logging.error("could not send buffered log lines", exc_info=e)
+                else:
+                    self.lines_flushed += len(message_lines)
+                    self.messages_sent += 1
+
+    async def close(self, timeout: float = 10.0):
+        """
+        Stops the flush task and sends the remaining lines.
+        A flush which is sending lines is awaited, so they aren't lost. The task is only cancelled after the timeout
+        :param timeout: Seconds to wait for the flush task
+        """
+        if self.__task is not None:
+            self.__closing = True
+            # wakes the task up, it flushes once more and stops
+            self.__pending.set()
+            self.__full.set()
+            # noinspection PyBroadException
+            try:
+                await asyncio.wait_for(self.__task, timeout)
+            except Exception as e:
+                if self.__logging:
+                    self.__logging.error("the log flush task didn't stop cleanly", exc_info=e)
+            self.__task = None
+        await self.flush()
@@ -0,0 +1,79 @@
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+LOOKUP_DEADLINE = 2.5
+"""Seconds the lookups of a command may take, an interaction must be answered within 3 seconds"""
+
+
+async def gather_with_deadline(*awaitables: Awaitable, deadline: float = LOOKUP_DEADLINE) -> List:
+    """
+    Runs independent lookups concurrently.
+    A lookup that fails or doesn't finish within the deadline doesn't affect the others.
+    :param awaitables: The lookups
+    :param deadline: Seconds after which unfinished lookups are cancelled
+    :return: The result of each lookup in order, or the exception it raised (asyncio.TimeoutError after the deadline)
+    """
+    return await asyncio.gather(*(asyncio.wait_for(a, deadline) for a in awaitables), return_exceptions=True)
+
+
+class TTLCache(Generic[T]):
+    """
+    Caches the results of an async lookup for a few seconds.
+    Concurrent lookups of the same key share one request. Failed lookups aren't cached.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 256):
+        """
+        :param ttl: Seconds a result stays valid
+        :param max_size: Maximum amount of cached keys, the oldest are dropped first
+        """
+        self.__ttl = ttl
+        self.__max_size = max_size
+        self.__entries: OrderedDict[Hashable, tuple] = OrderedDict()
+        """key -> (expires at, task of the lookup)"""
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drops the cached result of the key, or of all keys"""
+        if key is None:
+            self.__entries.clear()
+        else:
+            self.__entries.pop(key, None)
+
+    async def get(self, key: Hashable, lookup: Callable[[], Awaitable[T]]) -> T:
+        """
+        The cached result for the key, or the result of the lookup which is then cached
+        :raises Exception: what the lookup raised
+        """
+        now = time.monotonic()
+        entry = self.__entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            self.__entries.move_to_end(key)
+            task = entry[1]
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(lookup())
+            task.add_done_callback(functools.partial(self.__done, key))
+            self.__entries[key] = (now + self.__ttl, task)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+        # shielded, so a caller running into its deadline doesn't cancel the request for the other callers
+        return await asyncio.shield(task)
+
+    def __done(self, key: Hashable, task: asyncio.Future):
+        if task.cancelled() or task.exception() is not None:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[1] is task:
+                del self.__entries[key]
@@ -0,0 +1,140 @@
+import asyncio
+import datetime
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+import discord
+
+
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14, minutes=-5)
+"""Discord only bulk deletes messages younger than 14 days. 5 minutes tolerance for clock differences"""
+
+BULK_DELETE_LIMIT = 100
+"""Maximum amount of messages per bulk delete request"""
+
+
+class MessageDeleter:
+    """
+    Deletes messages after a deadline.
+
+    Handlers hand their messages over with schedule() and return immediately. A single task waits for the
+    next deadline, groups all due messages per channel and deletes them with bulk deletes.
+    Messages older than 14 days are deleted one by one, as discord doesn't allow bulk deletes for them.
+    """
+
+    def __init__(self, bot: discord.Bot):
+        self.__bot = bot
+        self.__deadlines: Dict[int, Tuple[float, int]] = {}
+        """message id -> (deadline, channel id)"""
+        self.__heap: List[Tuple[float, int]] = []
+        self.__wakeup = asyncio.Event()
+        self.__task: Optional[asyncio.Task] = None
+        self.bulk_requests = 0
+        """Amount of bulk delete requests sent"""
+        self.single_requests = 0
+        """Amount of single delete requests sent"""
+
+    def __len__(self) -> int:
+        return len(self.__deadlines)
+
+    def schedule(self, message, delay: float = 0):
+        """
+        Deletes the message after the delay. Scheduling an already scheduled message moves its deadline.
+        :param message: The message or partial message to delete
+        :param delay: Seconds from now until the message gets deleted
+        """
+        self.schedule_at(message.channel.id, message.id, time.time() + delay)
+
+    def schedule_at(self, channel_id: int, message_id: int, deadline: float):
+        """
+        Deletes the message at the unix timestamp
+        :param channel_id: ID of the channel the message is in
+        :param message_id: ID of the message to delete
+        :param deadline: Unix timestamp when the message should be deleted
+        """
+        self.__deadlines[message_id] = (deadline, channel_id)
+        heapq.heappush(self.__heap, (deadline, message_id))
+        if self.__heap[0][1] == message_id:
+            self.__wakeup.set()
+
+    def cancel(self, message_id: int):
+        """Don't delete the message. Its entry in the heap is skipped when it comes due."""
+        self.__deadlines.pop(message_id, None)
+
+    def start(self, logging):
+        """Starts the deletion task if it's not already running"""
+        if self.__task is None or self.__task.done():
+            self.__task = self.__bot.loop.create_task(self.__run(logging))
+
+    def __pop_due(self, now: float) -> Dict[int, List[int]]:
+        """Removes all due messages and returns their ids grouped by channel id"""
+        due: Dict[int, List[int]] = {}
+        heap = self.__heap
+        while heap and heap[0][0] <= now:
+            deadline, message_id = heapq.heappop(heap)
+            entry = self.__deadlines.get(message_id)
+            # skip entries which were cancelled or rescheduled in the meantime
+            if entry is not None and entry[0] == deadline:
+                del self.__deadlines[message_id]
+                due.setdefault(entry[1], []).append(message_id)
+        return due
+
+    async def __run(self, logging):
+        while True:
+            self.__wakeup.clear()
+            timeout = None
+            if self.__heap:
+                timeout = max(0.0, self.__heap[0][0] - time.time())
+            try:
+                await asyncio.wait_for(self.__wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            for channel_id, message_ids in self.__pop_due(time.time()).items():
+                # noinspection PyBroadException
+                try:
+                    await self.delete_messages(channel_id, message_ids)
+                except Exception as e:
+                    logging.error(f"could not delete messages in channel {channel_id}", exc_info=e)
+
+    async def delete_messages(self, channel_id: int, message_ids: List[int]) -> List[int]:
+        """
+        Deletes the messages in the channel. Bulk deletes where possible, single deletes for old messages.
+        Messages that are already deleted or can't be deleted are skipped.
+        :return: The ids of the messages which were deleted
+        """
+        channel = self.__bot.get_channel(channel_id)
+        if channel is None:
+            return []
+        bulk_min_time = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        young = []
+        old = []
+        for message_id in message_ids:
+            if discord.utils.snowflake_time(message_id) > bulk_min_time:
+                young.append(channel.get_partial_message(message_id))
+            else:
+                old.append(channel.get_partial_message(message_id))
+
+        deleted = []
+        for i in range(0, len(young), BULK_DELETE_LIMIT):
+            chunk = young[i:i + BULK_DELETE_LIMIT]
+            if len(chunk) == 1:
+                old.append(chunk[0])
+                continue
+            try:
+                await channel.delete_messages(chunk)
+                self.bulk_requests += 1
+                deleted.extend(m.id for m in chunk)
+            except discord.HTTPException:
+                # e.g. a message of the chunk was already deleted
+                old.extend(chunk)
+
+        for partial_message in old:
+            try:
+                self.single_requests += 1
+                await partial_message.delete()
+                deleted.append(partial_message.id)
+            except discord.HTTPException:
+                # already deleted or not allowed, the other messages are deleted anyway
+                pass
+        return deleted
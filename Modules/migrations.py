@@ -0,0 +1,106 @@
+import hashlib
+import os
+import re
+from typing import List, NamedTuple
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "migrations")
+"""Directory with the migration files, named like 0001_description.sql.
+A file like 0001_description.sqlite.sql replaces the migration for that sql dialect"""
+
+MIGRATION_LOCK = "flix_bot_schema_migration"
+"""Name of the database lock, so that only one bot instance migrates at a time"""
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+?)(?:\.(mariadb|sqlite))?\.sql$")
+
+SCHEMA_MIGRATION_TABLE = {
+    "mariadb": """
+        CREATE TABLE IF NOT EXISTS SchemaMigration (
+            version    INT UNSIGNED NOT NULL PRIMARY KEY COMMENT 'Version from the file name',
+            name       VARCHAR(255) NOT NULL COMMENT 'Description from the file name',
+            checksum   CHAR(64)     NOT NULL COMMENT 'SHA-256 of the file when it was applied',
+            applied_at TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP() COMMENT 'in UTC'
+        ) COMMENT 'Applied schema migrations'
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS SchemaMigration (
+            version    INTEGER      NOT NULL PRIMARY KEY,
+            name       VARCHAR(255) NOT NULL,
+            checksum   CHAR(64)     NOT NULL,
+            applied_at TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+}
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: str
+
+
+def discover_migrations(dialect: str, directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """
+    The migration files of the directory for the sql dialect, ordered by their version
+    :raises Exception: when two files have the same version
+    """
+    generic = {}
+    specific = {}
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if not match or match.group(3) not in (None, dialect):
+            continue
+        version = int(match.group(1))
+        migrations = specific if match.group(3) else generic
+        if version in migrations:
+            raise Exception(f"migration version {version} exists twice")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename))
+    generic.update(specific)
+    return [generic[v] for v in sorted(generic)]
+
+
+def split_statements(sql: str) -> List[str]:
+    """Splits a sql script into its statements. Lines starting with -- or # are comments"""
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith(("--", "#"))]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+async def migrate(storage, logging, directory: str = MIGRATIONS_DIR, lock_timeout: int = 60) -> List[Migration]:
+    """
+    Applies the migrations which aren't applied yet in the order of their versions.
+    The applied versions are stored in the SchemaMigration table.
+    :param storage: The Storage
+    :param logging: The logger
+    :param directory: Directory with the migration files
+    :param lock_timeout: Seconds to wait for another instance which is migrating
+    :return: The applied migrations
+    :raises Exception: when the lock couldn't be acquired or a migration failed
+    """
+    migrations = discover_migrations(storage.dialect, directory)
+    applied = []
+    async with storage.session() as session:
+        (locked,) = await session.fetchone("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, lock_timeout))
+        if locked != 1:
+            raise Exception("couldn't acquire the schema migration lock")
+        try:
+            await session.execute(SCHEMA_MIGRATION_TABLE[storage.dialect])
+            done = dict(await session.fetchall("SELECT version, checksum FROM SchemaMigration"))
+            for migration in migrations:
+                with open(migration.path, encoding="utf-8") as f:
+                    sql = f.read()
+                checksum = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+                if migration.version in done:
+                    if done[migration.version] != checksum:
+                        logging.warning(f"migration {migration.version} was changed after it was applied")
+                    continue
+                logging.info(f"applying migration {migration.version} {migration.name}")
+                for statement in split_statements(sql):
+                    await session.execute(statement)
+                await session.execute(
+                    "INSERT INTO SchemaMigration (version, name, checksum) VALUES (%s, %s, %s)",
+                    (migration.version, migration.name, checksum),
+                )
+                applied.append(migration)
+        finally:
+            await session.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+    return applied
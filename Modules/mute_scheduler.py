@@ -0,0 +1,231 @@
+import asyncio
+import datetime
+import heapq
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import discord
+
+from Modules.timeouts import DISCORD_TIMEOUT_LIMIT
+
+
+RENEW_LEAD_TIME = 3600
+"""Seconds before the discord timeout lapses when it gets renewed"""
+
+RETRY_DELAY = 60
+"""Seconds to wait before a failed renewal is tried again"""
+
+
+def _to_timestamp(value: datetime.datetime) -> float:
+    """Unix timestamp of a datetime from the database, which is naive and in UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+class ScheduledMute:
+    __slots__ = ("member_id", "ends_at", "reason", "renew_at")
+
+    def __init__(self, member_id: int, ends_at: float, reason: Optional[str]):
+        self.member_id = member_id
+        self.ends_at = ends_at
+        """Unix timestamp when the mute really ends"""
+        self.reason = reason
+        self.renew_at: Optional[float] = None
+        """Unix timestamp of the next renewal. None while the member isn't on the server"""
+
+
+class MuteScheduler:
+    """
+    Keeps mutes alive which are longer than discord's 28 day timeout limit.
+
+    The real end of each long mute is stored in the ScheduledMute table. A single task waits for the next
+    renewal in a min-heap and renews the discord timeout shortly before it lapses. The renewals run with a bounded
+    amount of concurrent requests, so many mutes coming due at once don't burst the API.
+    """
+
+    def __init__(self, bot: discord.Bot, guild_id: int, concurrency: int = 3, lead_time: float = RENEW_LEAD_TIME):
+        """
+        :param bot: The bot
+        :param guild_id: ID of the guild the mutes are in
+        :param concurrency: Maximum amount of parallel renewals
+        :param lead_time: Seconds before the discord timeout lapses when it gets renewed
+        """
+        self.__bot = bot
+        self.__guild_id = guild_id
+        self.__lead_time = lead_time
+        self.__mutes: Dict[int, ScheduledMute] = {}
+        """member id -> mute"""
+        self.__heap: List[Tuple[float, int]] = []
+        self.__wakeup = asyncio.Event()
+        self.__semaphore = asyncio.Semaphore(concurrency)
+        self.__renewals: Set[asyncio.Task] = set()
+        self.__task: Optional[asyncio.Task] = None
+        self.__logging = None
+        self.renewed = 0
+        """Amount of renewed timeouts"""
+        self.failed = 0
+        """Amount of failed renewals"""
+
+    def __len__(self) -> int:
+        return len(self.__mutes)
+
+    def ends_at(self, member_id: int) -> Optional[datetime.datetime]:
+        """The real end of the member's long mute, or None if the member has no long mute"""
+        mute = self.__mutes.get(member_id)
+        if mute is None:
+            return None
+        return datetime.datetime.fromtimestamp(mute.ends_at, datetime.timezone.utc)
+
+    def __push(self, mute: ScheduledMute, renew_at: float):
+        mute.renew_at = renew_at
+        heapq.heappush(self.__heap, (renew_at, mute.member_id))
+        if self.__heap[0][1] == mute.member_id:
+            self.__wakeup.set()
+
+    async def schedule(self, member: discord.Member, ends_at: datetime.datetime,
+                       discord_ends_at: datetime.datetime, reason: Optional[str] = None):
+        """
+        Stores a long mute. The member must already be timed out until `discord_ends_at`.
+        Replaces an older long mute of the member.
+        :param member: The muted member
+        :param ends_at: The real end of the mute
+        :param discord_ends_at: The end of the current discord timeout
+        :param reason: The reason which is used for the renewals
+        """
+        mute = ScheduledMute(member.id, ends_at.timestamp(), reason)
+        self.__mutes[member.id] = mute
+        self.__push(mute, discord_ends_at.timestamp() - self.__lead_time)
+        await self.__bot.execute(
+            "REPLACE INTO ScheduledMute (guild_id, member_id, ends_at, reason) VALUES (%s, %s, %s, %s)",
+            (self.__guild_id, member.id, ends_at.astimezone(datetime.timezone.utc).replace(tzinfo=None), reason),
+        )
+
+    async def cancel(self, member_id: int):
+        """Forgets the long mute of the member. Its entry in the heap is skipped when it comes due"""
+        if self.__mutes.pop(member_id, None) is None:
+            return
+        await self.__bot.execute(
+            "DELETE FROM ScheduledMute WHERE guild_id = %s AND member_id = %s",
+            (self.__guild_id, member_id),
+        )
+
+    async def after_timeout(self, member: discord.Member, ends_at: datetime.datetime,
+                            discord_ends_at: datetime.datetime, reason: Optional[str], logging) -> bool:
+        """
+        Call after the member was timed out. Stores the mute if it is longer than the discord timeout,
+        otherwise forgets an older long mute of the member.
+        Database errors are logged and not raised, as the timeout already happened. The renewals of a long mute
+        still run until the bot restarts.
+        :return: Whether the database was updated
+        """
+        try:
+            if ends_at > discord_ends_at:
+                await self.schedule(member, ends_at, discord_ends_at, reason)
+            else:
+                await self.cancel(member.id)
+        except Exception as e:
+            logging.error(f"could not store the scheduled mute of {member.id}", exc_info=e)
+            return False
+        return True
+
+    async def load(self, guild: discord.Guild):
+        """Rebuilds the heap from the database. Members with a lapsed timeout are renewed right away"""
+        rows = await self.__bot.fetchall(
+            "SELECT member_id, ends_at, reason FROM ScheduledMute WHERE guild_id = %s AND ends_at > UTC_TIMESTAMP()",
+            (self.__guild_id,),
+        )
+        now = time.time()
+        self.__mutes.clear()
+        self.__heap = []
+        for member_id, ends_at, reason in rows:
+            mute = self.__mutes[member_id] = ScheduledMute(member_id, _to_timestamp(ends_at), reason)
+            member = guild.get_member(member_id)
+            if member is not None and member.timed_out:
+                mute.renew_at = member.communication_disabled_until.timestamp() - self.__lead_time
+            else:
+                mute.renew_at = now
+            self.__heap.append((mute.renew_at, member_id))
+        heapq.heapify(self.__heap)
+        self.__wakeup.set()
+        await self.__bot.execute(
+            "DELETE FROM ScheduledMute WHERE guild_id = %s AND ends_at <= UTC_TIMESTAMP()",
+            (self.__guild_id,),
+        )
+
+    def start(self, logging):
+        """Starts the renewal task if it's not already running"""
+        self.__logging = logging
+        if self.__task is None or self.__task.done():
+            self.__task = self.__bot.loop.create_task(self.__run())
+
+    def on_member_join(self, member: discord.Member):
+        """Mutes a member with a long mute again after rejoining"""
+        mute = self.__mutes.get(member.id)
+        if mute is not None:
+            self.__push(mute, time.time())
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        """Forgets the long mute if a moderator removed the timeout by hand"""
+        if after.id in self.__mutes and before.communication_disabled_until is not None and \
+                after.communication_disabled_until is None:
+            await self.cancel(after.id)
+
+    def __pop_due(self, now: float) -> List[ScheduledMute]:
+        due = []
+        heap = self.__heap
+        while heap and heap[0][0] <= now:
+            renew_at, member_id = heapq.heappop(heap)
+            mute = self.__mutes.get(member_id)
+            # skip entries which were cancelled or rescheduled in the meantime
+            if mute is not None and mute.renew_at == renew_at:
+                due.append(mute)
+        return due
+
+    async def __run(self):
+        while True:
+            self.__wakeup.clear()
+            timeout = None
+            if self.__heap:
+                timeout = max(0.0, self.__heap[0][0] - time.time())
+            try:
+                await asyncio.wait_for(self.__wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            for mute in self.__pop_due(time.time()):
+                task = self.__bot.loop.create_task(self.__renew(mute))
+                self.__renewals.add(task)
+                task.add_done_callback(self.__renewals.discard)
+
+    async def __renew(self, mute: ScheduledMute):
+        async with self.__semaphore:
+            if self.__mutes.get(mute.member_id) is not mute:
+                return
+            now = time.time()
+            if mute.ends_at <= now:
+                await self.cancel(mute.member_id)
+                return
+            guild = self.__bot.get_guild(self.__guild_id)
+            member = guild.get_member(mute.member_id) if guild else None
+            if member is None:
+                # renewed by on_member_join
+                mute.renew_at = None
+                return
+            until = min(mute.ends_at, now + DISCORD_TIMEOUT_LIMIT)
+            try:
+                await member.timeout(datetime.datetime.fromtimestamp(until, datetime.timezone.utc),
+                                     reason=mute.reason)
+            except discord.HTTPException as e:
+                self.failed += 1
+                if self.__logging:
+                    self.__logging.error(f"couldn't renew the timeout of {mute.member_id}", exc_info=e)
+                self.__push(mute, now + RETRY_DELAY)
+                return
+            self.renewed += 1
+            if self.__mutes.get(mute.member_id) is not mute:
+                return
+            if until >= mute.ends_at:
+                # the discord timeout covers the rest of the mute
+                await self.cancel(mute.member_id)
+            else:
+                self.__push(mute, until - self.__lead_time)
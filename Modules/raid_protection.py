@@ -0,0 +1,246 @@
+import asyncio
+import configparser
+import datetime
+import re
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import discord
+
+from Modules.forbidden_usernames import normalize_name
+
+
+BULK_BAN_LIMIT = 200
+"""Maximum amount of users per bulk ban request"""
+
+
+def name_skeleton(name: str) -> str:
+    """The letters of the normalized name. 'R4ider_123' and 'raider99' have the same skeleton"""
+    return re.sub(r"[^a-z]", "", normalize_name(name))
+
+
+class SlidingWindowCounter:
+    """Counts events of the last `window` seconds in one bucket per second, so the memory is fixed"""
+
+    def __init__(self, window: int):
+        self.__window = window
+        self.__counts = [0] * window
+        self.__seconds = [0] * window
+
+    def add(self, now: float):
+        second = int(now)
+        i = second % self.__window
+        if self.__seconds[i] != second:
+            self.__seconds[i] = second
+            self.__counts[i] = 0
+        self.__counts[i] += 1
+
+    def count(self, now: float) -> int:
+        oldest = int(now) - self.__window
+        return sum(c for c, s in zip(self.__counts, self.__seconds) if s > oldest)
+
+
+class RaidDetector:
+    """
+    Detects join bursts from the join rate, the account age and similar names.
+
+    All state is bounded: the join rate is a fixed size window, the recent joins and names are kept in
+    deques with a maximum length.
+    """
+
+    def __init__(self, join_threshold: int = 10, window_seconds: int = 10, min_account_age_days: int = 7,
+                 similar_name_threshold: int = 5, raid_mode_seconds: int = 120, max_recent_joins: int = 1000):
+        self.join_threshold = join_threshold
+        self.window_seconds = window_seconds
+        self.min_account_age = datetime.timedelta(days=min_account_age_days)
+        self.similar_name_threshold = similar_name_threshold
+        self.raid_mode_seconds = raid_mode_seconds
+        self.__joins = SlidingWindowCounter(window_seconds)
+        self.__recent: Deque[Tuple[float, int, str, datetime.datetime]] = deque(maxlen=max_recent_joins)
+        """(join time, member id, name skeleton, account creation) of the joins in the window"""
+        self.__skeletons: Counter = Counter()
+        self.__raid_until = 0.0
+        self.raid_started_at: Optional[float] = None
+
+    @property
+    def raid_mode(self) -> bool:
+        return self.raid_started_at is not None
+
+    def __expire(self, now: float):
+        oldest = now - self.window_seconds
+        while self.__recent and self.__recent[0][0] <= oldest:
+            self.__forget_skeleton(self.__recent.popleft()[2])
+
+    def __forget_skeleton(self, skeleton: str):
+        if skeleton:
+            self.__skeletons[skeleton] -= 1
+            if self.__skeletons[skeleton] <= 0:
+                del self.__skeletons[skeleton]
+
+    def __is_suspicious(self, skeleton: str, created_at: datetime.datetime, joined_at: datetime.datetime) -> bool:
+        if joined_at - created_at < self.min_account_age:
+            return True
+        return bool(skeleton) and self.__skeletons[skeleton] >= self.similar_name_threshold
+
+    def on_join(self, member_id: int, name: str, created_at: datetime.datetime,
+                now: Optional[float] = None) -> List[int]:
+        """
+        Registers a join
+        :return: The ids of the members that should be removed. When the raid mode starts, this includes the
+            suspicious members that joined earlier in the window
+        """
+        if now is None:
+            now = time.time()
+        joined_at = datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+        self.__expire(now)
+        skeleton = name_skeleton(name)
+        if len(self.__recent) == self.__recent.maxlen:
+            # the deque drops the oldest join, keep the name counter in sync
+            self.__forget_skeleton(self.__recent[0][2])
+        self.__recent.append((now, member_id, skeleton, created_at))
+        if skeleton:
+            self.__skeletons[skeleton] += 1
+        self.__joins.add(now)
+
+        suspects = []
+        if not self.raid_mode:
+            if self.__joins.count(now) < self.join_threshold and \
+                    (not skeleton or self.__skeletons[skeleton] < self.similar_name_threshold):
+                return suspects
+            self.raid_started_at = now
+            self.__raid_until = now + self.raid_mode_seconds
+            for _, recent_id, recent_skeleton, recent_created_at in self.__recent:
+                if self.__is_suspicious(recent_skeleton, recent_created_at, joined_at):
+                    suspects.append(recent_id)
+        elif self.__is_suspicious(skeleton, created_at, joined_at):
+            suspects.append(member_id)
+        if suspects:
+            self.__raid_until = now + self.raid_mode_seconds
+        return suspects
+
+    def check_end(self, now: Optional[float] = None) -> bool:
+        """Ends the raid mode if there were no suspicious joins for `raid_mode_seconds`
+        :return: Whether the raid mode ended"""
+        if now is None:
+            now = time.time()
+        if self.raid_mode and now >= self.__raid_until:
+            self.raid_started_at = None
+            return True
+        return False
+
+
+class RaidProtection:
+    """
+    Removes the suspicious members of a raid in batches with bulk bans or kicks
+    and logs the whole raid in one summary embed.
+    """
+
+    def __init__(self, bot: discord.Bot, config: configparser.ConfigParser, log_channel_id: int, logging):
+        section = "Raid-Protection"
+        self.__bot = bot
+        self.__log_channel_id = log_channel_id
+        self.__logging = logging
+        self.__enabled = config.getboolean(section, "enabled", fallback=False)
+        self.__ban = config.get(section, "action", fallback="ban").lower() == "ban"
+        self.__flush_interval = config.getfloat(section, "flush-seconds", fallback=2.0)
+        self.__max_queue = config.getint(section, "max-queue", fallback=5000)
+        self.detector = RaidDetector(
+            join_threshold=config.getint(section, "join-threshold", fallback=10),
+            window_seconds=config.getint(section, "window-seconds", fallback=10),
+            min_account_age_days=config.getint(section, "min-account-age-days", fallback=7),
+            similar_name_threshold=config.getint(section, "similar-name-threshold", fallback=5),
+            raid_mode_seconds=config.getint(section, "raid-mode-seconds", fallback=120),
+        )
+        self.__queue: Dict[int, discord.Object] = {}
+        self.__guild: Optional[discord.Guild] = None
+        self.__task: Optional[asyncio.Task] = None
+        self.__removed = 0
+        self.__failed = 0
+        self.__joins_during_raid = 0
+
+    async def on_member_join(self, member: discord.Member) -> bool:
+        """
+        Checks the join for a raid
+        :return: Whether the member is queued for removal
+        """
+        if not self.__enabled:
+            return False
+        was_raid = self.detector.raid_mode
+        suspects = self.detector.on_join(member.id, member.name, member.created_at)
+        if not self.detector.raid_mode:
+            return False
+        if not was_raid:
+            self.__logging.warning(f"raid mode started after {self.detector.join_threshold} joins")
+        self.__joins_during_raid += 1
+        self.__guild = member.guild
+        for member_id in suspects:
+            if len(self.__queue) >= self.__max_queue:
+                await self.__flush()
+            self.__queue[member_id] = discord.Object(member_id)
+        if self.__task is None or self.__task.done():
+            self.__task = self.__bot.loop.create_task(self.__run())
+        return member.id in self.__queue
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.__flush_interval)
+            await self.__flush()
+            started = self.detector.raid_started_at
+            if self.detector.check_end():
+                await self.__send_summary(started)
+                return
+
+    async def __flush(self):
+        if not self.__queue or self.__guild is None:
+            return
+        users = list(self.__queue.values())
+        self.__queue.clear()
+        reason = "Automated removal during a raid"
+        if self.__ban:
+            for i in range(0, len(users), BULK_BAN_LIMIT):
+                try:
+                    banned, failed = await self.__guild.bulk_ban(*users[i:i + BULK_BAN_LIMIT], reason=reason)
+                    for user in banned:
+                        self.__bot.bans.add(user.id, reason)
+                    self.__removed += len(banned)
+                    self.__failed += len(failed)
+                except discord.HTTPException as e:
+                    self.__logging.error("raid protection: bulk ban failed", exc_info=e)
+                    self.__failed += len(users[i:i + BULK_BAN_LIMIT])
+        else:
+            for user in users:
+                try:
+                    await self.__guild.kick(user, reason=reason)
+                    self.__removed += 1
+                except discord.HTTPException:
+                    self.__failed += 1
+
+    async def __send_summary(self, started: Optional[float]):
+        if not self.__removed and not self.__failed:
+            # a legitimate burst of joins without suspicious accounts, nothing to report
+            self.__logging.info(f"raid mode ended without suspicious joins after {self.__joins_during_raid} joins")
+            self.__joins_during_raid = 0
+            return
+        e = discord.Embed()
+        e.title = ":rotating_light: Raid erkannt"
+        e.colour = discord.Colour.red()
+        e.add_field(name="Beitritte im Raid-Modus", value=str(self.__joins_during_raid), inline=True)
+        e.add_field(name="Gebannt" if self.__ban else "Gekickt", value=str(self.__removed), inline=True)
+        if self.__failed:
+            e.add_field(name="Fehlgeschlagen", value=str(self.__failed), inline=True)
+        if started:
+            e.add_field(name="Beginn", value=discord.utils.format_dt(
+                datetime.datetime.fromtimestamp(started, datetime.timezone.utc), 'T'), inline=True)
+        e.timestamp = discord.utils.utcnow()
+        self.__logging.warning(f"raid mode ended: {self.__joins_during_raid} joins, {self.__removed} removed, "
+                               f"{self.__failed} failed")
+        self.__removed = self.__failed = self.__joins_during_raid = 0
+        try:
+            channel = self.__bot.get_channel(self.__log_channel_id)
+            if channel:
+                await channel.send(embed=e)
+            else:
+                self.__logging.error("Main-log channel not found")
+        except discord.Forbidden as err:
+            self.__logging.error("Cannot send messages in Main-log", exc_info=err)
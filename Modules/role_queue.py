@@ -0,0 +1,132 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+import discord
+
+
+COALESCE_DELAY = 0.25
+"""Seconds to wait for more operations on the same member before editing it"""
+
+
+class _PendingRoleEdit:
+    __slots__ = ("guild", "adds", "removes", "reasons", "futures")
+
+    def __init__(self, guild: discord.Guild):
+        self.guild = guild
+        self.adds: Dict[int, discord.Role] = {}
+        self.removes: Dict[int, discord.Role] = {}
+        self.reasons: List[str] = []
+        self.futures: List[Tuple[asyncio.Future, int, bool]] = []
+        """(future, role id, whether it is an add) of each merged operation"""
+
+
+class RoleMutationQueue:
+    """
+    Serializes the role changes per member.
+
+    Operations on the same member that arrive close together are merged into one `member.edit(roles=...)` call,
+    the last operation on a role wins. Operations that wouldn't change anything are dropped without a request.
+    Each operation learns whether its own role was changed by the edit, not just whether the member was edited.
+    Only one edit per member runs at a time, so concurrent approvals don't race each other.
+    """
+
+    def __init__(self, bot: discord.Bot, max_retries: int = 5, retry_delay: float = 1.0):
+        """
+        :param bot: The bot
+        :param max_retries: How often a rate limited edit is retried
+        :param retry_delay: Seconds to wait before the first retry. Doubles with each retry
+        """
+        self.__bot = bot
+        self.__max_retries = max_retries
+        self.__retry_delay = retry_delay
+        self.__pending: Dict[int, _PendingRoleEdit] = {}
+        self.__workers: Dict[int, asyncio.Task] = {}
+        self.edits = 0
+        """Amount of member edit requests sent"""
+        self.skipped = 0
+        """Amount of operations which were merged into another edit or dropped because they changed nothing"""
+
+    def add(self, member: discord.Member, role: discord.Role, reason: Optional[str] = None) -> asyncio.Future:
+        """
+        Gives the member the role
+        :return: A future which resolves to whether the member got the role with the edit, so False if the member
+            already had it or a later operation took it away again, or raises the HTTPException of the edit
+        """
+        pending = self.__enqueue(member, role, True, reason)
+        pending.removes.pop(role.id, None)
+        pending.adds[role.id] = role
+        return pending.futures[-1][0]
+
+    def remove(self, member: discord.Member, role: discord.Role, reason: Optional[str] = None) -> asyncio.Future:
+        """
+        Takes the role from the member
+        :return: A future which resolves to whether the role was taken with the edit, so False if the member
+            didn't have it or a later operation gave it back, or raises the HTTPException of the edit
+        """
+        pending = self.__enqueue(member, role, False, reason)
+        pending.adds.pop(role.id, None)
+        pending.removes[role.id] = role
+        return pending.futures[-1][0]
+
+    def __enqueue(self, member: discord.Member, role: discord.Role, add: bool,
+                  reason: Optional[str]) -> _PendingRoleEdit:
+        pending = self.__pending.get(member.id)
+        if pending is None:
+            pending = self.__pending[member.id] = _PendingRoleEdit(member.guild)
+        if reason and reason not in pending.reasons:
+            pending.reasons.append(reason)
+        pending.futures.append((self.__bot.loop.create_future(), role.id, add))
+        if member.id not in self.__workers:
+            self.__workers[member.id] = self.__bot.loop.create_task(self.__work(member.id))
+        return pending
+
+    async def __work(self, member_id: int):
+        try:
+            while member_id in self.__pending:
+                await asyncio.sleep(COALESCE_DELAY)
+                pending = self.__pending.pop(member_id)
+                try:
+                    added, removed = await self.__apply(member_id, pending)
+                except Exception as e:
+                    for future, _, _ in pending.futures:
+                        if not future.done():
+                            future.set_exception(e)
+                            # the exception is handed to the caller, don't warn if nobody awaits it
+                            future.exception()
+                else:
+                    for future, role_id, add in pending.futures:
+                        if not future.done():
+                            future.set_result(role_id in (added if add else removed))
+        finally:
+            self.__workers.pop(member_id, None)
+
+    async def __apply(self, member_id: int, pending: _PendingRoleEdit) -> Tuple[Set[int], Set[int]]:
+        """
+        Edits the member with the merged operations
+        :return: The ids of the added roles and of the removed roles, both empty if the member wasn't edited
+        """
+        member = pending.guild.get_member(member_id)
+        if member is None:
+            self.skipped += len(pending.futures)
+            return set(), set()
+        current = [r for r in member.roles if not r.is_default()]
+        current_ids = {r.id for r in current}
+        roles = [r for r in current if r.id not in pending.removes]
+        roles.extend(r for r in pending.adds.values() if r.id not in current_ids)
+        role_ids = {r.id for r in roles}
+        if role_ids == current_ids:
+            self.skipped += len(pending.futures)
+            return set(), set()
+        self.skipped += len(pending.futures) - 1
+
+        reason = "; ".join(pending.reasons) or None
+        for attempt in range(self.__max_retries + 1):
+            try:
+                self.edits += 1
+                await member.edit(roles=roles, reason=reason)
+                return role_ids - current_ids, current_ids - role_ids
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt == self.__max_retries:
+                    raise
+                await asyncio.sleep(self.__retry_delay * 2 ** attempt)
+        return set(), set()
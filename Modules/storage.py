@@ -0,0 +1,377 @@
+import asyncio
+import concurrent.futures
+import configparser
+import contextlib
+import datetime
+import functools
+import os
+import sqlite3
+import time
+import zlib
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from Modules.migrations import split_statements
+
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+
+MARIADB_SCHEMA = os.path.join(ROOT_DIR, "reset.sql")
+
+SQLITE_SCHEMA = os.path.join(ROOT_DIR, "sqlite.sql")
+
+
+class Session:
+    """
+    Queries on one connection. Get one with Storage.session() or Storage.transaction().
+    The queries use %s placeholders like aiomysql, for every backend.
+    """
+
+    lastrowid: Optional[int] = None
+    """The AUTO_INCREMENT id of the last inserted row"""
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+
+    def _observe(self, query: str, start: float):
+        if self._metrics is not None:
+            self._metrics.observe(query, time.perf_counter() - start)
+
+    async def execute(self, query: str, args: Optional[Sequence] = None):
+        raise NotImplementedError
+
+    async def executemany(self, query: str, args: Sequence[Sequence]):
+        raise NotImplementedError
+
+    async def fetchone(self, query: str, args: Optional[Sequence] = None) -> Optional[tuple]:
+        raise NotImplementedError
+
+    async def fetchall(self, query: str, args: Optional[Sequence] = None) -> List[tuple]:
+        raise NotImplementedError
+
+
+class Storage:
+    """
+    The database of the bot. All queries go through a storage, so the backend can be switched in the config.
+    """
+
+    dialect: str = ""
+    """Name of the sql dialect, selects the dialect specific migration files"""
+
+    metrics = None
+    """The DatabaseMetrics which time the statements, None to not measure"""
+
+    async def connect(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    def session(self) -> "contextlib.AbstractAsyncContextManager[Session]":
+        """A session on one connection in autocommit mode"""
+        raise NotImplementedError
+
+    def transaction(self) -> "contextlib.AbstractAsyncContextManager[Session]":
+        """A session in a transaction. Commits at the end, rolls back if an exception is raised"""
+        raise NotImplementedError
+
+    async def create_schema(self):
+        """Creates the tables of the create script. Only used for fresh databases, e.g. by the benchmarks"""
+        raise NotImplementedError
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Gauges of the connections: size, in_use, idle and max_size"""
+        raise NotImplementedError
+
+    def _observe_wait(self, start: float):
+        if self.metrics is not None:
+            self.metrics.observe_pool_wait(time.perf_counter() - start)
+
+    async def fetchone(self, query: str, args: Optional[Sequence] = None) -> Optional[tuple]:
+        async with self.session() as session:
+            return await session.fetchone(query, args)
+
+    async def fetchall(self, query: str, args: Optional[Sequence] = None) -> List[tuple]:
+        async with self.session() as session:
+            return await session.fetchall(query, args)
+
+    async def execute(self, query: str, args: Optional[Sequence] = None):
+        async with self.session() as session:
+            await session.execute(query, args)
+
+    async def executemany(self, query: str, args: Sequence[Sequence]):
+        async with self.session() as session:
+            await session.executemany(query, args)
+
+
+class _MariaDBSession(Session):
+    def __init__(self, cursor, metrics):
+        super().__init__(metrics)
+        self.__cursor = cursor
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self.__cursor.lastrowid
+
+    async def execute(self, query, args=None):
+        start = time.perf_counter()
+        await self.__cursor.execute(query, args)
+        self._observe(query, start)
+
+    async def executemany(self, query, args):
+        start = time.perf_counter()
+        await self.__cursor.executemany(query, args)
+        self._observe(query, start)
+
+    async def fetchone(self, query, args=None):
+        start = time.perf_counter()
+        await self.__cursor.execute(query, args)
+        row = await self.__cursor.fetchone()
+        self._observe(query, start)
+        return row
+
+    async def fetchall(self, query, args=None):
+        start = time.perf_counter()
+        await self.__cursor.execute(query, args)
+        rows = await self.__cursor.fetchall()
+        self._observe(query, start)
+        return rows
+
+
+class MariaDBStorage(Storage):
+    """MariaDB or mysql through an aiomysql pool"""
+
+    dialect = "mariadb"
+
+    def __init__(self, host: str, port: int, user: str, password: str, database: str,
+                 min_size: int = 1, max_size: int = 10):
+        self.__connect_kwargs = dict(host=host, port=port, user=user, password=password, db=database,
+                                     minsize=min_size, maxsize=max_size)
+        self.pool = None
+        """The aiomysql pool, None until connected"""
+
+    async def connect(self):
+        import aiomysql
+        self.pool = await aiomysql.create_pool(**self.__connect_kwargs, autocommit=True)
+
+    def pool_stats(self) -> Dict[str, int]:
+        if self.pool is None:
+            return {}
+        return {
+            "size": self.pool.size,
+            "in_use": self.pool.size - self.pool.freesize,
+            "idle": self.pool.freesize,
+            "max_size": self.pool.maxsize,
+        }
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+
+    @contextlib.asynccontextmanager
+    async def session(self) -> AsyncIterator[Session]:
+        start = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            self._observe_wait(start)
+            async with conn.cursor() as cur:
+                yield _MariaDBSession(cur, self.metrics)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Session]:
+        start = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            self._observe_wait(start)
+            await conn.begin()
+            try:
+                async with conn.cursor() as cur:
+                    yield _MariaDBSession(cur, self.metrics)
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+
+    async def create_schema(self):
+        with open(MARIADB_SCHEMA, encoding="utf-8") as f:
+            statements = split_statements(f.read())
+        async with self.session() as session:
+            for statement in statements:
+                # the database is selected in the connection settings
+                if not statement.upper().startswith(("CREATE SCHEMA", "USE ")):
+                    await session.execute(statement)
+
+
+@functools.lru_cache(maxsize=256)
+def _sqlite_query(query: str) -> str:
+    """Converts the %s placeholders of aiomysql to the ? placeholders of sqlite"""
+    return query.replace("%s", "?").replace("%%", "%")
+
+
+def _adapt_datetime(value: datetime.datetime) -> str:
+    # stored naive in UTC like in MariaDB
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.isoformat(" ")
+
+
+def _convert_datetime(value: bytes) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(value.decode())
+
+
+def _concat_ws(separator, *values):
+    return separator.join(str(v) for v in values if v is not None)
+
+
+def _utc_timestamp() -> str:
+    return _adapt_datetime(datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0))
+
+
+sqlite3.register_adapter(datetime.datetime, _adapt_datetime)
+sqlite3.register_converter("DATETIME", _convert_datetime)
+sqlite3.register_converter("TIMESTAMP", _convert_datetime)
+
+
+class _SQLiteSession(Session):
+    def __init__(self, storage: "SQLiteStorage"):
+        super().__init__(storage.metrics)
+        self.__storage = storage
+
+    async def execute(self, query, args=None):
+        start = time.perf_counter()
+        cursor = await self.__storage.run(self.__storage.connection.execute, _sqlite_query(query), args or ())
+        self._observe(query, start)
+        self.lastrowid = cursor.lastrowid
+
+    async def executemany(self, query, args):
+        start = time.perf_counter()
+        await self.__storage.run(self.__storage.connection.executemany, _sqlite_query(query), args)
+        self._observe(query, start)
+
+    async def fetchone(self, query, args=None):
+        def fetch():
+            return self.__storage.connection.execute(_sqlite_query(query), args or ()).fetchone()
+        start = time.perf_counter()
+        row = await self.__storage.run(fetch)
+        self._observe(query, start)
+        return row
+
+    async def fetchall(self, query, args=None):
+        def fetch():
+            return self.__storage.connection.execute(_sqlite_query(query), args or ()).fetchall()
+        start = time.perf_counter()
+        rows = await self.__storage.run(fetch)
+        self._observe(query, start)
+        return rows
+
+
+class SQLiteStorage(Storage):
+    """
+    A local sqlite database file, for tests and benchmarks without a MariaDB server.
+
+    sqlite3 blocks, so all queries run on one connection in a single worker thread.
+    Sessions take turns, so the statements of a transaction aren't mixed with other queries.
+    The MariaDB functions used by the bot are registered as sqlite functions.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path: str):
+        """
+        :param path: Path of the database file, or :memory:
+        """
+        self.__path = path
+        self.__executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.__lock = asyncio.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+
+    async def run(self, function, *args):
+        """Runs the function in the worker thread of the connection"""
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, function, *args)
+
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.__path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None,
+                               check_same_thread=False)
+        conn.create_function("UTC_TIMESTAMP", 0, _utc_timestamp)
+        conn.create_function("CRC32", 1, lambda value: None if value is None else zlib.crc32(str(value).encode()))
+        conn.create_function("CONCAT_WS", -1, _concat_ws)
+        # a single process owns the file, so the named locks always succeed
+        conn.create_function("GET_LOCK", 2, lambda name, timeout: 1)
+        conn.create_function("RELEASE_LOCK", 1, lambda name: 1)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        with open(SQLITE_SCHEMA, encoding="utf-8") as f:
+            conn.executescript(f.read())
+        return conn
+
+    async def connect(self):
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.connection = await self.run(self.__connect)
+
+    async def close(self):
+        if self.connection is not None:
+            await self.run(self.connection.close)
+            self.connection = None
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    def pool_stats(self) -> Dict[str, int]:
+        # one connection, the lock tells whether it's in use
+        in_use = int(self.__lock.locked())
+        return {"size": 1, "in_use": in_use, "idle": 1 - in_use, "max_size": 1}
+
+    @contextlib.asynccontextmanager
+    async def session(self) -> AsyncIterator[Session]:
+        start = time.perf_counter()
+        async with self.__lock:
+            self._observe_wait(start)
+            yield _SQLiteSession(self)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Session]:
+        start = time.perf_counter()
+        async with self.__lock:
+            self._observe_wait(start)
+            await self.run(self.connection.execute, "BEGIN")
+            try:
+                yield _SQLiteSession(self)
+            except BaseException:
+                await self.run(self.connection.execute, "ROLLBACK")
+                raise
+            else:
+                await self.run(self.connection.execute, "COMMIT")
+
+    async def create_schema(self):
+        with open(SQLITE_SCHEMA, encoding="utf-8") as f:
+            script = f.read()
+        async with self.__lock:
+            await self.run(self.connection.executescript, script)
+
+
+def create_storage(config: configparser.ConfigParser, metrics=None) -> Storage:
+    """
+    The storage backend selected in the [Storage] section of the config. Default is MariaDB
+    :param config: The config
+    :param metrics: The DatabaseMetrics for the storage, or None
+    :raises Exception: when the backend is unknown
+    """
+    backend = config.get("Storage", "backend", fallback="mariadb").lower()
+    if backend == "mariadb":
+        storage = MariaDBStorage(
+            host=config.get("MariaDB", "host"),
+            port=int(config.get("MariaDB", "port")),
+            user=config.get("MariaDB", "user"),
+            password=config.get("MariaDB", "password"),
+            database=config.get("MariaDB", "database"),
+            min_size=config.getint("MariaDB", "pool-min-size", fallback=1),
+            max_size=config.getint("MariaDB", "pool-max-size", fallback=10),
+        )
+    elif backend == "sqlite":
+        path = config.get("Storage", "sqlite-path", fallback="flix_bot.sqlite3")
+        if path != ":memory:" and not os.path.isabs(path):
+            path = os.path.join(ROOT_DIR, path)
+        storage = SQLiteStorage(path)
+    else:
+        raise Exception(f"unknown storage backend '{backend}'")
+    storage.metrics = metrics
+    return storage
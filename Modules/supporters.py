@@ -0,0 +1,111 @@
+import asyncio
+import datetime
+from typing import Dict, Optional, Tuple
+
+import discord
+
+
+class Supporter:
+    __slots__ = ("id", "discord_id", "left_at")
+
+    def __init__(self, supporter_id: int, discord_id: int, left_at: Optional[datetime.datetime]):
+        self.id = supporter_id
+        """Primary key of the Supporter table"""
+        self.discord_id = discord_id
+        self.left_at = left_at
+        """When the supporter left the team, None if still in the team"""
+
+    @property
+    def has_left(self) -> bool:
+        return self.left_at is not None
+
+
+class SupporterDirectory:
+    """
+    The Supporter table, held in a dict by discord id.
+
+    The table is tiny and rarely changes, so it is loaded once and only reloaded when a cheap version query
+    (row count and a checksum over the columns used here) reports a change, or after invalidate().
+    """
+
+    VERSION_QUERY = "SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS(',', id, discord_id, left_at))), 0) FROM Supporter"
+
+    def __init__(self, bot: discord.Bot, refresh_interval: float = 60.0):
+        """
+        :param bot: The bot, used for the queries
+        :param refresh_interval: Seconds between the version checks
+        """
+        self.__bot = bot
+        self.__refresh_interval = refresh_interval
+        self.__supporters: Dict[int, Supporter] = {}
+        self.__version: Optional[Tuple[int, int]] = None
+        self.__lock = asyncio.Lock()
+        self.__task: Optional[asyncio.Task] = None
+        self.loads = 0
+        """Amount of full loads of the table"""
+        self.version_checks = 0
+        """Amount of version queries"""
+
+    def __len__(self) -> int:
+        return len(self.__supporters)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__version is not None
+
+    def get(self, discord_id: int) -> Optional[Supporter]:
+        """The supporter with the discord id from the cache, without a database lookup"""
+        return self.__supporters.get(discord_id)
+
+    async def lookup(self, discord_id: int) -> Optional[Supporter]:
+        """Like get(), but loads the table first if it isn't loaded yet"""
+        if not self.is_loaded:
+            await self.refresh()
+        return self.__supporters.get(discord_id)
+
+    async def resolve(self, discord_id: int) -> Optional[Supporter]:
+        """
+        Like lookup(), but checks the version of the table on a miss and looks again if it changed,
+        so a supporter added since the last refresh is found. Use for the acting team member, who is expected to exist
+        """
+        supporter = await self.lookup(discord_id)
+        if supporter is None and await self.refresh():
+            supporter = self.__supporters.get(discord_id)
+        return supporter
+
+    def invalidate(self):
+        """Reload the table with the next refresh. Call after writing to the Supporter table"""
+        self.__version = None
+
+    async def refresh(self) -> bool:
+        """
+        Checks the version of the table and reloads it if it changed
+        :return: Whether the table was reloaded
+        """
+        async with self.__lock:
+            self.version_checks += 1
+            count, checksum = await self.__bot.fetchone(self.VERSION_QUERY)
+            version = (int(count), int(checksum))
+            if version == self.__version:
+                return False
+            rows = await self.__bot.fetchall("SELECT id, discord_id, left_at FROM Supporter")
+            self.__supporters = {
+                discord_id: Supporter(supporter_id, discord_id, left_at) for supporter_id, discord_id, left_at in rows
+            }
+            self.__version = version
+            self.loads += 1
+            return True
+
+    def start(self, logging):
+        """Starts the periodic version check if it's not already running"""
+        if self.__task is None or self.__task.done():
+            self.__task = self.__bot.loop.create_task(self.__run(logging))
+
+    async def __run(self, logging):
+        while True:
+            # noinspection PyBroadException
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error("could not refresh the supporter directory", exc_info=e)
+            await asyncio.sleep(self.__refresh_interval)
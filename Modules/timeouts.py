@@ -1,59 +1,121 @@
 import datetime
-import re
+import functools
 
 import discord
 
 
+UNIT_SECONDS = {
+    "w": 7 * 86400, "W": 7 * 86400,
+    "d": 86400, "D": 86400,
+    "h": 3600, "H": 3600,
+    "m": 60, "M": 60,
+    "s": 1, "S": 1,
+}
+"""Seconds per duration unit. Upper case is listed too, so the parser doesn't need to lower the string"""
+
+MAX_DIGITS = 6
+"""Maximum amount of digits of one number in a duration string"""
+
+DISCORD_TIMEOUT_LIMIT = 28 * 86400 - 4000
+"""Discord allows timeouts up to 28 days. 4000 seconds tolerance for possible time differences"""
+
+
+@functools.lru_cache(maxsize=512)
+def parse_duration(duration: str) -> int:
+    """
+    Parses a duration string in a single pass. Each number must be followed by a unit (w, d, h, m or s),
+    units may repeat and are added up. Whitespace is allowed between the parts.
+    Cached, as most moderators use the same few durations.
+    :param duration: duration string e.g. 3d 10h 5m 29s
+    :return: The total amount of seconds
+    :raises ValueError: when the duration could not be parsed
+    """
+    total = 0
+    number = 0
+    digits = 0
+    parts = 0
+    for char in duration:
+        if "0" <= char <= "9":
+            digits += 1
+            if digits > MAX_DIGITS:
+                raise ValueError("couldn't parse timeout duration")
+            number = number * 10 + (ord(char) - 48)
+        elif char in UNIT_SECONDS:
+            if not digits:
+                raise ValueError("couldn't parse timeout duration")
+            total += number * UNIT_SECONDS[char]
+            number = digits = 0
+            parts += 1
+        elif char.isspace() and not digits:
+            continue
+        else:
+            raise ValueError("couldn't parse timeout duration")
+    if digits or not parts:
+        raise ValueError("couldn't parse timeout duration")
+    return total
+
+
 class TimeoutDuration:
+    __slots__ = ("__total_seconds", "__days", "__hours", "__minutes", "__seconds", "__expires_at",
+                 "__discord_expires_at")
+
     def __init__(self, duration: str, maximise_to_discord_limit: bool = True):
         """
-        Create a new timeout duration instance from a duration string
+        Create a new timeout duration instance from a duration string.
+        The expiry is calculated once here, relative to the time of the creation.
         :param duration: duration string e.g. 3d 10h 5m 29s
         :param maximise_to_discord_limit whether to limit the timeout duration to discord's 28 days limit. Default True
+            Without the limit, longer timeouts keep their real expiry and have to be renewed by the MuteScheduler
         :raises Exception: when the duration could not be parsed
         """
-        result = re.match(r"^(?:([0-9]{1,6})[d]\s*?|([0-9]{1,6})[h]\s*?|([0-9]{1,6})[m]\s*?|([0-9]{1,6})[s]\s*?){1,4}$",
-                          duration, re.IGNORECASE)
-        if not result:
-            raise Exception("couldn't parse timeout duration")
-        # calc mute duration
-        days = hours = minutes = seconds = 0
-        if result.group(1):
-            days = int(result.group(1))
-        if result.group(2):
-            hours = int(result.group(2))
-        if result.group(3):
-            minutes = int(result.group(3))
-        if result.group(4):
-            seconds = int(result.group(4))
-        while seconds >= 60:
-            seconds -= 60
-            minutes += 1
-        while minutes >= 60:
-            minutes -= 60
-            hours += 1
-        while hours >= 24:
-            hours -= 24
-            days += 1
-        self.__total_seconds = (days * 86400) + (hours * 3600) + (minutes * 60) + seconds
-
-        # maximize mute length to 28 days due discord (4000 seconds tolerance) (possible time difference)
-        if maximise_to_discord_limit and self.__total_seconds > 28 * 86400 - 4000:
-            self.__total_seconds = 28 * 86400 - 4000
-            hours = minutes = seconds = 0
-            days = 28
-
-        self.__days = days
-        self.__hours = hours
-        self.__minutes = minutes
-        self.__seconds = seconds
+        self.__init(parse_duration(duration), maximise_to_discord_limit)
+
+    @classmethod
+    def from_seconds(cls, total_seconds: int, maximise_to_discord_limit: bool = True) -> "TimeoutDuration":
+        """Create a new timeout duration instance from an amount of seconds"""
+        instance = cls.__new__(cls)
+        instance.__init(total_seconds, maximise_to_discord_limit)
+        return instance
+
+    def __init(self, total_seconds: int, maximise_to_discord_limit: bool):
+        set_attr = object.__setattr__
+        if maximise_to_discord_limit and total_seconds > DISCORD_TIMEOUT_LIMIT:
+            total_seconds = DISCORD_TIMEOUT_LIMIT
+            days, hours, minutes, seconds = 28, 0, 0, 0
+        else:
+            minutes, seconds = divmod(total_seconds, 60)
+            hours, minutes = divmod(minutes, 60)
+            days, hours = divmod(hours, 24)
+        set_attr(self, "_TimeoutDuration__total_seconds", total_seconds)
+        set_attr(self, "_TimeoutDuration__days", days)
+        set_attr(self, "_TimeoutDuration__hours", hours)
+        set_attr(self, "_TimeoutDuration__minutes", minutes)
+        set_attr(self, "_TimeoutDuration__seconds", seconds)
+        now = discord.utils.utcnow()
+        set_attr(self, "_TimeoutDuration__expires_at", now + datetime.timedelta(seconds=total_seconds))
+        set_attr(self, "_TimeoutDuration__discord_expires_at",
+                 now + datetime.timedelta(seconds=min(total_seconds, DISCORD_TIMEOUT_LIMIT)))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("TimeoutDuration is immutable")
 
     @property
     def total_seconds(self) -> int:
         return self.__total_seconds
 
+    @property
+    def expires_at(self) -> datetime.datetime:
+        """The datetime in UTC when the timeout ends"""
+        return self.__expires_at
+
+    @property
+    def exceeds_discord_limit(self) -> bool:
+        """Whether the timeout is longer than discord allows, so it has to be renewed before it lapses"""
+        return self.__total_seconds > DISCORD_TIMEOUT_LIMIT
+
     def mute_timestamp_for_discord(self) -> datetime.datetime:
-        return discord.utils.utcnow() + datetime.timedelta(seconds=self.__total_seconds)
+        """The expiry to send to discord, at most discord's limit from now"""
+        return self.__discord_expires_at
 
     def to_mute_length_str(self) -> str:
         result = ""
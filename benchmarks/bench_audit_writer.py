@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+"""
+Benchmark of the audit inserts: one INSERT per row against the AuditWriter with multi-row INSERTs.
+
+Without arguments a stand-in database is used, which charges a round trip latency per statement
+and a small cost per row. With --mariadb or --sqlite a real table of the storage backend is used.
+
+Usage: python3 benchmarks/bench_audit_writer.py [rows] [round trip ms]
+       python3 benchmarks/bench_audit_writer.py [rows] --mariadb host port user password database
+       python3 benchmarks/bench_audit_writer.py [rows] --sqlite [path]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from Modules.audit_writer import AuditWriter  # noqa: E402
+from Modules.storage import MariaDBStorage, SQLiteStorage  # noqa: E402
+
+
+PRODUCERS = 20
+"""Concurrent commands writing audit rows"""
+
+ROW_COST = 0.000005
+"""Seconds the stand-in database needs per inserted row"""
+
+
+class StandInDatabase:
+    """Charges `latency` seconds per statement and ROW_COST per row, like a database on another host"""
+
+    def __init__(self, latency: float, connections: int = 10):
+        self.latency = latency
+        self.loop = asyncio.get_running_loop()
+        self.rows = 0
+        self.statements = 0
+        self.__connections = asyncio.Semaphore(connections)
+
+    async def execute(self, query, args=None):
+        async with self.__connections:
+            rows = max(1, query.count("), (") + 1)
+            await asyncio.sleep(self.latency + rows * ROW_COST)
+            self.rows += rows
+            self.statements += 1
+
+
+class StorageDatabase:
+    """A storage backend in place of the bot"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.loop = asyncio.get_running_loop()
+
+    async def execute(self, query, args=None):
+        await self.storage.execute(query, args)
+
+
+def make_row(i: int) -> tuple:
+    return ("content of the deleted message", None, "2024-01-01 00:00:00", 100_000 + i, 200, 0, 0, 0,
+            f"https://discord.com/channels/1/2/{i}", None)
+
+
+COLUMNS = ("msg_content", "msg_reference", "msg_created_at", "msg_author", "msg_channel", "msg_attachment_amount",
+           "msg_sticker_amount", "msg_flags", "log_message_jump_url", "supporter_fk")
+
+
+async def per_row(db, table: str, amount: int) -> float:
+    query = f"INSERT INTO {table} ({', '.join(COLUMNS)}) VALUES ({', '.join(['%s'] * len(COLUMNS))})"
+
+    async def produce(offset: int):
+        for i in range(offset, amount, PRODUCERS):
+            await db.execute(query, make_row(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(produce(p) for p in range(PRODUCERS)))
+    return time.perf_counter() - start
+
+
+async def batched(db, table: str, amount: int) -> float:
+    writer = AuditWriter(db)
+    target = writer.table(table, COLUMNS)
+
+    async def produce(offset: int):
+        for i in range(offset, amount, PRODUCERS):
+            await target.put(make_row(i))
+
+    start = time.perf_counter()
+    writer.start(print)
+    await asyncio.gather(*(produce(p) for p in range(PRODUCERS)))
+    await writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"  audit writer: {writer.statements} statements, {writer.waits} back-pressure waits, "
+          f"slowest flush {writer.max_flush_latency * 1000:.1f} ms")
+    return elapsed
+
+
+async def main():
+    args = sys.argv[1:]
+    amount = int(args[0]) if args and args[0].isdigit() else 10_000
+    table = "MessageDeletion"
+    storage = None
+    if "--mariadb" in args:
+        host, port, user, password, database = args[args.index("--mariadb") + 1:][:5]
+        storage = MariaDBStorage(host, int(port), user, password, database)
+        await storage.connect()
+        table = "BenchMessageDeletion"
+        await storage.execute(f"CREATE TABLE IF NOT EXISTS {table} LIKE MessageDeletion")
+        db_per_row = db_batched = StorageDatabase(storage)
+        print(f"{amount} rows against MariaDB at {host}:{port}")
+    elif "--sqlite" in args:
+        path = (args[args.index("--sqlite") + 1:] or [":memory:"])[0]
+        storage = SQLiteStorage(path)
+        await storage.connect()
+        db_per_row = db_batched = StorageDatabase(storage)
+        print(f"{amount} rows against sqlite at {path}")
+    else:
+        latency = float(args[1]) / 1000 if len(args) > 1 else 0.001
+        db_per_row = StandInDatabase(latency)
+        db_batched = StandInDatabase(latency)
+        print(f"{amount} rows against a stand-in database with {latency * 1000:.1f} ms round trip")
+
+    elapsed_row = await per_row(db_per_row, table, amount)
+    print(f"one INSERT per row: {elapsed_row:.3f}s, {amount / elapsed_row:,.0f} rows/s")
+    elapsed_batch = await batched(db_batched, table, amount)
+    print(f"multi-row INSERTs:  {elapsed_batch:.3f}s, {amount / elapsed_batch:,.0f} rows/s "
+          f"({elapsed_row / elapsed_batch:.1f}x)")
+    if storage is not None:
+        if table != "MessageDeletion":
+            await storage.execute(f"DROP TABLE {table}")
+        await storage.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+"""
+Micro-benchmark of the faction lookups in the faction channel.
+
+Compares the old linear scans over the faction list with the indexes of FactionConfig
+at 10, 100 and 1000 factions.
+
+Usage: python3 benchmarks/bench_faction_lookup.py
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from Modules.factions import FactionConfig, FactionContainer  # noqa: E402
+
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+
+
+class FakeMember:
+    def __init__(self, role_ids: List[int]):
+        self.roles = [FakeRole(r) for r in role_ids]
+
+
+class LinearFactionLookup:
+    """The lookups as they were implemented before the indexes"""
+
+    def __init__(self, factions: List[dict]):
+        self.factions = [(f["role"], list(f["ogs"]), list(f["aliases"])) for f in factions]
+
+    def alias_exists(self, alias: str) -> bool:
+        for faction in self.factions:
+            if alias in faction[2]:
+                return True
+        return False
+
+    def get_faction_by_alias(self, alias: str):
+        for faction in self.factions:
+            if alias in faction[2]:
+                return faction
+        return None
+
+    def get_factions_member_is_og_of(self, member) -> list:
+        result = []
+        for fac in self.factions:
+            for role in member.roles:
+                if role.id in fac[1]:
+                    result.append(fac)
+        return result
+
+
+def generate_config(amount: int) -> dict:
+    factions = []
+    for i in range(amount):
+        factions.append({
+            "role": 10_000 + i,
+            "ogs": [20_000 + i, 30_000 + i % 7],
+            "aliases": [f"faction{i}", f"f{i}", f"frak-{i}"],
+        })
+    return {"log_channel_id": 1, "faction_chat_id": 2, "factions": factions}
+
+
+def run(amount: int, number: int = 2000):
+    data = generate_config(amount)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(data, f)
+    try:
+        FactionConfig.parse(f.name)
+    finally:
+        os.remove(f.name)
+    linear = LinearFactionLookup(data["factions"])
+
+    rnd = random.Random(amount)
+    # a typical request message: a few filler words and one alias
+    words = ["bitte", "die", "rolle", "für", f"f{rnd.randrange(amount)}", "danke"]
+    member = FakeMember([rnd.randrange(1, 9_999) for _ in range(20)] + [20_000 + rnd.randrange(amount)])
+
+    def old_message():
+        for w in words:
+            if linear.alias_exists(w):
+                linear.get_faction_by_alias(w)
+
+    def new_message():
+        for w in words:
+            FactionConfig.get_faction_by_alias(w)
+
+    def old_og():
+        linear.get_factions_member_is_og_of(member)
+
+    def new_og():
+        FactionConfig.get_faction_names_member_is_og_of(member)
+
+    faction = FactionConfig.get_faction_by_alias(words[4])
+    assert isinstance(faction, FactionContainer)
+
+    def new_is_og():
+        FactionConfig.is_og_of_faction(member, faction)
+
+    results = []
+    for name, fn in (("message aliases (old)", old_message), ("message aliases (new)", new_message),
+                     ("og factions (old)", old_og), ("og factions (new)", new_og),
+                     ("is og of faction (new)", new_is_og)):
+        best = min(timeit.repeat(fn, number=number, repeat=5))
+        results.append((name, best / number * 1e6))
+    return results
+
+
+def main():
+    for amount in (10, 100, 1000):
+        print(f"{amount} factions")
+        for name, us in run(amount):
+            print(f"  {name:<24} {us:10.2f} µs/op")
+
+
+if __name__ == "__main__":
+    main()
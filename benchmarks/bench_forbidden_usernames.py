@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""
+Benchmark of the forbidden username check on the join event with 1,000 forbidden names.
+
+Compares the old check, which re-reads and lower cases every name per event, with the compiled matcher.
+Joins are a mix of unique names and recurring names, as during a raid with similar accounts.
+
+Usage: python3 benchmarks/bench_forbidden_usernames.py
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+import unidecode  # noqa: E402
+
+from Modules.forbidden_usernames import ForbiddenNameMatcher, normalize_name  # noqa: E402
+
+
+def random_name(rnd: random.Random, length: int) -> str:
+    return "".join(rnd.choice(string.ascii_letters + "_.") for _ in range(length))
+
+
+def old_check(name: str, items: list):
+    forbidden_usernames = [val for k, val in items]
+    try:
+        decoded_name = unidecode.unidecode(name)
+    except unidecode.UnidecodeError:
+        decoded_name = name
+    for forbidden_name in forbidden_usernames:
+        if forbidden_name.lower() in decoded_name.lower():
+            return forbidden_name
+    return None
+
+
+def main():
+    rnd = random.Random(1)
+    items = [(f"name{i}", random_name(rnd, rnd.randrange(5, 14))) for i in range(1000)]
+    names = [random_name(rnd, rnd.randrange(4, 20)) for _ in range(5000)]
+    names += ["𝔉𝔯𝔞𝔨𝔱𝔲𝔯" + random_name(rnd, 3) for _ in range(500)]
+    names += [items[rnd.randrange(len(items))][1].upper() for _ in range(500)]
+    joins = [rnd.choice(names) for _ in range(20_000)]
+
+    start = time.perf_counter()
+    old = [old_check(n, items) for n in joins]
+    old_time = time.perf_counter() - start
+
+    normalize_name.cache_clear()
+    start = time.perf_counter()
+    matcher = ForbiddenNameMatcher(val for k, val in items)
+    compile_time = time.perf_counter() - start
+    start = time.perf_counter()
+    new = [matcher.find(n) for n in joins]
+    new_time = time.perf_counter() - start
+
+    assert [n is None for n in old] == [n is None for n in new]
+    print(f"{len(items)} forbidden names, {len(joins)} join events ({len(set(joins))} distinct names)")
+    print(f"  old          {len(joins) / old_time:12.0f} joins/s")
+    print(f"  new          {len(joins) / new_time:12.0f} joins/s  (compile once: {compile_time * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+"""
+Benchmark of the /frak-list export on a synthetic guild with 100k members.
+
+Compares the old full member scan with string concatenation against the role index and the csv writer.
+
+Usage: python3 benchmarks/bench_frak_list.py [member amount]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from Modules.faction_members import RoleMemberIndex, write_member_csv  # noqa: E402
+
+
+class FakeRole:
+    __slots__ = ("id",)
+
+    def __init__(self, role_id: int):
+        self.id = role_id
+
+
+class FakeMember:
+    __slots__ = ("id", "roles", "display_name")
+
+    def __init__(self, member_id: int, roles: list):
+        self.id = member_id
+        self.roles = roles
+        self.display_name = f"Member {member_id}"
+
+
+def generate_guild(amount: int, faction_amount: int = 50):
+    rnd = random.Random(42)
+    member_roles = [FakeRole(10_000 + i) for i in range(faction_amount)]
+    og_roles = [FakeRole(20_000 + i) for i in range(faction_amount)]
+    other_roles = [FakeRole(30_000 + i) for i in range(200)]
+    members = []
+    for member_id in range(amount):
+        roles = rnd.sample(other_roles, rnd.randrange(1, 8))
+        if rnd.random() < 0.3:
+            faction = rnd.randrange(faction_amount)
+            roles.append(member_roles[faction])
+            if rnd.random() < 0.02:
+                roles.append(og_roles[faction])
+        members.append(FakeMember(member_id, roles))
+    return members, member_roles, og_roles
+
+
+def old_frak_list(members, member_role_id: int, og_role_ids: list) -> str:
+    frak_members = []
+    og_members = []
+
+    def go_through(mem):
+        for r in mem.roles:
+            if r.id in og_role_ids:
+                og_members.append(mem)
+                return
+        for r in mem.roles:
+            if r.id == member_role_id:
+                frak_members.append(mem)
+                return
+
+    for m in members:
+        go_through(m)
+
+    content = "Rang,Discord ID,Anzeigename\n"
+    for m in og_members:
+        content += f"OG,{m.id},{m.display_name}\n"
+    for m in frak_members:
+        content += f",{m.id},{m.display_name}\n"
+    return content
+
+
+def new_frak_list(index: RoleMemberIndex, members_by_id: dict, member_role_id: int, og_role_ids: list):
+    og_ids = set()
+    for role_id in og_role_ids:
+        og_ids |= index.member_ids(role_id)
+    member_ids = index.member_ids(member_role_id) - og_ids
+    rows = []
+    for rank, ids in (("OG", og_ids), ("", member_ids)):
+        selected = [members_by_id[i] for i in ids]
+        selected.sort(key=lambda mem: mem.display_name.casefold())
+        rows.extend((rank, m.id, m.display_name) for m in selected)
+    buffer, _ = write_member_csv(rows)
+    buffer.close()
+
+
+def measure(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    members, member_roles, og_roles = generate_guild(amount)
+    members_by_id = {m.id: m for m in members}
+    tracked = [r.id for r in member_roles] + [r.id for r in og_roles]
+
+    index = RoleMemberIndex()
+    print(f"{amount} members, {len(member_roles)} factions")
+    print(f"  index build (once)     {measure(lambda: index.rebuild(tracked, members), 1):10.2f} ms")
+
+    member_role_id = member_roles[0].id
+    og_role_ids = [og_roles[0].id]
+    print(f"  frak-list old          "
+          f"{measure(lambda: old_frak_list(members, member_role_id, og_role_ids)):10.2f} ms")
+    print(f"  frak-list new          "
+          f"{measure(lambda: new_frak_list(index, members_by_id, member_role_id, og_role_ids)):10.2f} ms")
+
+    rows = [("", m.id, m.display_name) for m in members]
+    print(f"  csv all members        {measure(lambda: write_member_csv(rows, False)[0].close()):10.2f} ms")
+    print(f"  csv all members (gzip) {measure(lambda: write_member_csv(rows, True)[0].close()):10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
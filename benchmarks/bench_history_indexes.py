@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+"""
+Seeds the audit tables with millions of rows and times the history lookups of a user
+before and after the migrations with the lookup indexes.
+
+Needs an EMPTY scratch database: the tables of the schema are dropped and created again in it.
+
+Usage: python3 benchmarks/bench_history_indexes.py --mariadb host port user password database [rows]
+       python3 benchmarks/bench_history_indexes.py --sqlite path [rows]
+"""
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from Modules.audit_writer import multi_row_insert  # noqa: E402
+from Modules.migrations import migrate  # noqa: E402
+from Modules.storage import MariaDBStorage, SQLiteStorage, Storage  # noqa: E402
+
+
+TABLES = ("BanUserRole", "Ban", "Unban", "MessageDeletion", "Mute", "Supporter", "FactionRequest", "ScheduledMute",
+          "SchemaMigration", "Guild")
+"""All tables, children before their parents"""
+
+USERS = 200_000
+"""Distinct discord users in the seeded history"""
+
+CHANNELS = 300
+
+SEED_BATCH = 5000
+
+LOOKUPS = 200
+"""Timed lookups per query"""
+
+QUERIES = {
+    "mute history": "SELECT created_at, duration, reason, is_mute FROM Mute "
+                    "WHERE `subject` = %s ORDER BY created_at DESC LIMIT 25",
+    "last ban": "SELECT id, created_at, ban_reason FROM Ban WHERE user_id = %s ORDER BY created_at DESC LIMIT 1",
+    "last unban": "SELECT created_at, unban_reason FROM Unban WHERE user_id = %s ORDER BY created_at DESC LIMIT 1",
+    "deleted messages of user": "SELECT created_at, msg_content FROM MessageDeletion "
+                                "WHERE msg_author = %s ORDER BY created_at DESC LIMIT 25",
+    "deleted messages in channel": "SELECT created_at, msg_author FROM MessageDeletion "
+                                   "WHERE msg_channel = %s ORDER BY created_at DESC LIMIT 25",
+}
+
+
+def user_id(rnd: random.Random) -> int:
+    # few users have a long history, most users only one or two entries
+    return 100_000_000_000_000_000 + int(rnd.paretovariate(1.2)) % USERS
+
+
+def channel_id(rnd: random.Random) -> int:
+    return 800_000_000_000_000_000 + rnd.randrange(CHANNELS)
+
+
+async def create_tables(storage: Storage):
+    async with storage.session() as session:
+        if storage.dialect == "mariadb":
+            await session.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in TABLES:
+            await session.execute(f"DROP TABLE IF EXISTS {table}")
+        if storage.dialect == "mariadb":
+            await session.execute("SET FOREIGN_KEY_CHECKS = 1")
+    await storage.create_schema()
+    # the schema may already contain the tables of the migrations, the runner must start from scratch
+    await storage.execute("DROP TABLE IF EXISTS FactionRequest")
+    await storage.execute("DROP TABLE IF EXISTS ScheduledMute")
+
+
+async def seed_table(storage: Storage, prefix: str, values: str, amount: int, make_row):
+    start = time.perf_counter()
+    for offset in range(0, amount, SEED_BATCH):
+        rows = [make_row(i) for i in range(offset, min(amount, offset + SEED_BATCH))]
+        async with storage.transaction() as tx:
+            await tx.execute(*multi_row_insert(prefix, values, rows))
+    print(f"  {prefix.split()[2]}: {amount:,} rows in {time.perf_counter() - start:.1f}s")
+
+
+async def seed(storage: Storage, amount: int):
+    rnd = random.Random(42)
+    await storage.execute("INSERT INTO Guild (guild_id) VALUES (665677622604201993)")
+    await storage.execute(*multi_row_insert(
+        "INSERT INTO Supporter (guild_id, discord_id) VALUES ", "(1, %s)", [(900 + i,) for i in range(50)]))
+    now = time.time()
+
+    def created_at(i: int, total: int) -> str:
+        # spread over two years, in insert order
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now - 2 * 365 * 86400 * (1 - i / total)))
+
+    mutes = amount
+    await seed_table(storage, "INSERT INTO Mute (guild_id, created_at, actor, `subject`, duration, reason, is_mute) "
+                              "VALUES ", "(1, %s, %s, %s, %s, %s, %s)", mutes,
+                     lambda i: (created_at(i, mutes), 900 + i % 50, user_id(rnd), created_at(i, mutes),
+                                "Spam", i % 4 != 0))
+    deletions = amount
+    await seed_table(storage, "INSERT INTO MessageDeletion (created_at, msg_content, msg_created_at, msg_author, "
+                              "msg_channel, msg_attachment_amount, msg_sticker_amount, msg_flags, supporter_fk) VALUES ",
+                     "(%s, %s, %s, %s, %s, 0, 0, 0, %s)", deletions,
+                     lambda i: (created_at(i, deletions), "deleted message content", created_at(i, deletions),
+                                user_id(rnd), channel_id(rnd), 1 + i % 50))
+    bans = amount // 10
+    await seed_table(storage, "INSERT INTO Ban (created_at, banner_fk, user_id, ban_reason) VALUES ",
+                     "(%s, %s, %s, %s)", bans,
+                     lambda i: (created_at(i, bans), 1 + i % 50, user_id(rnd), "Regelverstoß"))
+    await seed_table(storage, "INSERT INTO BanUserRole (role_id, name, ban_fk) VALUES ", "(%s, %s, %s)", bans * 3,
+                     lambda i: (700 + i % 20, "Rolle", 1 + i // 3))
+    unbans = amount // 20
+    await seed_table(storage, "INSERT INTO Unban (created_at, user_id, supporter_fk, unban_reason) VALUES ",
+                     "(%s, %s, %s, %s)", unbans,
+                     lambda i: (created_at(i, unbans), user_id(rnd), 1 + i % 50, "Entbannungsantrag"))
+    for table in ("Mute", "MessageDeletion", "Ban", "BanUserRole", "Unban"):
+        if storage.dialect == "mariadb":
+            await storage.fetchall(f"ANALYZE TABLE {table}")
+        else:
+            await storage.execute(f"ANALYZE {table}")
+
+
+async def query_plan(storage: Storage, query: str, key: int) -> str:
+    if storage.dialect == "mariadb":
+        plan = await storage.fetchone("EXPLAIN " + query, (key,))
+        return f"{plan[3]} {plan[5] or ''}".strip()
+    plan = await storage.fetchall("EXPLAIN QUERY PLAN " + query, (key,))
+    return "; ".join(row[-1] for row in plan)
+
+
+async def time_queries(storage: Storage) -> dict:
+    rnd = random.Random(7)
+    results = {}
+    for name, query in QUERIES.items():
+        keys = [channel_id(rnd) if "msg_channel" in query else user_id(rnd) for _ in range(LOOKUPS)]
+        timings = []
+        for key in keys:
+            start = time.perf_counter()
+            await storage.fetchall(query, (key,))
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = (statistics.median(timings), timings[int(len(timings) * 0.95)],
+                         await query_plan(storage, query, keys[0]))
+    return results
+
+
+def parse_args():
+    args = sys.argv[1:]
+    if args[:1] == ["--mariadb"] and len(args) >= 6:
+        host, port, user, password, database = args[1:6]
+        return MariaDBStorage(host, int(port), user, password, database), args[6:]
+    if args[:1] == ["--sqlite"] and len(args) >= 2:
+        return SQLiteStorage(args[1]), args[2:]
+    print(__doc__)
+    sys.exit(1)
+
+
+async def main():
+    storage, rest = parse_args()
+    amount = int(rest[0]) if rest else 2_000_000
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    await storage.connect()
+    await create_tables(storage)
+    print(f"seeding {amount:,} mutes and message deletions into {storage.dialect}")
+    await seed(storage, amount)
+    before = await time_queries(storage)
+    start = time.perf_counter()
+    await migrate(storage, logging)
+    print(f"migrations applied in {time.perf_counter() - start:.1f}s")
+    after = await time_queries(storage)
+    await storage.close()
+
+    print(f"\n{'query':<30}{'before p50/p95 ms':>20}{'after p50/p95 ms':>20}")
+    for name in QUERIES:
+        b, a = before[name], after[name]
+        print(f"{name:<30}{b[0]:>10.2f}/{b[1]:<9.2f}{a[0]:>10.2f}/{a[1]:<9.2f}")
+        print(f"{'':<4}before: {b[2]}\n{'':<4}after:  {a[2]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+"""
+Response times of the lookups of /userinfo and /inviteinfo against a stubbed HTTP layer,
+before (one request after another, no invite cache) and after (concurrent lookups, invite TTL cache).
+
+The stub answers each request after a random round trip time with a long tail, like the discord API.
+
+Usage: python3 benchmarks/bench_userinfo.py [commands] [median round trip ms]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+import discord  # noqa: E402
+
+from Modules.ban_index import BanIndex  # noqa: E402
+from Modules.lookups import TTLCache, gather_with_deadline  # noqa: E402
+
+
+CONCURRENCY = 10
+"""Commands running at the same time"""
+
+RAID_INVITES = 5
+"""Distinct invite codes in the checked invites, a raid repeats the same few invites"""
+
+
+class StubHTTP:
+    """Answers fetch_user, fetch_ban and fetch_invite after a log-normal distributed round trip time"""
+
+    def __init__(self, median: float, banned: set):
+        self.median = median
+        self.banned = banned
+        self.requests = 0
+        self.loop = asyncio.get_running_loop()
+        self.__random = random.Random(3)
+
+    async def __round_trip(self):
+        self.requests += 1
+        await asyncio.sleep(self.median * self.__random.lognormvariate(0, 0.5))
+
+    async def fetch_user(self, user_id: int):
+        await self.__round_trip()
+        return SimpleNamespace(id=user_id, banner=None)
+
+    async def fetch_ban(self, user):
+        await self.__round_trip()
+        if user.id not in self.banned:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Ban")
+        return SimpleNamespace(user=user, reason="Regelverstoß")
+
+    async def fetch_invite(self, code: str, **kwargs):
+        await self.__round_trip()
+        return SimpleNamespace(code=code)
+
+    def bans(self, limit=None):
+        async def stream():
+            for user_id in sorted(self.banned):
+                yield SimpleNamespace(user=SimpleNamespace(id=user_id), reason="Regelverstoß")
+        return stream()
+
+
+async def userinfo_before(http: StubHTTP, user):
+    full_user = await http.fetch_user(user.id)
+    try:
+        ban = await http.fetch_ban(user)
+    except discord.NotFound:
+        ban = None
+    return full_user, ban
+
+
+async def userinfo_after(http: StubHTTP, bans: BanIndex, user):
+    return await gather_with_deadline(bans.fetch(http, user), http.fetch_user(user.id))
+
+
+async def inviteinfo_before(http: StubHTTP, code: str):
+    return await http.fetch_invite(code, with_counts=True, with_expiration=True)
+
+
+async def inviteinfo_after(http: StubHTTP, cache: TTLCache, code: str):
+    return await asyncio.wait_for(
+        cache.get(code, lambda: http.fetch_invite(code, with_counts=True, with_expiration=True)), 2.5)
+
+
+async def measure(amount: int, command) -> list:
+    """Runs the command `amount` times, CONCURRENCY at once, and returns the response times in ms"""
+    timings = []
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def run(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await command(i)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(run(i) for i in range(amount)))
+    timings.sort()
+    return timings
+
+
+def report(name: str, timings: list, requests: int):
+    p95 = timings[int(len(timings) * 0.95)]
+    print(f"{name:<40}{statistics.median(timings):>9.1f}{p95:>9.1f}{requests:>10}")
+
+
+async def main():
+    amount = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    median = (float(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+    users = [SimpleNamespace(id=100_000_000_000_000_000 + i) for i in range(amount)]
+    banned = {user.id for user in users[::4]}
+    codes = [f"raid{i % RAID_INVITES}" if i % 10 else f"other{i}" for i in range(amount)]
+
+    print(f"{'command':<40}{'p50 ms':>9}{'p95 ms':>9}{'requests':>10}")
+    http = StubHTTP(median, banned)
+    report("userinfo before", await measure(amount, lambda i: userinfo_before(http, users[i])), http.requests)
+
+    http = StubHTTP(median, banned)
+    warming = BanIndex(http)
+    report("userinfo after, ban index warming",
+           await measure(amount, lambda i: userinfo_after(http, warming, users[i])), http.requests)
+
+    http = StubHTTP(median, banned)
+    loaded = BanIndex(http)
+    await loaded.load(http)
+    http.requests = 0
+    report("userinfo after, ban index loaded",
+           await measure(amount, lambda i: userinfo_after(http, loaded, users[i])), http.requests)
+
+    http = StubHTTP(median, banned)
+    report("inviteinfo before", await measure(amount, lambda i: inviteinfo_before(http, codes[i])), http.requests)
+
+    http = StubHTTP(median, banned)
+    cache = TTLCache(60)
+    report("inviteinfo after", await measure(amount, lambda i: inviteinfo_after(http, cache, codes[i])), http.requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
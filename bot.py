@@ -1,23 +1,39 @@
 #!/usr/bin/python3
+import asyncio
 import configparser
 import datetime
+import gzip
 import logging
 import os
 import re
+import signal
 import sys
 import traceback
 from datetime import timedelta
-from io import StringIO
-from typing import List, Optional
+from io import BytesIO
+from typing import Dict, List, Optional
 
-import aiomysql
 import discord
 from discord.ext import commands
 
 import Modules.factions
 import Modules.forbidden_usernames
 import Modules.timeouts
+from Modules.attachment_archive import AttachmentArchiver, CapturedAttachment
+from Modules.audit_writer import AuditWriter, multi_row_insert
+from Modules.ban_index import BanIndex
+from Modules.db_metrics import DatabaseMetrics, MetricsServer
+from Modules.faction_members import role_members, write_member_csv
 from Modules.factions import FactionConfig
+from Modules.log_sink import ChannelLogSink
+from Modules.lookups import LOOKUP_DEADLINE, TTLCache, gather_with_deadline
+from Modules.message_deleter import MessageDeleter
+from Modules.migrations import migrate
+from Modules.mute_scheduler import MuteScheduler
+from Modules.raid_protection import RaidProtection
+from Modules.role_queue import RoleMutationQueue
+from Modules.storage import Storage, create_storage
+from Modules.supporters import SupporterDirectory
 from modals.TimeoutContextModal import TimeoutContextModal
 
 
@@ -46,33 +62,51 @@ async def format_message_placeholders(msg: str, user_id: int):
 class Bot(discord.Bot):
     def __init__(self, description=None, *args, **options):
         super().__init__(description, *args, **options)
-        self.pool = None
+        self.storage: Optional[Storage] = None
+        self.db_metrics: Optional[DatabaseMetrics] = None
+        self.metrics_server: Optional[MetricsServer] = None
+        self.message_deleter = MessageDeleter(self)
+        self.faction_log = ChannelLogSink(self, FactionConfig.get_log_channel_id)
+        self.role_queue = RoleMutationQueue(self)
+        self.supporters = SupporterDirectory(self)
+        self.bans = BanIndex(self)
+        self.attachment_archiver = AttachmentArchiver()
+        self.audit = AuditWriter(self)
+        self.mute_history = self.audit.table(
+            "Mute", ("guild_id", "actor", "`subject`", "duration", "reason", "is_mute"),
+            values="((SELECT id FROM Guild WHERE guild_id = %s), %s, %s, %s, %s, %s)",
+        )
+        """Mutes and unmutes as (guild id, actor id, subject id, muted until in UTC, reason, is mute)"""
+        self.message_deletions = self.audit.table(
+            "MessageDeletion", ("msg_content", "msg_reference", "msg_created_at", "msg_author", "msg_channel",
+                                "msg_attachment_amount", "msg_sticker_amount", "msg_flags", "log_message_jump_url",
+                                "supporter_fk"),
+        )
 
     async def close(self):
-        await self.pool.close()  # close the db connection before the bot closes the async event pool
+        await self.faction_log.close()
+        await self.attachment_archiver.close()
+        try:
+            await self.audit.close()
+        except Exception as e:
+            logging.error(f"couldn't write {self.audit.depth} audit rows before closing", exc_info=e)
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+        # close the db connection before the bot closes the async event pool
+        await self.storage.close()
         await super().close()
 
     async def fetchone(self, query, args=None):
-        async with self.pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(query, args)
-                return await cur.fetchone()
+        return await self.storage.fetchone(query, args)
 
     async def fetchall(self, query, args=None):
-        async with self.pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(query, args)
-                return await cur.fetchall()
+        return await self.storage.fetchall(query, args)
 
     async def execute(self, query, args=None):
-        async with self.pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(query, args)
+        await self.storage.execute(query, args)
 
     async def executemany(self, query, args=None):
-        async with self.pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.executemany(query, args)
+        await self.storage.executemany(query, args)
 
 
 bot = Bot(
@@ -83,6 +117,7 @@ bot = Bot(
         members=True,
         guilds=True,
         voice_states=True,
+        bans=True,
     ),
     allowed_mentions=discord.AllowedMentions.none(),
 )
@@ -96,34 +131,74 @@ logging.basicConfig(
 logging.info("Started with python version " + sys.version)
 config = configparser.ConfigParser()
 config.read(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'config.ini'))
+FACTION_CONFIG_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "fraktionen-config.json")
 try:
-    FactionConfig.parse(os.path.join(os.path.dirname(os.path.realpath(__file__)), "fraktionen-config.json"))
+    FactionConfig.parse(FACTION_CONFIG_PATH)
 except Exception as e:
     logging.error("error with config", exc_info=e)
     raise e
 
 
-async def init_pool():
-    bot.pool = await aiomysql.create_pool(
-        host=config.get("MariaDB", "host"),
-        port=int(config.get("MariaDB", "port")),
-        user=config.get("MariaDB", "user"),
-        password=config.get("MariaDB", "password"),
-        db=config.get("MariaDB", "database"),
-        loop=bot.loop,
-        autocommit=True)
+async def init_storage():
+    bot.db_metrics = DatabaseMetrics(logging, config.getfloat("Metrics", "slow-query-ms", fallback=200) / 1000)
+    bot.storage = create_storage(config, bot.db_metrics)
+    await bot.storage.connect()
+    await migrate(bot.storage, logging)
+    metrics_port = config.getint("Metrics", "port", fallback=0)
+    if metrics_port:
+        bot.metrics_server = MetricsServer(bot.db_metrics, bot.storage,
+                                           config.get("Metrics", "host", fallback="127.0.0.1"), metrics_port,
+                                           audit=bot.audit)
+        await bot.metrics_server.start()
 
 
-bot.loop.run_until_complete(init_pool())
+bot.loop.run_until_complete(init_storage())
 
 GUILD_ID = int(config.get("Settings", "guild_id"))
 MUTE_LOG = int(config.get("Settings", "mute-log-channel-id"))
 MAIN_LOG = int(config.get("Settings", "main-log-channel-id"))
 
+INVITE_CACHE_TTL = 60
+"""Seconds an invite looked up with /inviteinfo stays cached"""
+
+ATTACHMENT_BYTE_BUDGET = config.getint("Settings", "message-deletion-attachment-budget-mb", fallback=25) * 1024 * 1024
+"""Bytes of attachments archived per deleted message, limited by the upload limit of the guild"""
+
 TEAM_ROLE_IDS: List[int] = []
 for k, val in config.items("Team-Role-IDs"):
     TEAM_ROLE_IDS.append(int(val))
 
+Modules.forbidden_usernames.ForbiddenUsernameConfig.load(config)
+raid_protection = RaidProtection(bot, config, MAIN_LOG, logging)
+mute_scheduler = MuteScheduler(bot, GUILD_ID)
+invite_cache: TTLCache[discord.Invite] = TTLCache(INVITE_CACHE_TTL)
+"""Invites by code, so repeated checks of the same invite don't need a request each"""
+
+
+async def reload_faction_config():
+    """Reloads the faction config without a restart. The old config stays active if the new one is invalid."""
+    snapshot = await FactionConfig.reload(FACTION_CONFIG_PATH, bot.loop)
+    logging.info(f"faction config reloaded with {len(snapshot.factions)} factions")
+    guild = bot.get_guild(GUILD_ID)
+    if guild and snapshot.role_ids != role_members.tracked_role_ids:
+        role_members.rebuild(snapshot.role_ids, guild.members)
+    return snapshot
+
+
+def on_sighup():
+    async def reload():
+        try:
+            await reload_faction_config()
+        except Exception as err:
+            logging.error("couldn't reload faction config", exc_info=err)
+    bot.loop.create_task(reload())
+
+
+try:
+    bot.loop.add_signal_handler(signal.SIGHUP, on_sighup)
+except (AttributeError, NotImplementedError):
+    pass  # no SIGHUP on windows
+
 
 #...
 
@@ -148,12 +223,36 @@ async def on_application_command_error(ctx, error):
 async def on_ready():
     print(f"Logged in as {bot.user.name} ({bot.user.id})")
     logging.info(f"Logged in as {bot.user.name} ({bot.user.id})")
-    await Modules.factions.clear_reactions_in_faction_channel(bot)
+    bot.message_deleter.start(logging)
+    bot.faction_log.start(logging)
+    bot.audit.start(logging)
+    bot.supporters.start(logging)
+    try:
+        await bot.execute(
+            "INSERT INTO Guild (guild_id) SELECT %s FROM DUAL WHERE NOT EXISTS (SELECT 1 FROM Guild WHERE guild_id = %s)",
+            (GUILD_ID, GUILD_ID),
+        )
+    except Exception as e:
+        logging.error("could not insert the guild", exc_info=e)
+    guild = bot.get_guild(GUILD_ID)
+    if guild:
+        role_members.rebuild(FactionConfig.snapshot().role_ids, guild.members)
+        bot.bans.start(guild, logging)
+    try:
+        await Modules.factions.load_pending_requests(bot, logging)
+    except Exception as e:
+        logging.error("could not load pending faction requests", exc_info=e)
+    Modules.factions.start_request_cleanup(bot, logging)
+    if guild:
+        try:
+            await mute_scheduler.load(guild)
+        except Exception as e:
+            logging.error("could not load scheduled mutes", exc_info=e)
+    mute_scheduler.start(logging)
 
 
 @bot.event
 async def on_connect():
-    Modules.factions.on_connect()
     if bot.auto_sync_commands:
         await bot.sync_commands()
 
@@ -168,18 +267,48 @@ async def on_message(message):
 
 
 @bot.event
-async def on_reaction_add(reaction: discord.Reaction, user):
-    if user.bot or user.system:
+async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
+    if payload.member is None or payload.member.bot or payload.member.system:
         return
-    if FactionConfig.get_faction_chat_id() == reaction.message.channel.id:
-        await Modules.factions.reacted_in_faction_channel(bot, reaction, user, logging)
+    if FactionConfig.get_faction_chat_id() == payload.channel_id:
+        await Modules.factions.reacted_in_faction_channel(bot, payload, logging)
 
 
 @bot.event
 async def on_member_join(member: discord.Member):
+    role_members.add_member(member)
+    mute_scheduler.on_member_join(member)
+    if await raid_protection.on_member_join(member):
+        return  # will be removed with the other raid members
     await Modules.forbidden_usernames.on_user_update(member, member, bot, logging, config)
 
 
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if before.roles != after.roles:
+        role_members.update_member(before, after)
+    if before.communication_disabled_until != after.communication_disabled_until:
+        await mute_scheduler.on_member_update(before, after)
+
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    role_members.remove_member(member)
+
+
+@bot.event
+async def on_member_ban(guild: discord.Guild, user):
+    if guild.id == GUILD_ID:
+        # no request here, the reason is fetched on the first lookup
+        bot.bans.add_unknown(user.id)
+
+
+@bot.event
+async def on_member_unban(guild: discord.Guild, user: discord.User):
+    if guild.id == GUILD_ID:
+        bot.bans.remove(user.id)
+
+
 @bot.event
 async def on_user_update(before, after):
     await Modules.forbidden_usernames.on_user_update(before, after, bot, logging, config)
@@ -217,74 +346,60 @@ async def ban(ctx: discord.ApplicationContext,
         return
 
     try:
-        ban = await ctx.guild.fetch_ban(user)
-    except discord.NotFound:
-        pass  # only continue if the user not already banned
+        ban = await bot.bans.fetch(ctx.guild, user)
     except discord.HTTPException as ban_get_error:
         logging.error("couldn't fetch ban", exc_info=ban_get_error)
         raise ban_get_error
-    else:
+    if ban is not None:  # only continue if the user not already banned
         assert ban.user.id == user.id
         await ctx.respond(f"{user.mention} ist bereits gebannt", ephemeral=True)
         return
 
-    async with bot.pool.acquire() as conn:
-        await conn.autocommit(False)
-        await conn.begin()
-        async with conn.cursor() as cursor:
-
-            await cursor.execute(
-                """
-                INSERT INTO Ban (banner_fk, user_id, ban_reason) VALUES (
-                    (SELECT id FROM Supporter WHERE discord_id = %s),
-                    %s,
-                    %s
-                );
-                """,
-                (ctx.user.id, user.id, reason),
-            )
+    banner = await bot.supporters.resolve(ctx.user.id)
+    async with bot.storage.transaction() as tx:
+        await tx.execute(
+            "INSERT INTO Ban (banner_fk, user_id, ban_reason) VALUES (%s, %s, %s);",
+            (banner.id if banner else None, user.id, reason),
+        )
 
-            # attach roles
-            records_to_insert: List[tuple] = []
-            for role in user.roles:
-                records_to_insert.append((role.id, role.name, cursor.lastrowid,))
-            await cursor.executemany(
-                "INSERT INTO BanUserRole (role_id, name, ban_fk) VALUES (%s, %s)",
+        # attach roles
+        records_to_insert: List[tuple] = []
+        for role in getattr(user, "roles", ()):
+            records_to_insert.append((role.id, role.name, tx.lastrowid,))
+        if records_to_insert:
+            await tx.execute(*multi_row_insert(
+                "INSERT INTO BanUserRole (role_id, name, ban_fk) VALUES ",
+                "(%s, %s, %s)",
                 records_to_insert,
-            )
+            ))
 
-            try:
-                #await ctx.guild.ban(user, reason=reason)
-                pass
-            except discord.HTTPException as ban_error:
-                await conn.rollback()
-                logging.error(f"couldn't ban {user.id}", exc_info=ban_error)
-                raise ban_error
-            else:
-                await conn.commit()
-            finally:
-                await conn.autocommit(True)
-
-            await ctx.respond(f"{user.mention} wurde gebannt", ephemeral=True)
-
-            # log message
-            e = discord.Embed()
-            e.colour = 0x47b07f
-            e.set_author(
-                name=f"[BAN] {user.display_name}",
-                icon_url=user.display_avatar
-            )
-            e.add_field(name="Nutzer", value=user.mention)
-            e.add_field(name="Moderator", value=ctx.user.mention)
-            e.add_field(name="Bann-Grund", value=discord.utils.escape_markdown(reason))
-            try:
-                channel = bot.get_channel(MUTE_LOG)
-                if channel:
-                    await channel.send(embed=e)
-                else:
-                    logging.error("Mute-log channel not found")
-            except discord.Forbidden as e:
-                logging.error("Cannot send messages in Mute-log", exc_info=e)
+        try:
+            #await ctx.guild.ban(user, reason=reason)
+            pass
+        except discord.HTTPException as ban_error:
+            logging.error(f"couldn't ban {user.id}", exc_info=ban_error)
+            raise ban_error  # rolls the transaction back
+
+    await ctx.respond(f"{user.mention} wurde gebannt", ephemeral=True)
+
+    # log message
+    e = discord.Embed()
+    e.colour = 0x47b07f
+    e.set_author(
+        name=f"[BAN] {user.display_name}",
+        icon_url=user.display_avatar
+    )
+    e.add_field(name="Nutzer", value=user.mention)
+    e.add_field(name="Moderator", value=ctx.user.mention)
+    e.add_field(name="Bann-Grund", value=discord.utils.escape_markdown(reason))
+    try:
+        channel = bot.get_channel(MUTE_LOG)
+        if channel:
+            await channel.send(embed=e)
+        else:
+            logging.error("Mute-log channel not found")
+    except discord.Forbidden as e:
+        logging.error("Cannot send messages in Mute-log", exc_info=e)
 
 
 @bot.slash_command(
@@ -375,34 +490,172 @@ async def fraction_list(ctx: discord.ApplicationContext,
         await ctx.respond(content="Du musst OG dieser Fraktion sein um diesen Befehl benutzen zu können", ephemeral=True)
         return
     g = bot.get_guild(GUILD_ID)
-    frak_members = []
-    og_members = []
-
-    def go_through(mem):
-        for r in mem.roles:
-            if r.id in faction.og_role_ids:
-                og_members.append(mem)
-                return
-        for r in mem.roles:
-            if r.id == faction.member_role_id:
-                frak_members.append(mem)
-                return
-
-    for m in g.members:
-        go_through(m)
-
-    content = "Rang,Discord ID,Anzeigename\n"
-    for m in og_members:
-        content += f"OG,{m.id},{m.display_name}\n"
-    for m in frak_members:
-        content += f",{m.id},{m.display_name}\n"
-    with StringIO(content) as c:
+    og_ids = set()
+    for role_id in faction.og_role_ids:
+        og_ids |= role_members.member_ids(role_id)
+    member_ids = role_members.member_ids(faction.member_role_id) - og_ids
+
+    rows = []
+    for rank, ids in (("OG", og_ids), ("", member_ids)):
+        members = [m for m in map(g.get_member, ids) if m is not None]
+        members.sort(key=lambda mem: mem.display_name.casefold())
+        rows.extend((rank, m.id, m.display_name) for m in members)
+
+    await ctx.defer(ephemeral=True)
+    buffer, filename = await bot.loop.run_in_executor(None, write_member_csv, rows)
+    with buffer:
         await ctx.respond(
-            file=discord.File(c, filename="mitglieder.csv"),
+            file=discord.File(buffer, filename=filename),
             ephemeral=True,
         )
 
 
+@bot.slash_command(
+    guild_ids=[GUILD_ID],
+    name="frak-reload",
+    description="Lädt die Fraktions-Konfiguration neu",
+)
+@commands.cooldown(1, 30, commands.BucketType.guild)
+@discord.default_permissions(administrator=True)
+async def reload_factions_command(ctx: discord.ApplicationContext):
+    if not ctx.user.guild_permissions.administrator:
+        await ctx.respond("Du musst Administrator sein um dies benutzen zu können", ephemeral=True)
+        return
+    await ctx.defer(ephemeral=True)
+    try:
+        snapshot = await reload_faction_config()
+    except Exception as err:
+        logging.error("couldn't reload faction config", exc_info=err)
+        await ctx.edit(content=f":x: Fraktions-Konfiguration ist fehlerhaft und wurde nicht geladen: {truncate(str(err), 1500)}")
+        return
+    await ctx.edit(embed=discord.Embed(
+        description=f"Fraktions-Konfiguration mit {len(snapshot.factions)} Fraktionen neu geladen"))
+
+
+@bot.slash_command(
+    guild_ids=[GUILD_ID],
+    name="db-stats",
+    description="Zeigt die Laufzeiten der Datenbank-Abfragen",
+)
+@commands.cooldown(1, 10, commands.BucketType.user)
+@discord.default_permissions(administrator=True)
+async def db_stats_command(ctx: discord.ApplicationContext):
+    if not ctx.user.guild_permissions.administrator:
+        await ctx.respond("Du musst Administrator sein um dies benutzen zu können", ephemeral=True)
+        return
+    metrics = bot.db_metrics
+    e = discord.Embed()
+    e.title = "Datenbank-Statistiken"
+    e.description = f"Seit {discord.utils.format_dt(datetime.datetime.fromtimestamp(metrics.started_at), 'R')}, " \
+                    f"Backend `{bot.storage.dialect}`"
+    pool = bot.storage.pool_stats()
+    e.add_field(name="Verbindungen", value=f"{pool.get('in_use', 0)} aktiv, {pool.get('idle', 0)} frei, "
+                                           f"max. {pool.get('max_size', 0)}", inline=True)
+    e.add_field(name="Warten auf Verbindung",
+                value=f"p50 {metrics.pool_wait.quantile(0.5) * 1000:g} ms, "
+                      f"p95 {metrics.pool_wait.quantile(0.95) * 1000:g} ms, "
+                      f"max {metrics.pool_wait.max * 1000:.1f} ms", inline=True)
+    e.add_field(name="Langsame Abfragen", value=f"{metrics.slow_queries} über {metrics.slow_query_seconds * 1000:g} ms",
+                inline=True)
+    audit = bot.audit
+    e.add_field(name="Audit-Warteschlange",
+                value=f"{audit.depth} wartend, {audit.rows_written} geschrieben, {audit.rows_dropped} verworfen, "
+                      f"{audit.waits}x voll\nFlush zuletzt {audit.last_flush_latency * 1000:.1f} ms, "
+                      f"max. {audit.max_flush_latency * 1000:.1f} ms", inline=False)
+    for key, histogram in metrics.top(8):
+        e.add_field(
+            name=truncate(key, 256),
+            value=f"{histogram.count}x, gesamt {histogram.total * 1000:.0f} ms, "
+                  f"p50 {histogram.quantile(0.5) * 1000:g} ms, p95 {histogram.quantile(0.95) * 1000:g} ms, "
+                  f"max {histogram.max * 1000:.1f} ms",
+            inline=False,
+        )
+    await ctx.respond(embed=e, ephemeral=True)
+
+
+@bot.slash_command(
+    guild_ids=[GUILD_ID],
+    name="forbidden-name-sweep",
+    description="Prüft alle Mitglieder auf verbotene Namen",
+)
+@commands.cooldown(1, 60 * 5, commands.BucketType.guild)
+@discord.default_permissions(administrator=True)
+async def forbidden_name_sweep_command(ctx: discord.ApplicationContext,
+                                       kick: discord.Option(bool,
+                                                            name="kicken",
+                                                            description="Gefundene Mitglieder kicken. Ohne wird nur ein Bericht erstellt") = False):
+    if not ctx.user.guild_permissions.administrator:
+        await ctx.respond("Du musst Administrator sein um dies benutzen zu können", ephemeral=True)
+        return
+    await ctx.defer(ephemeral=True)
+    members = list(ctx.guild.members)
+    hits = await Modules.forbidden_usernames.find_forbidden_members(members)
+    report = Modules.forbidden_usernames.sweep_report(hits)
+    if not kick or not hits:
+        await ctx.edit(
+            embed=discord.Embed(description=f"{len(hits)} von {len(members)} Mitgliedern haben einen verbotenen Namen"),
+            file=discord.File(BytesIO(report), filename="verbotene-namen.csv"),
+        )
+        return
+
+    async def on_progress(done: int, total: int):
+        await ctx.edit(embed=discord.Embed(description=f"Kicke Mitglieder mit verbotenen Namen... {done}/{total}"))
+
+    await on_progress(0, len(hits))
+    kicked, failed = await Modules.forbidden_usernames.kick_members(hits, logging, on_progress)
+    logging.info(f"forbidden name sweep by {ctx.user.id}: {kicked} kicked, {failed} failed")
+    e = discord.Embed()
+    e.description = f"{kicked} Mitglieder wegen verbotenen Namen gekickt"
+    if failed:
+        e.description += f"\n{failed} konnten nicht gekickt werden"
+    await ctx.edit(embed=e, file=discord.File(BytesIO(report), filename="verbotene-namen.csv"))
+
+    # log message
+    e.set_author(name=f"Verbotene Namen geprüft von {ctx.user.display_name}", icon_url=ctx.user.display_avatar.url)
+    e.colour = discord.Colour.red()
+    e.timestamp = discord.utils.utcnow()
+    try:
+        channel = bot.get_channel(MAIN_LOG)
+        if channel:
+            await channel.send(embed=e, file=discord.File(BytesIO(report), filename="verbotene-namen.csv"))
+        else:
+            logging.error("Main-log channel not found")
+    except discord.Forbidden as err:
+        logging.error("Cannot send messages in Main-log", exc_info=err)
+
+
+BULK_MUTE_CONCURRENCY = 5
+"""Parallel timeout requests of /mute-bulk. Stays below discord's rate limit for member edits"""
+
+BULK_MUTE_HISTORY_LIMIT = 500
+"""Maximum amount of messages /mute-bulk reads from a channel"""
+
+
+def mute_denied_reason(actor: discord.abc.User, member: discord.Member) -> Optional[str]:
+    """
+    Checks whether the actor may mute the member
+    :return: The message for the actor why the member can't be muted, or None if the mute is allowed
+    """
+    if member.bot or member.system or member.guild_permissions.administrator:
+        return "Du kannst diesen Benutzer nicht stumm schalten"
+    if member.id == actor.id:
+        return "Du kannst dich nicht selbst stumm schalten"
+    for r in member.roles:
+        if r.id in TEAM_ROLE_IDS:
+            return "Du kannst keinen Moderator stumm schalten"
+    return None
+
+
+def invalid_mute_duration_embed() -> discord.Embed:
+    e = discord.Embed()
+    e.title = "Ungültige Mute-länge"
+    e.description = "Gültige Zeitangaben sind zum Beispiel `1d 30m`, `17d` oder `2w`.\n" \
+                    "Es muss immer eine Zahl mit einem Zeitkürzel (**w**, **d**, **h**, **m** oder **s**) folgen, " \
+                    "für jeweils Wochen, Tage, Stunden, Minuten und Sekunden. " \
+                    "Diese Zeiteinheiten sind dabei frei miteinander Kombinierbar!"
+    return e
+
+
 @bot.user_command(
     name="Timeout",
     guild_ids=[GUILD_ID],
@@ -410,22 +663,17 @@ async def fraction_list(ctx: discord.ApplicationContext,
 @discord.default_permissions(administrator=True)
 @commands.has_any_role(*TEAM_ROLE_IDS)
 async def context_mute(ctx: discord.ApplicationContext, member: discord.Member):
-    if member.bot or member.system or member.guild_permissions.administrator:
-        await ctx.respond("Du kannst diesen Benutzer nicht stumm schalten", ephemeral=True)
-        return
-    if ctx.user.id == member.id:
-        await ctx.respond("Du kannst dich nicht selbst stumm schalten", ephemeral=True)
+    denied_reason = mute_denied_reason(ctx.user, member)
+    if denied_reason:
+        await ctx.respond(denied_reason, ephemeral=True)
         return
-    for r in member.roles:
-        if r.id in TEAM_ROLE_IDS:
-            await ctx.respond("Du kannst keinen Moderator stumm schalten", ephemeral=True)
-            return
     modal = TimeoutContextModal(
         title=f"Timeout für {member.display_name}",
         member=member,
         bot=bot,
         logging=logging,
         MUTE_LOG=MUTE_LOG,
+        mute_scheduler=mute_scheduler,
     )
     await ctx.send_modal(modal)
 
@@ -441,31 +689,20 @@ async def mute(ctx: discord.ApplicationContext,
                user: discord.Option(discord.SlashCommandOptionType.user,
                                     description="Der Benutzer oder die Benutzer-ID als Zahl"),
                duration: discord.Option(discord.SlashCommandOptionType.string,
-                                        description="Mute dauer (3d 10h 5m 29s)"),
-               reason: discord.Option(discord.SlashCommandOptionType.string, description="Mute-Grund")):
+                                        description="Mute dauer (1w 3d 10h 5m 29s)"),
+               reason: discord.Option(discord.SlashCommandOptionType.string, max_length=512,
+                                      description="Mute-Grund")):
     if not isinstance(user, discord.Member):
         await ctx.respond("Benutzer nicht gefunden oder nicht auf dem Server", ephemeral=True)
         return
-    if user.bot or user.system or user.guild_permissions.administrator:
-        await ctx.respond("Du kannst diesen Benutzer nicht stumm schalten", ephemeral=True)
-        return
-    if user.id == ctx.interaction.user.id:
-        await ctx.respond("Du kannst dich nicht selbst stumm schalten", ephemeral=True)
+    denied_reason = mute_denied_reason(ctx.interaction.user, user)
+    if denied_reason:
+        await ctx.respond(denied_reason, ephemeral=True)
         return
-    for r in user.roles:
-        if r.id in TEAM_ROLE_IDS:
-            await ctx.respond("Du kannst keinen Moderator stumm schalten", ephemeral=True)
-            return
     try:
-        timeout = Modules.timeouts.TimeoutDuration(duration)
+        timeout = Modules.timeouts.TimeoutDuration(duration, maximise_to_discord_limit=False)
     except Exception:
-        e = discord.Embed()
-        e.title = "Ungültige Mute-länge"
-        e.description = "Gültige Zeitangaben sind zum Beispiel `1d 30m` oder `17d`.\n" \
-                        "Es muss immer eine Zahl mit einem Zeitkürzel (**d**, **h**, **m** oder **s**) folgen, für " \
-                        "jeweils Tage, Stunden, Minuten und Sekunden. " \
-                        "Diese Zeiteinheiten sind dabei frei miteinander Kombinierbar!"
-        await ctx.respond(embed=e, ephemeral=True)
+        await ctx.respond(embed=invalid_mute_duration_embed(), ephemeral=True)
         return
 
     # minimize seconds
@@ -474,7 +711,8 @@ async def mute(ctx: discord.ApplicationContext,
         return
 
     new_mute_timestamp = timeout.mute_timestamp_for_discord()
-    if user.timed_out and new_mute_timestamp.timestamp() <= user.communication_disabled_until.timestamp():
+    muted_until = mute_scheduler.ends_at(user.id) or user.communication_disabled_until
+    if user.timed_out and timeout.expires_at.timestamp() <= muted_until.timestamp():
         e = discord.Embed()
         e.set_author(
             name=f"{discord.utils.escape_markdown(user.display_name)}#{user.discriminator} ist schon stumm geschaltet",
@@ -482,7 +720,7 @@ async def mute(ctx: discord.ApplicationContext,
         )
         e.add_field(
             name="Ablaufdatum",
-            value=discord.utils.format_dt(user.communication_disabled_until, 'R'),
+            value=discord.utils.format_dt(muted_until, 'R'),
             inline=True
         )
         e.set_footer(text=f"ID {user.id}")
@@ -491,6 +729,8 @@ async def mute(ctx: discord.ApplicationContext,
     try:
         await user.timeout(new_mute_timestamp, reason=reason)
         logging.info("muted user " + str(user.id))
+        await mute_scheduler.after_timeout(user, timeout.expires_at, new_mute_timestamp, reason, logging)
+        await bot.mute_history.put((GUILD_ID, ctx.user.id, user.id, timeout.expires_at.replace(tzinfo=None), reason, True))
     except discord.HTTPException as e:
         logging.error("cannot mute user " + str(user.id), exc_info=e)
         await ctx.respond(f"{user.mention} konnte nicht stumm geschaltet werden", ephemeral=True)
@@ -501,7 +741,7 @@ async def mute(ctx: discord.ApplicationContext,
             icon_url=user.display_avatar.url
         )
         e.description = f"Timeout für {timeout.to_mute_length_str()}\n" \
-                        f"Bis: {discord.utils.format_dt(new_mute_timestamp, 'F')}"
+                        f"Bis: {discord.utils.format_dt(timeout.expires_at, 'F')}"
         e.add_field(
             name="Grund",
             value=discord.utils.escape_markdown(reason)
@@ -520,6 +760,112 @@ async def mute(ctx: discord.ApplicationContext,
             logging.error("Cannot send messages in Mute-log")
 
 
+@bot.slash_command(
+    guild_ids=[GUILD_ID],
+    name="mute-bulk",
+    description="Mehrere Benutzer auf einmal in Timeout schicken",
+)
+@commands.cooldown(2, 2 * 60, commands.BucketType.user)
+@discord.default_permissions(administrator=True)
+@commands.has_any_role(*TEAM_ROLE_IDS)
+async def mute_bulk(ctx: discord.ApplicationContext,
+                    duration: discord.Option(discord.SlashCommandOptionType.string,
+                                             description="Mute dauer (1w 3d 10h 5m 29s)"),
+                    reason: discord.Option(discord.SlashCommandOptionType.string, max_length=512,
+                                           description="Mute-Grund"),
+                    users: discord.Option(discord.SlashCommandOptionType.string,
+                                          description="Benutzer-Erwähnungen oder Benutzer-IDs") = None,
+                    channel: discord.Option(discord.SlashCommandOptionType.channel,
+                                            channel_types=[discord.ChannelType.text],
+                                            description="Alle Verfasser der letzten Nachrichten in diesem Channel") = None,
+                    minutes: discord.Option(discord.SlashCommandOptionType.integer,
+                                            description="Zeitraum für den Channel in Minuten. Standard 5",
+                                            min_value=1, max_value=60) = 5):
+    if not users and channel is None:
+        await ctx.respond("Gib Benutzer oder einen Channel an", ephemeral=True)
+        return
+    try:
+        timeout = Modules.timeouts.TimeoutDuration(duration, maximise_to_discord_limit=False)
+    except Exception:
+        await ctx.respond(embed=invalid_mute_duration_embed(), ephemeral=True)
+        return
+    if timeout.total_seconds < 5:
+        await ctx.respond("Die mute dauer muss mindestens 5 Sekunden sein", ephemeral=True)
+        return
+    await ctx.defer(ephemeral=True)
+
+    # dict keeps the order and drops duplicates
+    user_ids = dict.fromkeys(int(i) for i in re.findall(r"\d{15,20}", users or ""))
+    if channel is not None:
+        after = discord.utils.utcnow() - timedelta(minutes=minutes)
+        async for message in channel.history(limit=BULK_MUTE_HISTORY_LIMIT, after=after):
+            if not message.author.bot:
+                user_ids[message.author.id] = None
+
+    # validate all users in one pass before the first request
+    members: List[discord.Member] = []
+    skipped: List[str] = []
+    for user_id in user_ids:
+        member = ctx.guild.get_member(user_id)
+        if member is None:
+            skipped.append(f"<@{user_id}>: nicht auf dem Server")
+            continue
+        denied_reason = mute_denied_reason(ctx.user, member)
+        if denied_reason:
+            skipped.append(f"{member.mention}: {denied_reason}")
+            continue
+        muted_until = mute_scheduler.ends_at(member.id) or member.communication_disabled_until
+        if member.timed_out and timeout.expires_at.timestamp() <= muted_until.timestamp():
+            skipped.append(f"{member.mention}: schon stumm geschaltet")
+            continue
+        members.append(member)
+
+    new_mute_timestamp = timeout.mute_timestamp_for_discord()
+    semaphore = asyncio.Semaphore(BULK_MUTE_CONCURRENCY)
+
+    async def apply_mute(member: discord.Member) -> bool:
+        async with semaphore:
+            try:
+                await member.timeout(new_mute_timestamp, reason=reason)
+            except discord.HTTPException as err:
+                logging.error("cannot mute user " + str(member.id), exc_info=err)
+                return False
+        logging.info("muted user " + str(member.id))
+        await mute_scheduler.after_timeout(member, timeout.expires_at, new_mute_timestamp, reason, logging)
+        await bot.mute_history.put((GUILD_ID, ctx.user.id, member.id, timeout.expires_at.replace(tzinfo=None), reason, True))
+        return True
+
+    results = await asyncio.gather(*(apply_mute(m) for m in members))
+    muted = [m for m, ok in zip(members, results) if ok]
+    failed = [m for m, ok in zip(members, results) if not ok]
+
+    e = discord.Embed()
+    e.title = f"{len(muted)} Benutzer wurden stumm geschaltet"
+    e.description = f"Timeout für {timeout.to_mute_length_str()}\n" \
+                    f"Bis: {discord.utils.format_dt(timeout.expires_at, 'F')}"
+    e.add_field(name="Grund", value=discord.utils.escape_markdown(reason), inline=False)
+    if muted:
+        e.add_field(name="Stumm geschaltet", value=truncate(" ".join(m.mention for m in muted)), inline=False)
+    if failed:
+        e.add_field(name="Fehlgeschlagen", value=truncate(" ".join(m.mention for m in failed)), inline=False)
+    if skipped:
+        e.add_field(name="Übersprungen", value=truncate("\n".join(skipped)), inline=False)
+    e.colour = discord.Colour.orange()
+    await ctx.respond(embed=e, ephemeral=True)
+    if not muted:
+        return
+    # log
+    e.description += f"\nGestummt von {ctx.user.mention}"
+    try:
+        log_channel = bot.get_channel(MUTE_LOG)
+        if log_channel:
+            await log_channel.send(embed=e)
+        else:
+            logging.error("Mute-log channel not found")
+    except discord.Forbidden:
+        logging.error("Cannot send messages in Mute-log")
+
+
 @bot.slash_command(
     guild_ids=[GUILD_ID],
     description="Timeout von Benutzern entfernen",
@@ -530,17 +876,19 @@ async def mute(ctx: discord.ApplicationContext,
 async def unmute(ctx: discord.ApplicationContext,
                  user: discord.Option(discord.SlashCommandOptionType.user,
                                       description="Der Benutzer oder die Benutzer-ID als Zahl"),
-                 reason: discord.Option(discord.SlashCommandOptionType.string,
+                 reason: discord.Option(discord.SlashCommandOptionType.string, max_length=512,
                                         description="Grund der entstummung") = None):
     if not isinstance(user, discord.Member):
         await ctx.respond("Benutzer nicht gefunden oder nicht auf dem Server", ephemeral=True)
         return
-    if not user.timed_out:
+    if not user.timed_out and mute_scheduler.ends_at(user.id) is None:
         await ctx.respond(f"{user.mention} hat keinen Timeout", ephemeral=True)
         return
     try:
+        await mute_scheduler.cancel(user.id)
         await user.remove_timeout(reason=reason)
         logging.info("unmuted user " + str(user.id))
+        await bot.mute_history.put((GUILD_ID, ctx.user.id, user.id, None, reason, False))
     except discord.HTTPException as e:
         logging.error("cannot unmute user " + str(user.id), exc_info=e)
         await ctx.respond(f"{user.mention} konnte nicht entstummt werden", ephemeral=True)
@@ -590,10 +938,19 @@ async def raw_userinfo(ctx, user):
         await ctx.respond("Benutzer nicht gefunden", ephemeral=True)
         return
 
+    # the independent lookups run at the same time, a user who isn't a member is fetched for the banner
+    lookups = [bot.bans.fetch(ctx.guild, user)]
+    if not is_member:
+        lookups.append(bot.fetch_user(user.id))
+    ban, *fetched_user = await gather_with_deadline(*lookups)
+    banner = user.banner
+    if fetched_user and isinstance(fetched_user[0], discord.User):
+        banner = fetched_user[0].banner
+
     # basic stuff
     e = discord.Embed()
-    if user.banner:
-        e.set_thumbnail(url=user.banner.url)
+    if banner:
+        e.set_thumbnail(url=banner.url)
     if user.avatar:
         e.set_author(name=f"{discord.utils.escape_markdown(user.name)}#{user.discriminator}",
                      icon_url=user.avatar.url)
@@ -634,17 +991,15 @@ async def raw_userinfo(ctx, user):
             s += f"\n:mute: Timeout bis: {discord.utils.format_dt(user.communication_disabled_until, 'F')}"
 
     # ban stuff
-    try:
-        ban = await ctx.guild.fetch_ban(user)
-        if ban.reason:
-            s += f"\n\n:no_pedestrians: Gebannt für:\n> {discord.utils.escape_markdown(ban.reason)}"
-        else:
-            s += "\n\n:no_pedestrians: Gebannt ohne banngrund"
-    except discord.NotFound:
-        pass
-    except discord.HTTPException as ban_error:
-        logging.error("couldn't fetch ban", exc_info=ban_error)
+    if isinstance(ban, BaseException):
+        logging.error("couldn't fetch ban", exc_info=ban)
         s += "\n\n:no_pedestrians: Bann-Status konnte nicht abgefragt werden!"
+    elif ban is None:
+        pass
+    elif ban.reason:
+        s += f"\n\n:no_pedestrians: Gebannt für:\n> {discord.utils.escape_markdown(ban.reason)}"
+    else:
+        s += "\n\n:no_pedestrians: Gebannt ohne banngrund"
 
     # voice stuff
     if is_member and user.voice and user.voice.channel:
@@ -684,6 +1039,32 @@ async def context_userinfo(ctx: discord.ApplicationContext, member: discord.Memb
     await raw_userinfo(ctx, member)
 
 
+async def delete_denied_reason(actor: discord.Member, author: discord.abc.User) -> Optional[str]:
+    """
+    Checks whether the actor may delete messages of the author
+    :return: The message for the actor why the messages can't be deleted, or None if the deletion is allowed
+    """
+    if author.bot or author.system:
+        return "Nachrichten von Bots sind Heilig und können nicht gelöscht werden. Was denkst du?"
+    # check for teammate
+    team_mate = await bot.supporters.lookup(author.id)
+    if team_mate:
+        if team_mate.has_left:
+            return "Du kannst Nachrichten von ehemaligen Teammitgliedern nicht löschen"
+        return "Du kannst Nachrichten von Teammitgliedern nicht löschen"
+    if isinstance(author, discord.Member):
+        if actor.top_role < author.top_role:
+            return "Du kannst keine Nachrichten von Benutzern, die im Rang über dir stehen, löschen"
+        if author.guild_permissions.administrator:
+            return "Du kannst keine Nachrichten von Administratoren löschen"
+        if author.guild_permissions.manage_messages:
+            return "Nachrichten von diesem Benutzer kannst du nicht löschen da dieser auch Lösch-Berechtigung hat"
+        for r in author.roles:
+            if r.id in TEAM_ROLE_IDS:
+                return "Du kannst Nachrichten von Teammitgliedern nicht löschen"
+    return None
+
+
 @bot.message_command(
     name="Nachricht löschen",
     guild_ids=[GUILD_ID],
@@ -710,42 +1091,34 @@ async def context_delete_message(ctx: discord.ApplicationContext, message: disco
     if message.webhook_id:
         await ctx.respond("Du kannst keine Nachrichten von Webhooks löschen", ephemeral=True)
         return
-    if message.author.bot or message.author.system:
-        await ctx.respond("Nachrichten von Bots sind Heilig und können nicht gelöscht werden. Was denkst du?", ephemeral=True)
-        return
     if message.created_at < discord.utils.utcnow() - datetime.timedelta(days=14):
         await ctx.respond("Die Nachricht ist zu alt um gelöscht zu werden", ephemeral=True)
         return
-    # check for teammate
-    result = await bot.fetchone(
-        "SELECT TRUE, left_at IS NOT NULL FROM Supporter WHERE discord_id = %s",
-        (message.author.id,),
-    )
-    if result:
-        (is_team_mate, is_left) = result
-        if is_team_mate:
-            if is_left:
-                await ctx.respond("Du kannst Nachrichten von ehemaligen Teammitgliedern nicht löschen", ephemeral=True)
-            else:
-                await ctx.respond("Du kannst Nachrichten von Teammitgliedern nicht löschen", ephemeral=True)
-            return
-    if isinstance(message.author, discord.Member):
-        if ctx.user.top_role < message.author.top_role:
-            await ctx.respond("Du kannst keine Nachrichten von Benutzern, die im Rang über dir stehen, löschen", ephemeral=True)
-            return
-        if message.author.guild_permissions.administrator:
-            await ctx.respond("Du kannst keine Nachrichten von Administratoren löschen", ephemeral=True)
-            return
-        if message.author.guild_permissions.manage_messages:
-            await ctx.respond("Nachrichten von diesem Benutzer kannst du nicht löschen da dieser auch Lösch-Berechtigung hat", ephemeral=True)
-            return
-        for r in message.author.roles:
-            if r.id in TEAM_ROLE_IDS:
-                await ctx.respond("Du kannst Nachrichten von Teammitgliedern nicht löschen", ephemeral=True)
-                return
+    denied_reason = await delete_denied_reason(ctx.user, message.author)
+    if denied_reason:
+        await ctx.respond(denied_reason, ephemeral=True)
+        return
 
     await ctx.defer(ephemeral=True)
 
+    # archived before the deletion, discord stops serving the attachments of a deleted message
+    # noinspection PyBroadException
+    try:
+        attachments = await bot.attachment_archiver.capture(
+            message.attachments, min(ATTACHMENT_BYTE_BUDGET, ctx.guild.filesize_limit)
+        )
+    except Exception as err:
+        logging.error("couldn't archive the attachments", exc_info=err)
+        attachments = [CapturedAttachment(a, skipped="Archivierung fehlgeschlagen") for a in message.attachments]
+    try:
+        await message.delete(reason=f"deleted by {ctx.user.id} at {datetime.datetime.now()}")
+    except discord.HTTPException as err:
+        for a in attachments:
+            a.close()
+        logging.error("couldn't delete message", exc_info=err)
+        await ctx.respond("Fehler: Nachricht konnte nicht gelöscht werden")
+        return
+
     e = discord.Embed()
     e.title = f":wastebasket: Nachricht gelöscht von {ctx.user.display_name}"
     if message.reference:
@@ -755,20 +1128,19 @@ async def context_delete_message(ctx: discord.ApplicationContext, message: disco
     e.add_field(name="Kanal", value=message.channel.mention, inline=True)
     e.add_field(name="gelöscht von", value=ctx.user.mention, inline=True)
     e.timestamp = datetime.datetime.now()
-    files = []
-    success_files = 0
-    for a in message.attachments:
-        try:
-            file = await a.to_file()
-            files.append(file)
-            success_files += 1
-        except discord.HTTPException:
-            pass
-    e.add_field(name="Anhänge heruntergeladen", value=f"{success_files}/{len(message.attachments)}")
+    files = [a.file for a in attachments if a.file]
+    e.add_field(name="Anhänge heruntergeladen", value=f"{len(files)}/{len(message.attachments)}")
+    skipped = [a.describe() for a in attachments if not a.file]
+    if skipped:
+        e.add_field(name="Nicht archivierte Anhänge", value=truncate("\n".join(skipped)), inline=False)
     if message.stickers:
         e.add_field(name=f"Sticker", value=f"{message.stickers[0].name} (1/{len(message.stickers)})\n{message.stickers[0].url}")
 
-    log_message = await log_channel.send(content=message.content, embed=e, files=files)
+    try:
+        log_message = await log_channel.send(content=message.content, embed=e, files=files)
+    finally:
+        for a in attachments:
+            a.close()
 
     # db logging
     ref = None
@@ -777,23 +1149,150 @@ async def context_delete_message(ctx: discord.ApplicationContext, message: disco
     cont = None
     if message.content:
         cont = truncate(message.content, 6000)
-    await bot.execute(
-        """
-        INSERT INTO MessageDeletion (msg_content, msg_reference, msg_created_at, msg_author, msg_channel, msg_attachment_amount, msg_sticker_amount, msg_flags, log_message_jump_url, supporter_fk) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, (SELECT id FROM Supporter WHERE discord_id = %s)
-        );
-        """,
-        (cont, ref, message.created_at, message.author.id, message.channel.id, len(message.attachments), len(message.stickers), message.flags.value, log_message.jump_url, ctx.user.id),
+    supporter = await bot.supporters.resolve(ctx.user.id)
+    await bot.message_deletions.put(
+        (cont, ref, message.created_at, message.author.id, message.channel.id, len(message.attachments), len(message.stickers), message.flags.value, log_message.jump_url, supporter.id if supporter else None),
     )
-    try:
-        await message.delete(reason=f"deleted by {ctx.user.id} at {datetime.datetime.now()}")
-    except discord.HTTPException as err:
-        logging.error("couldn't delete message", exc_info=err)
-        await ctx.respond("Fehler: Nachricht konnte nicht gelöscht werden")
-        return
     await ctx.delete()
 
 
+PURGE_MESSAGE_LIMIT = 1000
+"""Maximum amount of messages /purge-user deletes at once"""
+
+PURGE_HISTORY_LIMIT = 200
+"""Maximum amount of messages /purge-user reads from a channel"""
+
+PURGE_CHANNEL_CONCURRENCY = 5
+"""Channels /purge-user reads or deletes in at the same time"""
+
+
+def purge_transcript(user: discord.abc.User, messages: List[discord.Message]) -> bytes:
+    """The deleted messages as gzip compressed text, oldest first"""
+    lines = [f"Nachrichten von {user} ({user.id}), {len(messages)} gelöscht"]
+    for message in messages:
+        lines.append(f"\n[{message.created_at:%Y-%m-%d %H:%M:%S} UTC] #{message.channel} "
+                     f"({message.channel.id}/{message.id})")
+        if message.reference and message.reference.message_id:
+            lines.append(f"↵ Antwort auf {message.reference.message_id}")
+        if message.content:
+            lines.append(message.content)
+        for a in message.attachments:
+            lines.append(f"Anhang: {a.filename} ({a.size} Bytes) {a.url}")
+        for sticker in message.stickers:
+            lines.append(f"Sticker: {sticker.name} {sticker.url}")
+    return gzip.compress("\n".join(lines).encode("utf-8"))
+
+
+@bot.slash_command(
+    guild_ids=[GUILD_ID],
+    name="purge-user",
+    description="Löscht die letzten Nachrichten eines Benutzers in allen Channeln",
+)
+@commands.cooldown(2, 60, commands.BucketType.user)
+@discord.default_permissions(administrator=True)
+@commands.has_any_role(*TEAM_ROLE_IDS)
+async def purge_user(ctx: discord.ApplicationContext,
+                     user: discord.Option(discord.SlashCommandOptionType.user,
+                                          description="Der Benutzer oder die Benutzer-ID als Zahl"),
+                     minutes: discord.Option(discord.SlashCommandOptionType.integer,
+                                             description="Zeitraum in Minuten. Standard 60",
+                                             min_value=1, max_value=14 * 24 * 60) = 60):
+    if not (isinstance(user, discord.User) or isinstance(user, discord.Member)):
+        await ctx.respond("Benutzer nicht gefunden", ephemeral=True)
+        return
+    log_channel = bot.get_channel(int(config.get("Settings", "message-deletion-log-channel-id")))
+    if not log_channel:
+        raise Exception("message deletion channel not found")
+    denied_reason = await delete_denied_reason(ctx.user, user)
+    if denied_reason:
+        await ctx.respond(denied_reason, ephemeral=True)
+        return
+    await ctx.defer(ephemeral=True)
+
+    after = discord.utils.utcnow() - timedelta(minutes=minutes)
+    found: Dict[int, discord.Message] = {}
+    for message in bot.cached_messages:
+        if message.author.id == user.id and message.guild == ctx.guild and message.created_at > after:
+            found[message.id] = message
+
+    # only channels with a message in the time window need a history request
+    channels = [c for c in (*ctx.guild.text_channels, *ctx.guild.threads)
+                if c.last_message_id and discord.utils.snowflake_time(c.last_message_id) > after
+                and c.permissions_for(ctx.guild.me).read_message_history
+                and c.permissions_for(ctx.guild.me).manage_messages]
+    semaphore = asyncio.Semaphore(PURGE_CHANNEL_CONCURRENCY)
+
+    async def read_history(channel):
+        async with semaphore:
+            async for message in channel.history(limit=PURGE_HISTORY_LIMIT, after=after, oldest_first=False):
+                if message.author.id == user.id:
+                    found[message.id] = message
+
+    for channel, result in zip(channels, await asyncio.gather(*(read_history(c) for c in channels),
+                                                            return_exceptions=True)):
+        if isinstance(result, Exception):
+            logging.error(f"couldn't read the history of channel {channel.id}", exc_info=result)
+
+    messages = sorted((m for m in found.values() if not m.pinned), key=lambda m: m.id)[-PURGE_MESSAGE_LIMIT:]
+    if not messages:
+        await ctx.respond(f"Keine Nachrichten von {user.mention} in den letzten {minutes} Minuten gefunden",
+                          ephemeral=True)
+        return
+
+    by_channel: Dict[int, List[int]] = {}
+    for message in messages:
+        by_channel.setdefault(message.channel.id, []).append(message.id)
+
+    async def delete_in_channel(channel_id: int, message_ids: List[int]) -> List[int]:
+        async with semaphore:
+            return await bot.message_deleter.delete_messages(channel_id, message_ids)
+
+    deleted_ids = set()
+    failed_channels = []
+    results = await asyncio.gather(*(delete_in_channel(c, ids) for c, ids in by_channel.items()),
+                                   return_exceptions=True)
+    for (channel_id, message_ids), result in zip(by_channel.items(), results):
+        if isinstance(result, Exception):
+            logging.error(f"couldn't purge messages of {user.id} in channel {channel_id}", exc_info=result)
+            result = []
+        deleted_ids.update(result)
+        if len(result) < len(message_ids):
+            failed_channels.append(f"<#{channel_id}> ({len(message_ids) - len(result)})")
+    # only the messages which are really gone are logged
+    deleted = [m for m in messages if m.id in deleted_ids]
+    if not deleted:
+        await ctx.respond(f"Die Nachrichten von {user.mention} konnten nicht gelöscht werden", ephemeral=True)
+        return
+
+    # one archive post for all messages
+    e = discord.Embed()
+    e.title = f":wastebasket: {len(deleted)} Nachrichten gelöscht von {ctx.user.display_name}"
+    e.add_field(name="gesendet von", value=user.mention, inline=True)
+    e.add_field(name="gelöscht von", value=ctx.user.mention, inline=True)
+    e.add_field(name="Zeitraum", value=f"{minutes} Minuten", inline=True)
+    e.add_field(name="Kanäle", value=truncate(" ".join(dict.fromkeys(f"<#{m.channel.id}>" for m in deleted))),
+                inline=False)
+    if failed_channels:
+        e.add_field(name="Nicht gelöscht in", value=truncate(" ".join(failed_channels)), inline=False)
+    e.timestamp = datetime.datetime.now()
+    log_message = await log_channel.send(
+        embed=e,
+        file=discord.File(BytesIO(purge_transcript(user, deleted)), filename=f"nachrichten-{user.id}.txt.gz"),
+    )
+
+    # db logging, queued like single deletions, the audit writer inserts them in batches and retries them
+    supporter = await bot.supporters.resolve(ctx.user.id)
+    for m in deleted:
+        await bot.message_deletions.put(
+            (truncate(m.content, 6000) if m.content else None, m.reference.message_id if m.reference else None,
+             m.created_at, m.author.id, m.channel.id, len(m.attachments), len(m.stickers), m.flags.value,
+             log_message.jump_url, supporter.id if supporter else None),
+        )
+
+    e.description = f"Archiv: {log_message.jump_url}"
+    await ctx.respond(embed=e, ephemeral=True)
+
+
 @bot.slash_command(
     guild_ids=[GUILD_ID],
     description="Details einer Einladung suchen",
@@ -804,7 +1303,13 @@ async def inviteinfo(ctx: discord.ApplicationContext, invite: discord.Option(dis
                                                                              description="Der Einladungs-Code oder URL")):
     code: str = discord.utils.resolve_invite(invite)
     try:
-        inv = await bot.fetch_invite(code, with_counts=True, with_expiration=True)
+        inv = await asyncio.wait_for(
+            invite_cache.get(code, lambda: bot.fetch_invite(code, with_counts=True, with_expiration=True)),
+            LOOKUP_DEADLINE,
+        )
+    except asyncio.TimeoutError:
+        await ctx.respond(f"Die Einladung **{code}** konnte nicht rechtzeitig abgefragt werden", ephemeral=True)
+        return
     except discord.HTTPException:
         await ctx.respond(f"Keine Einladung mit dem Code **{code}** gefunden", ephemeral=True)
         return
@@ -0,0 +1,18 @@
+-- Tables which were added to reset.sql after the first release
+CREATE TABLE IF NOT EXISTS FactionRequest (
+    message_id      BIGINT UNSIGNED NOT NULL PRIMARY KEY COMMENT 'Discord ID of the request message',
+    channel_id      BIGINT UNSIGNED NOT NULL COMMENT 'Discord ID of the channel the request is in',
+    author_id       BIGINT UNSIGNED NOT NULL COMMENT 'Discord ID of the member who requested the faction role',
+    faction_role_id BIGINT UNSIGNED NOT NULL COMMENT 'Member role ID of the requested faction',
+    expires_at      DATETIME        NOT NULL COMMENT 'The datetime in UTC when the request gets deleted',
+    INDEX (expires_at)
+) COMMENT 'Open faction requests which wait for the reaction of an OG';
+
+CREATE TABLE IF NOT EXISTS ScheduledMute (
+    guild_id  BIGINT UNSIGNED NOT NULL COMMENT 'Discord ID of the guild',
+    member_id BIGINT UNSIGNED NOT NULL COMMENT 'Discord ID of the muted member',
+    ends_at   DATETIME        NOT NULL COMMENT 'The datetime in UTC when the mute really ends',
+    reason    VARCHAR(512)    NULL COMMENT 'The reason of the mute, used for the renewals',
+    PRIMARY KEY (guild_id, member_id),
+    INDEX (guild_id, ends_at)
+) COMMENT 'Mutes longer than the discord timeout limit, renewed by the bot until they end';
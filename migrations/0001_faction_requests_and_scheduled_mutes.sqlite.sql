@@ -0,0 +1,2 @@
+-- sqlite.sql already creates these tables on every start
+SELECT 1;
@@ -0,0 +1,14 @@
+-- Indexes for the history of a user, newest first.
+-- BanUserRole.ban_fk and the foreign keys of Mute already have the index of their foreign key.
+-- Plain CREATE INDEX, MySQL doesn't know IF NOT EXISTS for indexes. SchemaMigration keeps this from running twice.
+CREATE INDEX IDX_Guild_guild_id ON Guild (guild_id);
+
+CREATE INDEX IDX_Mute_subject_created_at ON Mute (`subject`, created_at);
+
+CREATE INDEX IDX_Ban_user_id_created_at ON Ban (user_id, created_at);
+
+CREATE INDEX IDX_Unban_user_id_created_at ON Unban (user_id, created_at);
+
+CREATE INDEX IDX_MessageDeletion_msg_author_created_at ON MessageDeletion (msg_author, created_at);
+
+CREATE INDEX IDX_MessageDeletion_msg_channel_created_at ON MessageDeletion (msg_channel, created_at);
@@ -4,17 +4,18 @@ import Modules.timeouts
 
 
 class TimeoutContextModal(discord.ui.Modal):
-    def __init__(self, *args, member: discord.Member, bot, logging, MUTE_LOG, **kwargs) -> None:
+    def __init__(self, *args, member: discord.Member, bot, logging, MUTE_LOG, mute_scheduler, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.member = member
         self.bot = bot
         self.logging = logging
         self.MUTE_LOG = MUTE_LOG
+        self.mute_scheduler = mute_scheduler
 
         self.add_item(discord.ui.InputText(
             label="Dauer",
             max_length=30,
-            placeholder="Mute dauer (3d 10h 5m 29s)",
+            placeholder="Mute dauer (1w 3d 10h 5m 29s)",
             required=True,
             style=discord.InputTextStyle.singleline,
         ))
@@ -28,18 +29,24 @@ class TimeoutContextModal(discord.ui.Modal):
 
     async def callback(self, interaction: discord.Interaction):
         try:
-            duration = Modules.timeouts.TimeoutDuration(self.children[0].value)
+            duration = Modules.timeouts.TimeoutDuration(self.children[0].value, maximise_to_discord_limit=False)
         except Exception:
             duration = Modules.timeouts.TimeoutDuration("3d")
         reason = self.children[1].value
+        mute_timestamp = duration.mute_timestamp_for_discord()
+        muted_until = self.mute_scheduler.ends_at(self.member.id) or self.member.communication_disabled_until
 
-        if self.member.timed_out and duration.mute_timestamp_for_discord().timestamp() <= self.member.communication_disabled_until.timestamp():
+        if self.member.timed_out and duration.expires_at.timestamp() <= muted_until.timestamp():
             await interaction.response.send_message("Benutzer ist schon im Timeout", ephemeral=True)
             return
 
         try:
-            await self.member.timeout(duration.mute_timestamp_for_discord(), reason=reason)
+            await self.member.timeout(mute_timestamp, reason=reason)
             self.logging.info("muted user " + str(self.member.id))
+            await self.mute_scheduler.after_timeout(self.member, duration.expires_at, mute_timestamp, reason,
+                                                    self.logging)
+            await self.bot.mute_history.put((self.member.guild.id, interaction.user.id, self.member.id,
+                                             duration.expires_at.replace(tzinfo=None), reason, True))
         except discord.HTTPException as e:
             self.logging.error("cannot mute user " + str(self.member.id), exc_info=e)
             await interaction.response.send_message(f"{self.member.mention} konnte nicht stumm geschaltet werden", ephemeral=True)
@@ -50,7 +57,7 @@ class TimeoutContextModal(discord.ui.Modal):
                 icon_url=self.member.display_avatar.url
             )
             e.description = f"Timeout für {duration.to_mute_length_str()}\n" \
-                            f"Bis: {discord.utils.format_dt(duration.mute_timestamp_for_discord(), 'F')}"
+                            f"Bis: {discord.utils.format_dt(duration.expires_at, 'F')}"
             e.add_field(
                 name="Grund",
                 value=discord.utils.escape_markdown(reason)
@@ -0,0 +1,93 @@
+-- ************************************
+-- The tables of reset.sql for the sqlite storage backend.
+-- Keep both files in sync. Applied by the bot on every start, so every statement must be idempotent.
+-- ************************************
+
+-- sqlite has no DUAL table
+CREATE VIEW IF NOT EXISTS DUAL AS SELECT 'X' AS DUMMY;
+
+CREATE TABLE IF NOT EXISTS Guild (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    guild_id   BIGINT    NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Mute (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id   INTEGER      NOT NULL REFERENCES Guild (id) ON DELETE CASCADE,
+    created_at TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    actor      BIGINT       NOT NULL,
+    `subject`  BIGINT       NOT NULL,
+    duration   DATETIME     NULL,
+    reason     VARCHAR(512) NULL,
+    is_mute    BOOLEAN      NOT NULL DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS Supporter (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id       INTEGER       NOT NULL REFERENCES Guild (id) ON DELETE CASCADE,
+    created_at     TIMESTAMP     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    discord_id     BIGINT        NOT NULL UNIQUE,
+    last_activity  TIMESTAMP     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    left_at        TIMESTAMP     NULL,
+    remind_message VARCHAR(2000) NULL
+);
+
+CREATE TABLE IF NOT EXISTS Unban (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at   TIMESTAMP     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    reason       VARCHAR(1000) NULL,
+    user_id      BIGINT        NOT NULL,
+    supporter_fk INTEGER       NULL REFERENCES Supporter (id) ON UPDATE SET NULL ON DELETE SET NULL,
+    unban_reason VARCHAR(1000) NULL
+);
+
+CREATE TABLE IF NOT EXISTS MessageDeletion (
+    id                    INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at            TIMESTAMP     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    msg_content           VARCHAR(6000) NULL,
+    msg_reference         BIGINT        NULL,
+    msg_created_at        TIMESTAMP     NOT NULL,
+    msg_author            BIGINT        NOT NULL,
+    msg_channel           BIGINT        NOT NULL,
+    msg_attachment_amount INTEGER       NOT NULL,
+    msg_sticker_amount    INTEGER       NOT NULL,
+    msg_flags             INTEGER       NOT NULL,
+    log_message_jump_url  VARCHAR(255)  NULL,
+    supporter_fk          INTEGER       NULL REFERENCES Supporter (id) ON UPDATE RESTRICT ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS Ban (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    banner_fk  INTEGER      NOT NULL,
+    user_id    BIGINT       NOT NULL,
+    ban_reason VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS BanUserRole (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    role_id BIGINT       NOT NULL,
+    name    VARCHAR(255) NULL,
+    ban_fk  INTEGER      NOT NULL REFERENCES Ban (id) ON UPDATE RESTRICT ON DELETE CASCADE
+);
+-- MariaDB creates this index for the foreign key
+CREATE INDEX IF NOT EXISTS BanUserRole_ban_fk ON BanUserRole (ban_fk);
+
+CREATE TABLE IF NOT EXISTS FactionRequest (
+    message_id      BIGINT   NOT NULL PRIMARY KEY,
+    channel_id      BIGINT   NOT NULL,
+    author_id       BIGINT   NOT NULL,
+    faction_role_id BIGINT   NOT NULL,
+    expires_at      DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS FactionRequest_expires_at ON FactionRequest (expires_at);
+
+CREATE TABLE IF NOT EXISTS ScheduledMute (
+    guild_id  BIGINT       NOT NULL,
+    member_id BIGINT       NOT NULL,
+    ends_at   DATETIME     NOT NULL,
+    reason    VARCHAR(512) NULL,
+    PRIMARY KEY (guild_id, member_id)
+);
+CREATE INDEX IF NOT EXISTS ScheduledMute_guild_id_ends_at ON ScheduledMute (guild_id, ends_at);